@@ -1,7 +1,15 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 from utils.styles import get_custom_css, format_currency
+from utils.aggregate_cube import EXPENSE
+from utils.ledger import (
+    DEFAULT_USER, account_cube, account_start_balance, list_accounts,
+    selected_account
+)
+from utils.sql_backend import monthly_spend, range_totals, sql_enabled
+from utils.tracing import start_trace, trace_panel
+
+BANK_ICONS = {"monzo": "Ⓜ️", "lloyds": "🐎"}
 
 # Page config
 st.set_page_config(
@@ -11,26 +19,33 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+start_trace()
+
 # Load custom CSS
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
 # Load data
 
 
-@st.cache_data
 def load_data():
+    """
+    Account totals and spend per month: in the embedded SQL engine when
+    one is configured, otherwise from the account's aggregate cube
+    """
     try:
-        df = pd.read_csv('bank_transactions.csv')
-        df['date'] = pd.to_datetime(df['date'])
-        df['month'] = df['date'].dt.to_period('M').astype(str)
-        return df
+        user, account = selected_account()
+        if sql_enabled():
+            return (range_totals(user, account),
+                    monthly_spend(user, account))
+        cube = account_cube(user, account)
+        return cube.totals(), cube.monthly(EXPENSE).abs()
     except FileNotFoundError:
         st.error(
             "⚠️ No transaction data found! Please run `python generate_data.py` first.")
         st.stop()
 
 
-df = load_data()
+totals, spend_by_month = load_data()
 
 # Hero Section
 st.markdown("""
@@ -93,10 +108,10 @@ st.markdown("<h2 style='text-align: center; color:#1e293b; margin-bottom: 2rem;'
 
 col1, col2, col3, col4 = st.columns(4)
 
-current_balance = df['amount'].sum() + 1000
-total_income = df[df['amount'] > 0]['amount'].sum()
-total_expenses = abs(df[df['amount'] < 0]['amount'].sum())
-transaction_count = len(df)
+current_balance = totals["net"] + account_start_balance(*selected_account())
+total_income = totals["income"]
+total_expenses = totals["expenses"]
+transaction_count = totals["count"]
 
 with col1:
     st.markdown(f"""
@@ -143,18 +158,19 @@ st.markdown("<br><br>", unsafe_allow_html=True)
 st.markdown("<h2 style='text-align: center; color:#1e293b; margin-bottom: 1.5rem;'>📈 Spending Over Time</h2>",
             unsafe_allow_html=True)
 
-monthly_spending = df[df['amount'] < 0].groupby(
-    'month')['amount'].sum().abs().reset_index()
+monthly_spending = spend_by_month.reset_index()
 monthly_spending.columns = ['Month', 'Amount']
 
-fig = px.bar(
-    monthly_spending,
-    x='Month',
-    y='Amount',
-    title='',
-    color='Amount',
-    color_continuous_scale=['#667eea', '#764ba2']
-)
+# graph_objects rather than plotly.express - express costs ~0.25s to import
+fig = go.Figure(go.Bar(
+    x=monthly_spending['Month'].astype(str),
+    y=monthly_spending['Amount'],
+    marker=dict(
+        color=monthly_spending['Amount'],
+        colorscale=['#667eea', '#764ba2'],
+        showscale=True
+    )
+))
 
 fig.update_layout(
     height=400,
@@ -229,13 +245,32 @@ st.markdown("""
 with st.sidebar:
     st.markdown("---")
     st.markdown("### 📈 Stats")
-    st.metric("Total Transactions", len(df))
+    st.metric("Total Transactions", transaction_count)
     st.metric("Current Balance", format_currency(current_balance))
 
     st.markdown("## 🏦 Accounts")
 
-    selected_bank = st.radio(
-        "",
-        ["Ⓜ️ Monzo", "🐎 Lloyds"],
-        index=0
+    # Every page reads st.session_state["account"] (see selected_account)
+    accounts = {
+        f"{BANK_ICONS.get(e['account'].split('-')[0].lower(), '🏦')} "
+        f"{e['account']}":
+            (e["user"], e["account"])
+        for e in list_accounts(DEFAULT_USER)
+    }
+    current = selected_account()
+    labels = list(accounts)
+
+    def _select_account():
+        st.session_state["account"] = accounts[st.session_state["account_choice"]]
+
+    st.radio(
+        "Account",
+        labels,
+        index=list(accounts.values()).index(current)
+        if current in accounts.values() else 0,
+        key="account_choice",
+        on_change=_select_account,
+        label_visibility="collapsed"
     )
+
+trace_panel()
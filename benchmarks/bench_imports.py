@@ -0,0 +1,112 @@
+"""
+Import-time budget for the modules the Streamlit pages load
+Fails (exit code 1) when a module pulls in a heavy optional dependency
+at import time or takes longer than the budget to import
+
+Run from the project root:
+    python -m benchmarks.bench_imports
+    python -m benchmarks.bench_imports --budget-ms 100 --repeat 5
+"""
+import argparse
+import subprocess
+import sys
+
+# Modules imported by app.py and the pages
+MODULES = [
+    "utils.data_access",
+    "utils.ledger",
+    "utils.transaction_store",
+    "utils.aggregate_cube",
+    "utils.balance_index",
+    "utils.compact_frame",
+    "utils.ml_models",
+    "utils.merchant_utils",
+    "utils.cashflow_simulation",
+    "utils.forecast_cache",
+    "utils.forecasters",
+    "utils.batch_forecast",
+    "utils.incremental_forecast",
+    "utils.sql_backend",
+    "utils.tracing",
+    "utils.styles",
+]
+
+# Must only load on first use (model fits, the CLI scripts)
+HEAVY = ["statsmodels", "scipy", "prophet", "sklearn", "plotly"]
+
+# Loaded before the measured import - every page needs them anyway
+BASELINE = "import numpy, pandas"
+
+DEFAULT_BUDGET_MS = 150
+
+
+def measure(module):
+    """
+    Import `module` in a fresh interpreter under -X importtime
+
+    Returns (cumulative ms of the import on top of BASELINE, set of the
+    top-level packages it loaded).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"{BASELINE}; import {module}"],
+        capture_output=True, text=True, check=True
+    )
+
+    cumulative_us = 0
+    loaded = set()
+    seen_baseline = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.strip()
+
+        # Everything up to the last baseline package belongs to BASELINE
+        if name in ("numpy", "pandas"):
+            seen_baseline = name == "pandas"
+            continue
+        if not seen_baseline:
+            continue
+
+        loaded.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(cumulative)
+
+    return cumulative_us / 1000, loaded
+
+
+def run(modules, budget_ms, repeat=3):
+    failures = []
+    print(f"{'module':<26} {'best (ms)':>10}  heavy imports")
+    for module in modules:
+        timings = []
+        for _ in range(repeat):
+            ms, loaded = measure(module)
+            timings.append(ms)
+
+        best = min(timings)
+        heavy = sorted(loaded.intersection(HEAVY))
+        print(f"{module:<26} {best:>10.1f}  {', '.join(heavy) or '-'}")
+
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if best > budget_ms:
+            failures.append(
+                f"{module} took {best:.1f} ms (budget {budget_ms} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.modules, args.budget_ms, args.repeat) else 1)
@@ -0,0 +1,193 @@
+"""
+End-to-end benchmark for the analytics pipeline
+Times merchant normalization, brand mapping, the analysis functions, the
+categorizer and every forecaster on synthetic ledgers of several sizes,
+reporting throughput and peak memory and comparing against a baseline
+
+Run from the project root:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 10000 100000 --save
+    python -m benchmarks.bench_pipeline --compare --tolerance 1.3
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from generate_data import generate_chunk
+from utils import merchant_utils
+from utils.aggregate_cube import AggregateCube
+from utils.compact_frame import to_compact
+from utils.data_access import enrich_transactions
+from utils.forecasters import available_forecasters, get_forecaster
+from utils.ml_models import (
+    analyze_subscriptions, calculate_daily_balance,
+    calculate_savings_opportunity, categorize_batch,
+    detect_recurring_transactions, detect_spending_patterns, holt_forecast,
+    load_categorizer
+)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+BASELINE_FILE = os.path.join("benchmarks", "baseline.json")
+ROWS_PER_CUSTOMER = 318     # generate_chunk, 6 months
+FORECAST_DAYS = 30
+
+
+def make_ledger(n_rows, seed=42):
+    """Enriched multi-customer ledger with roughly n_rows transactions"""
+    customers = max(1, -(-n_rows // ROWS_PER_CUSTOMER))
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=180)
+    df = generate_chunk(0, customers, 6, start, seed=seed)
+    return enrich_transactions(df.iloc[:n_rows])
+
+
+def _cold_normalize(df):
+    # Measure the real work, not a warm LRU from the previous repeat
+    merchant_utils._NORMALIZE_CACHE.clear()
+    return merchant_utils.normalize_merchants(df["description"])
+
+
+def _cold_brands(df):
+    merchant_utils._BRAND_CACHE.clear()
+    return merchant_utils.map_to_brands(df["merchant_clean"])
+
+
+def _forecast_case(name):
+    def _run(df):
+        balance = calculate_daily_balance(df)
+        return get_forecaster(name).fit(balance) \
+            .predict_interval(FORECAST_DAYS)
+    return _run
+
+
+def _holt_batch(df):
+    """holt_forecast over every account's daily net flow as one 2-D array"""
+    days = (df["date"] - df["date"].min()).dt.days.to_numpy()
+    codes, _ = pd.factorize(df["account"])
+    flows = np.zeros((codes.max() + 1, days.max() + 1))
+    np.add.at(flows, (codes, days), df["amount"].to_numpy(dtype=float))
+    return holt_forecast(np.cumsum(flows, axis=1), FORECAST_DAYS)
+
+
+def build_cases():
+    """name -> fn(ledger); each case sees the same enriched ledger"""
+    model, vectorizer = load_categorizer()
+    cases = {
+        "normalize_merchants": _cold_normalize,
+        "map_to_brands": _cold_brands,
+        "detect_recurring_transactions": detect_recurring_transactions,
+        "analyze_subscriptions": analyze_subscriptions,
+        "detect_spending_patterns": detect_spending_patterns,
+        "calculate_savings_opportunity": calculate_savings_opportunity,
+        "categorize_batch": lambda df: categorize_batch(
+            df["description"], model, vectorizer),
+        "holt_forecast_batch": _holt_batch,
+        "aggregate_cube": AggregateCube.from_transactions,
+        "to_compact": to_compact,
+    }
+    for name in available_forecasters():
+        cases[f"forecast_{name}"] = _forecast_case(name)
+    return cases
+
+
+def measure(fn, df, repeat):
+    """Best wall time over `repeat` runs and peak traced memory (bytes)"""
+    fn(df)  # warm-up: imports, lazily built matchers / models
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def run(sizes, repeat=3, only=None):
+    cases = build_cases()
+    if only:
+        cases = {name: fn for name, fn in cases.items()
+                 if any(pattern in name for pattern in only)}
+
+    results = {}
+    print(f"{'case':<32} {'rows':>10} {'best (s)':>10} {'rows/s':>14} "
+          f"{'peak MiB':>9}")
+    for n_rows in sizes:
+        df = make_ledger(n_rows)
+        for name, fn in cases.items():
+            seconds, peak = measure(fn, df, repeat)
+            results[f"{name}@{n_rows}"] = {
+                "seconds": seconds,
+                "rows_per_second": len(df) / seconds,
+                "peak_bytes": peak
+            }
+            print(f"{name:<32} {len(df):>10,} {seconds:>10.4f} "
+                  f"{len(df) / seconds:>14,.0f} {peak / 2**20:>9.1f}")
+    return results
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    with open(path, "w") as f:
+        json.dump({
+            "python": sys.version.split()[0],
+            "machine": platform.machine(),
+            "results": results
+        }, f, indent=2)
+    print(f"Baseline saved to '{path}'")
+
+
+def compare(results, path=BASELINE_FILE, tolerance=1.5):
+    """
+    Print slowdowns against the saved baseline
+    Returns False when any case is more than `tolerance` times slower
+    """
+    if not os.path.exists(path):
+        print(f"No baseline at '{path}' - run with --save first")
+        return True
+
+    with open(path) as f:
+        baseline = json.load(f)["results"]
+
+    ok = True
+    for key, current in results.items():
+        if key not in baseline:
+            continue
+        ratio = current["seconds"] / baseline[key]["seconds"]
+        memory = current["peak_bytes"] / max(baseline[key]["peak_bytes"], 1)
+        flag = ""
+        if ratio > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{key:<44} time x{ratio:5.2f}  memory x{memory:5.2f}{flag}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+",
+                        help="run cases whose name contains any of these")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="exit 1 when slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    results = run(args.sizes, repeat=args.repeat, only=args.only)
+    if args.save:
+        save_baseline(results, args.baseline)
+    if args.compare and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,76 @@
+"""
+Benchmark for detect_recurring_transactions
+Shows how the recurring detector scales with ledger size
+
+Run from the project root:
+    python -m benchmarks.bench_recurring
+    python -m benchmarks.bench_recurring --sizes 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.ml_models import detect_recurring_transactions
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+
+
+def make_ledger(n_rows, n_merchants=None, seed=42):
+    """
+    Build a synthetic multi-customer ledger with a mix of monthly
+    (recurring) and random (discretionary) merchants
+    """
+    rng = np.random.default_rng(seed)
+
+    if n_merchants is None:
+        n_merchants = max(50, n_rows // 20)
+
+    merchant_ids = rng.integers(0, n_merchants, n_rows)
+    descriptions = np.char.add("MERCHANT ", merchant_ids.astype(str))
+
+    # Every third merchant bills roughly monthly, the rest are random
+    monthly = merchant_ids % 3 == 0
+    day_offsets = np.where(
+        monthly,
+        rng.integers(0, 12, n_rows) * 30 + rng.integers(-1, 2, n_rows),
+        rng.integers(0, 365, n_rows)
+    )
+    dates = (
+        pd.Timestamp.now().normalize()
+        - pd.Timedelta(days=365)
+        + pd.to_timedelta(day_offsets, unit="D")
+    )
+
+    return pd.DataFrame({
+        "date": dates,
+        "description": descriptions,
+        "amount": -np.round(rng.uniform(5, 150, n_rows), 2),
+        "category": np.where(monthly, "Subscriptions", "Shopping")
+    })
+
+
+def run(sizes, repeat=3):
+    print(f"{'rows':>10} {'best (s)':>10} {'rows/s':>14} {'recurring':>10}")
+    for n_rows in sizes:
+        df = make_ledger(n_rows)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = detect_recurring_transactions(df)
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        print(f"{n_rows:>10,} {best:>10.3f} {n_rows / best:>14,.0f} "
+              f"{len(result):>10,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.sizes, repeat=args.repeat)
@@ -0,0 +1,100 @@
+import argparse
+import time
+
+import pandas as pd
+
+from utils.balance_index import DEFAULT_START_BALANCE
+from utils.batch_forecast import (
+    DEFAULT_HISTORY_DAYS, forecast_accounts, write_forecast_table
+)
+from utils.incremental_forecast import (
+    STATE_DIR, IncrementalArima, forecast_accounts_incremental
+)
+from utils.ledger import (
+    account_balance_index, account_id, ledger_version, list_accounts
+)
+
+
+def run_batch_forecast(days=90, history_days=DEFAULT_HISTORY_DAYS,
+                       max_workers=None, timeout=30.0, incremental=True,
+                       state_dir=STATE_DIR):
+    """
+    Overnight job: forecast every account and save the forecast table
+    Uses the same default history window as the Forecast page. With
+    incremental=True the warm ARIMA state in state_dir is extended and
+    only stale accounts are re-estimated; otherwise every window is
+    fitted from scratch.
+    """
+    print("📊 Loading ledger accounts...")
+    accounts = list_accounts()
+    source_hash = ledger_version()
+
+    end = max(pd.Timestamp(e["max_date"]) for e in accounts)
+    start = end - pd.Timedelta(days=history_days)
+
+    # One shard at a time; the table is keyed by account_id (user/account)
+    balances = {
+        account_id(e["user"], e["account"]): account_balance_index(
+            e["user"], e["account"]).frame(
+                start, end, start_balance=e.get("start_balance",
+                                                DEFAULT_START_BALANCE))
+        for e in accounts
+    }
+    print(f"✅ {len(balances)} accounts, history {start:%d %b %Y} → {end:%d %b %Y}")
+
+    print("🔮 Fitting forecasts...")
+    began = time.perf_counter()
+    if incremental:
+        model = IncrementalArima().load(state_dir)
+        histories = {
+            account_id(e["user"], e["account"]): account_balance_index(
+                e["user"], e["account"]).frame()
+            for e in accounts
+        }
+        table = forecast_accounts_incremental(
+            model,
+            histories,
+            balances,
+            days=days,
+            max_workers=max_workers,
+            timeout=timeout,
+            source_hash=source_hash,
+            history_window=(start, end)
+        )
+        model.save(state_dir)
+    else:
+        table = forecast_accounts(
+            balances,
+            days=days,
+            max_workers=max_workers,
+            timeout=timeout,
+            source_hash=source_hash,
+            history_window=(start, end)
+        )
+    elapsed = time.perf_counter() - began
+
+    path = write_forecast_table(table)
+    methods = table.drop_duplicates("account")["method"].value_counts()
+    print(f"✅ Forecast table saved to '{path}' in {elapsed:.1f}s")
+    print(methods.to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch balance forecasting")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--history-days", type=int,
+                        default=DEFAULT_HISTORY_DAYS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--full-refit", action="store_true",
+                        help="fit every window from scratch, ignoring "
+                             f"the warm state in {STATE_DIR}/")
+    args = parser.parse_args()
+
+    run_batch_forecast(
+        days=args.days,
+        history_days=args.history_days,
+        max_workers=args.workers,
+        timeout=args.timeout,
+        incremental=not args.full_refit
+    )
@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
-from prophet import Prophet
-import plotly.graph_objects as go
+from utils.forecasters import get_forecaster
 from datetime import datetime, timedelta
 
 
@@ -18,46 +17,42 @@ def forecast_balance(months_ahead=3):
     # Start with £1000 in the account
     daily_balance = df.groupby('date')['amount'].sum().cumsum() + 1000
 
-    # Prepare data for Prophet (needs specific column names)
-    forecast_df = pd.DataFrame({
-        'ds': daily_balance.index,  # ds = datestamp
-        'y': daily_balance.values    # y = value to predict
+    balance_df = pd.DataFrame({
+        'date': daily_balance.index,
+        'balance': daily_balance.values
     })
 
-    print(f"✅ Prepared {len(forecast_df)} days of balance history")
+    print(f"✅ Prepared {len(balance_df)} days of balance history")
 
-    # Train Prophet model
+    # Train Prophet model (weekly seasonality) through the forecaster registry
     print("🔮 Training forecasting model...")
-    model = Prophet(
-        daily_seasonality=False,
-        weekly_seasonality=True,
-        yearly_seasonality=False
-    )
-    model.fit(forecast_df)
+    model = get_forecaster(
+        "prophet", weekly_seasonality=True, yearly_seasonality=False)
+    model.fit(balance_df)
 
     # Make future predictions
-    future_dates = model.make_future_dataframe(periods=30 * months_ahead)
-    forecast = model.predict(future_dates)
+    forecast = model.predict_interval(30 * months_ahead)
 
     print(f"✅ Forecasted {months_ahead} months ahead")
 
-    # Create visualization
+    # Create visualization (plotly is only needed from here on)
+    import plotly.graph_objects as go
+
     fig = go.Figure()
 
     # Historical balance
     fig.add_trace(go.Scatter(
-        x=forecast_df['ds'],
-        y=forecast_df['y'],
+        x=balance_df['date'],
+        y=balance_df['balance'],
         mode='lines',
         name='Historical Balance',
         line=dict(color='blue', width=2)
     ))
 
     # Forecasted balance
-    future_forecast = forecast[forecast['ds'] > forecast_df['ds'].max()]
     fig.add_trace(go.Scatter(
-        x=future_forecast['ds'],
-        y=future_forecast['yhat'],
+        x=forecast['date'],
+        y=forecast['balance'],
         mode='lines',
         name='Predicted Balance',
         line=dict(color='orange', width=2, dash='dash')
@@ -65,16 +60,16 @@ def forecast_balance(months_ahead=3):
 
     # Confidence interval
     fig.add_trace(go.Scatter(
-        x=future_forecast['ds'],
-        y=future_forecast['yhat_upper'],
+        x=forecast['date'],
+        y=forecast['upper'],
         mode='lines',
         name='Upper Bound',
         line=dict(width=0),
         showlegend=False
     ))
     fig.add_trace(go.Scatter(
-        x=future_forecast['ds'],
-        y=future_forecast['yhat_lower'],
+        x=forecast['date'],
+        y=forecast['lower'],
         fill='tonexty',
         mode='lines',
         name='Confidence Range',
@@ -94,11 +89,11 @@ def forecast_balance(months_ahead=3):
 
     # Generate alerts
     print("\n⚠️ Alerts:")
-    low_balance_days = future_forecast[future_forecast['yhat'] < 200]
+    low_balance_days = forecast[forecast['balance'] < 200]
     if len(low_balance_days) > 0:
         first_low = low_balance_days.iloc[0]
         print(
-            f"   ⚠️ Balance may drop below £200 on {first_low['ds'].strftime('%Y-%m-%d')}")
+            f"   ⚠️ Balance may drop below £200 on {first_low['date'].strftime('%Y-%m-%d')}")
     else:
         print("   ✅ Your balance looks healthy!")
 
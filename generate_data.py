@@ -1,159 +1,339 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+import argparse
+import os
 import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
 
 # Set random seed for reproducibility
 np.random.seed(42)
 
-
-def add_merchant_variation(merchant_name):
-    variations = [
-        # 40% chance: Keep original (most common)
-        lambda x: x,
-        lambda x: x,
-        lambda x: x,
-        lambda x: x,
-
-        # 20% chance: Add store/reference number
-        lambda x: f"{x} {random.randint(1000, 9999)}",
-        lambda x: f"{x} *{random.randint(100, 999)}",
-
-        # 15% chance: Add location
-        lambda x: f"{x} LONDON",
-        lambda x: f"{x} UK",
-        lambda x: f"{x} MANCHESTER",
-
-        # 10% chance: Formatting changes
-        lambda x: x.replace(" ", ""),  # Remove spaces
-        lambda x: x.lower(),  # Lowercase
-
-        # 10% chance: Add payment type
-        lambda x: f"{x} CONTACTLESS",
-        lambda x: f"{x} ONLINE",
-
-        # 5% chance: Truncation (like SMS notifications)
-        lambda x: x[:15] + "..." if len(x) > 15 else x,
+# Define realistic UK merchants and categories
+MERCHANTS = {
+    'Groceries': [
+        'TESCO STORES', 'SAINSBURYS', 'ASDA', 'MORRISONS',
+        'WAITROSE', 'LIDL UK', 'ALDI STORES'
+    ],
+    'Transport': [
+        'TFL TRAVEL CHARGE', 'UBER TRIP', 'TRAINLINE',
+        'NATIONAL RAIL', 'SHELL PETROL'
+    ],
+    'Subscriptions': [
+        'SPOTIFY UK', 'NETFLIX.COM', 'AMAZON PRIME',
+        'APPLE.COM/BILL', 'DISNEY PLUS'
+    ],
+    'Eating Out': [
+        'PRET A MANGER', 'COSTA COFFEE', 'NANDOS',
+        'PIZZA EXPRESS', 'GREGGS PLC'
+    ],
+    'Bills': [
+        'BRITISH GAS', 'THAMES WATER', 'EE LIMITED',
+        'COUNCIL TAX', 'INTERNET BROADBAND'
+    ],
+    'Shopping': [
+        'AMAZON.CO.UK', 'PRIMARK', 'H&M UK',
+        'ZARA UK', 'ARGOS LIMITED'
+    ],
+    'Income': [
+        'PAYROLL ABC LTD', 'SALARY DEPOSIT',
+        'FREELANCE PAYMENT'
     ]
+}
+
+# How much people typically spend in each category
+TYPICAL_AMOUNTS = {
+    'Groceries': (15, 80),      # £15-£80 per shop
+    'Transport': (5, 30),        # £5-£30 per trip
+    'Subscriptions': (5, 15),    # £5-£15 monthly
+    'Eating Out': (8, 40),       # £8-£40 per meal
+    'Bills': (30, 150),          # £30-£150 per bill
+    'Shopping': (20, 200),       # £20-£200 per purchase
+    'Income': (2000, 2500)       # £2000-£2500 salary
+}
+
+# How often transactions happen per month
+FREQUENCY = {
+    'Groceries': 12,       # ~3 times per week
+    'Transport': 20,       # ~5 times per week
+    'Subscriptions': 3,    # Monthly subscriptions
+    'Eating Out': 8,       # ~2 times per week
+    'Bills': 4,            # Monthly bills
+    'Shopping': 5,         # Few times a month
+    'Income': 1            # Once a month (salary)
+}
+
+# Customers per generated chunk - part of what the seed reproduces, the
+# worker count is not
+CHUNK_CUSTOMERS = 1000
+
+
+# Description variation model, one equally likely rule per entry:
+# functions of the merchant name, or (separator, low, high) for a
+# reference number in [low, high) appended after the separator
+_VARIATION_RULES = [
+    # 40% chance: Keep original (most common)
+    lambda x: x,
+    lambda x: x,
+    lambda x: x,
+    lambda x: x,
+
+    # 20% chance: Add store/reference number
+    (" ", 1000, 10000),
+    (" *", 100, 1000),
+
+    # 15% chance: Add location
+    lambda x: f"{x} LONDON",
+    lambda x: f"{x} UK",
+    lambda x: f"{x} MANCHESTER",
+
+    # 10% chance: Formatting changes
+    lambda x: x.replace(" ", ""),  # Remove spaces
+    lambda x: x.lower(),  # Lowercase
+
+    # 10% chance: Add payment type
+    lambda x: f"{x} CONTACTLESS",
+    lambda x: f"{x} ONLINE",
+
+    # 5% chance: Truncation (like SMS notifications)
+    lambda x: x[:15] + "..." if len(x) > 15 else x,
+]
 
+
+def add_merchant_variation(merchant_name):
     # Pick a random rule
-    transform = random.choice(variations)
-    return transform(merchant_name)
+    rule = random.choice(_VARIATION_RULES)
+    if callable(rule):
+        return rule(merchant_name)
+    sep, low, high = rule
+    return f"{merchant_name}{sep}{random.randint(low, high - 1)}"
+
+
+# ---------------------------
+# Vectorized generator
+#
+# Same model as add_merchant_variation / the tables above, but a whole
+# chunk of customers is drawn with NumPy at once. Each chunk has its own
+# generator seeded from (seed, chunk index), so the output only depends
+# on the seed and chunk size - never on how many workers produced it.
+# ---------------------------
+
+CATEGORIES = list(MERCHANTS)
+_MERCHANT_NAMES = [m for c in CATEGORIES for m in MERCHANTS[c]]
+_MERCHANT_OFFSET = np.cumsum([0] + [len(MERCHANTS[c]) for c in CATEGORIES])
+_MERCHANT_COUNT = np.array([len(MERCHANTS[c]) for c in CATEGORIES])
+
+# (merchant, rule) -> description for every rule without a random part
+# (reference number rules: the bare name, numbers are added per row)
+_VARIATION_TABLE = np.array([
+    [rule(name) if callable(rule) else name for rule in _VARIATION_RULES]
+    for name in _MERCHANT_NAMES
+], dtype=object)
+
+_AMOUNT_LOW = np.array([TYPICAL_AMOUNTS[c][0] for c in CATEGORIES], float)
+_AMOUNT_HIGH = np.array([TYPICAL_AMOUNTS[c][1] for c in CATEGORIES], float)
+_SIGN = np.array([1.0 if c == 'Income' else -1.0 for c in CATEGORIES])
+
+
+def add_merchant_variations(merchant_ids, rng):
+    """
+    Vectorized add_merchant_variation over indices into _MERCHANT_NAMES
+    Returns an object array of descriptions
+    """
+    rules = rng.integers(0, len(_VARIATION_RULES), len(merchant_ids))
+    descriptions = _VARIATION_TABLE[merchant_ids, rules]
 
+    for index, rule in enumerate(_VARIATION_RULES):
+        if callable(rule):
+            continue
+        sep, low, high = rule
+        rows = np.flatnonzero(rules == index)
+        numbers = rng.integers(low, high, len(rows)).astype(str)
+        descriptions[rows] = np.char.add(
+            np.char.add(descriptions[rows].astype(str), sep), numbers)
 
-def generate_transactions(num_months=6):
+    return descriptions
+
+
+def generate_chunk(first_customer, n_customers, num_months, start_date,
+                   seed=42, chunk_index=0):
     """
-    Generate realistic UK bank transactions
-    Think of this as creating a fake bank statement
+    Transactions for customers first_customer .. first_customer +
+    n_customers - 1, sorted by (account, date)
     """
+    rng = np.random.default_rng([seed, chunk_index])
 
-    # Define realistic UK merchants and categories
-    merchants = {
-        'Groceries': [
-            'TESCO STORES', 'SAINSBURYS', 'ASDA', 'MORRISONS',
-            'WAITROSE', 'LIDL UK', 'ALDI STORES'
-        ],
-        'Transport': [
-            'TFL TRAVEL CHARGE', 'UBER TRIP', 'TRAINLINE',
-            'NATIONAL RAIL', 'SHELL PETROL'
-        ],
-        'Subscriptions': [
-            'SPOTIFY UK', 'NETFLIX.COM', 'AMAZON PRIME',
-            'APPLE.COM/BILL', 'DISNEY PLUS'
-        ],
-        'Eating Out': [
-            'PRET A MANGER', 'COSTA COFFEE', 'NANDOS',
-            'PIZZA EXPRESS', 'GREGGS PLC'
-        ],
-        'Bills': [
-            'BRITISH GAS', 'THAMES WATER', 'EE LIMITED',
-            'COUNCIL TAX', 'INTERNET BROADBAND'
-        ],
-        'Shopping': [
-            'AMAZON.CO.UK', 'PRIMARK', 'H&M UK',
-            'ZARA UK', 'ARGOS LIMITED'
-        ],
-        'Income': [
-            'PAYROLL ABC LTD', 'SALARY DEPOSIT',
-            'FREELANCE PAYMENT'
-        ]
-    }
-
-    # How much people typically spend in each category
-    typical_amounts = {
-        'Groceries': (15, 80),      # £15-£80 per shop
-        'Transport': (5, 30),        # £5-£30 per trip
-        'Subscriptions': (5, 15),    # £5-£15 monthly
-        'Eating Out': (8, 40),       # £8-£40 per meal
-        'Bills': (30, 150),          # £30-£150 per bill
-        'Shopping': (20, 200),       # £20-£200 per purchase
-        'Income': (2000, 2500)       # £2000-£2500 salary
-    }
-
-    # How often transactions happen per month
-    frequency = {
-        'Groceries': 12,       # ~3 times per week
-        'Transport': 20,       # ~5 times per week
-        'Subscriptions': 3,    # Monthly subscriptions
-        'Eating Out': 8,       # ~2 times per week
-        'Bills': 4,            # Monthly bills
-        'Shopping': 5,         # Few times a month
-        'Income': 1            # Once a month (salary)
-    }
-
-    transactions = []
-    start_date = datetime.now() - timedelta(days=30 * num_months)
+    # One customer-month: FREQUENCY[c] rows of each category c
+    per_month = np.repeat(np.arange(len(CATEGORIES)),
+                          [FREQUENCY[c] for c in CATEGORIES])
+    rows_per_customer = num_months * len(per_month)
+    n = n_customers * rows_per_customer
+
+    category = np.tile(per_month, num_months * n_customers)
+    month = np.tile(np.repeat(np.arange(num_months), len(per_month)),
+                    n_customers)
+    customer = np.repeat(
+        np.arange(first_customer, first_customer + n_customers),
+        rows_per_customer)
+
+    # Random day within each 30-day month
+    day = 30 * month + rng.integers(0, 30, n)
+    dates = np.datetime64(pd.Timestamp(start_date).date(), "D") + day
+
+    merchant = _MERCHANT_OFFSET[category] + \
+        (rng.random(n) * _MERCHANT_COUNT[category]).astype(np.int64)
+    descriptions = add_merchant_variations(merchant, rng)
 
-    # Generate transactions for each month
-    for month in range(num_months):
-        month_start = start_date + timedelta(days=30 * month)
+    amount = np.round(
+        rng.uniform(_AMOUNT_LOW[category], _AMOUNT_HIGH[category]), 2)
 
-        # Generate each type of transaction
-        for category, merchant_list in merchants.items():
-            num_transactions = frequency[category]
+    # Account and category are categoricals built from their codes -
+    # far cheaper than materialising millions of repeated strings
+    labels = [f"C{c:07d}" for c in range(
+        first_customer, first_customer + n_customers)]
 
-            for _ in range(num_transactions):
-                # Random date within the month
-                day_offset = random.randint(0, 29)
-                transaction_date = month_start + timedelta(days=day_offset)
+    order = np.lexsort((day, customer))
+    return pd.DataFrame({
+        'account': pd.Categorical.from_codes(
+            customer[order] - first_customer, labels),
+        'date': dates[order],
+        'description': descriptions[order],
+        'amount': amount[order] * _SIGN[category[order]],
+        'category': pd.Categorical.from_codes(category[order], CATEGORIES)
+    })
 
-                # Random merchant from this category
-                merchant = random.choice(merchant_list)
 
-                # Apply realistic variations
-                merchant = add_merchant_variation(merchant)
+def _chunk_task(args):
+    return generate_chunk(*args)
 
-                # Random amount based on category
-                min_amt, max_amt = typical_amounts[category]
-                amount = round(random.uniform(min_amt, max_amt), 2)
 
-                # Income is positive, expenses are negative
-                if category == 'Income':
-                    amount = abs(amount)
-                else:
-                    amount = -abs(amount)
+def _chunk_tasks(n_customers, num_months, start_date, seed, chunk_customers):
+    for index, first in enumerate(range(0, n_customers, chunk_customers)):
+        size = min(chunk_customers, n_customers - first)
+        yield first, size, num_months, start_date, seed, index
 
-                transactions.append({
-                    'date': transaction_date.strftime('%Y-%m-%d'),
-                    'description': merchant,
-                    'amount': amount,
-                    'category': category  # In real life, we predict this!
-                })
 
-    # Create DataFrame
-    df = pd.DataFrame(transactions)
-    df = df.sort_values('date').reset_index(drop=True)
+def iter_ledger_chunks(n_customers, num_months=6, start_date=None, seed=42,
+                       workers=1, chunk_customers=CHUNK_CUSTOMERS):
+    """
+    Yield ledger chunks in customer order
+
+    workers > 1 generates chunks in a process pool; at most 2 * workers
+    chunks are in flight, so memory stays bounded for any ledger size.
+    """
+    if start_date is None:
+        start_date = pd.Timestamp.now().normalize() - \
+            pd.Timedelta(days=30 * num_months)
+    tasks = _chunk_tasks(
+        n_customers, num_months, start_date, seed, chunk_customers)
+
+    if workers == 1:
+        for task in tasks:
+            yield _chunk_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_chunk_task, task))
+            if len(pending) >= 2 * (workers or os.cpu_count() or 1):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_ledger(path, n_customers, num_months=6, start_date=None, seed=42,
+                 workers=1, chunk_customers=CHUNK_CUSTOMERS):
+    """
+    Stream a multi-customer ledger to CSV or Parquet (by file extension)
+    Returns the number of rows written
+    """
+    parquet = path.endswith(".parquet")
+    writer = None
+    rows = 0
+
+    for chunk in iter_ledger_chunks(n_customers, num_months, start_date,
+                                    seed, workers, chunk_customers):
+        if parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # A fixed schema - the per-chunk categoricals would otherwise
+            # give the last, smaller chunk a different dictionary type
+            schema = pa.schema([
+                ("account", pa.string()),
+                ("date", pa.date32()),
+                ("description", pa.string()),
+                ("amount", pa.float64()),
+                ("category", pa.string()),
+            ])
+            table = pa.Table.from_pandas(
+                chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table)
+        else:
+            chunk.to_csv(path, mode="w" if rows == 0 else "a",
+                         header=rows == 0, index=False)
+        rows += len(chunk)
+
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def generate_transactions(num_months=6, seed=42):
+    """
+    Generate realistic UK bank transactions
+    Think of this as creating a fake bank statement
+    """
+    start_date = datetime.now() - timedelta(days=30 * num_months)
+    df = generate_chunk(0, 1, num_months, start_date, seed=seed)
+
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    df['category'] = df['category'].astype(str)
+    df = df.drop(columns='account')
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
 
     return df
 
 
 # Generate and save the data
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic bank transactions")
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=None,
+                        help="write a multi-customer ledger instead")
+    parser.add_argument("--output", default=None,
+                        help=".csv or .parquet (ledger mode)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-customers", type=int,
+                        default=CHUNK_CUSTOMERS)
+    args = parser.parse_args()
+
+    if args.customers:
+        output = args.output or "ledger.parquet"
+        print(f"🏦 Generating {args.customers:,} customers "
+              f"x {args.months} months → '{output}'...")
+        began = time.perf_counter()
+        rows = write_ledger(
+            output, args.customers, num_months=args.months, seed=args.seed,
+            workers=args.workers, chunk_customers=args.chunk_customers)
+        elapsed = time.perf_counter() - began
+        print(f"✅ Wrote {rows:,} rows in {elapsed:.1f}s "
+              f"({rows / elapsed:,.0f} rows/s)")
+        raise SystemExit
+
     print("🏦 Generating synthetic bank transactions...")
     print("✨ Now with realistic merchant name variations!")
 
     # Create 6 months of data
-    df = generate_transactions(num_months=6)
+    df = generate_transactions(num_months=args.months, seed=args.seed)
 
     # Save to CSV file (like Excel)
     df.to_csv('bank_transactions.csv', index=False)
@@ -0,0 +1,61 @@
+import argparse
+import os
+
+from utils.csv_import import IMPORT_CHUNK_ROWS, import_csv
+from utils.ledger import (
+    DEFAULT_USER, LEDGER_DIR, account_id, set_start_balance
+)
+from utils.sql_backend import refresh_account
+
+
+def run_import(csv_path, user=DEFAULT_USER, account=None,
+               chunk_rows=IMPORT_CHUNK_ROWS, ledger_dir=LEDGER_DIR,
+               start_balance=None):
+    """
+    Stream a statement export into the ledger, reporting rows/s per chunk
+    Rows without an account column go to `account` (default: file name).
+    `start_balance` sets the opening balance of a single-account import.
+    """
+    if account is None:
+        account = os.path.splitext(os.path.basename(csv_path))[0]
+
+    size_mb = os.path.getsize(csv_path) / 1e6
+    print(f"📥 Importing '{csv_path}' ({size_mb:,.0f} MB) "
+          f"in chunks of {chunk_rows:,} rows...")
+
+    def progress(rows, seconds):
+        print(f"   {rows:>12,} rows  {rows / seconds:>9,.0f} rows/s", flush=True)
+
+    summary = import_csv(csv_path, ledger_dir=ledger_dir,
+                         chunk_rows=chunk_rows, user=user, account=account,
+                         progress=progress)
+    print(f"✅ {summary['rows']:,} rows into {summary['accounts']} accounts "
+          f"in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_second']:,.0f} rows/s)")
+    for key in summary["keys"]:
+        refresh_account(*key, ledger_dir=ledger_dir)
+
+    if start_balance is not None:
+        if len(summary["keys"]) != 1:
+            raise ValueError("--start-balance needs a single-account "
+                             f"statement, got {summary['accounts']} accounts")
+        key = summary["keys"][0]
+        set_start_balance(*key, start_balance, ledger_dir)
+        print(f"💷 Opening balance of {account_id(*key)}: {start_balance:,.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming statement import")
+    parser.add_argument("csv_path")
+    parser.add_argument("--user", default=DEFAULT_USER)
+    parser.add_argument("--account", default=None,
+                        help="account for rows without one (default: file name)")
+    parser.add_argument("--chunk-rows", type=int, default=IMPORT_CHUNK_ROWS)
+    parser.add_argument("--ledger-dir", default=LEDGER_DIR)
+    parser.add_argument("--start-balance", type=float, default=None,
+                        help="opening balance (single-account statements)")
+    args = parser.parse_args()
+
+    run_import(args.csv_path, user=args.user, account=args.account,
+               chunk_rows=args.chunk_rows, ledger_dir=args.ledger_dir,
+               start_balance=args.start_balance)
@@ -0,0 +1,251 @@
+"""
+Local mock Open Banking server for offline ingestion tests
+
+Serves Open Banking (UK) style account and transaction endpoints for
+any number of synthetic accounts, with paging, an optional request
+rate limit (429 + Retry-After) and optional per-request latency:
+
+    GET /accounts?page=N
+    GET /accounts/{AccountId}/transactions?fromBookingDateTime=YYYY-MM-DD&page=N
+
+Run standalone:
+    python mock_bank_server.py --accounts 2000 --port 8765 --rate 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from generate_data import generate_chunk
+
+PAGE_SIZE = 100
+BLOCK_ACCOUNTS = 1000
+HISTORY_MONTHS = 6
+
+
+class TokenBucket:
+    """`rate` requests per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take a token; returns 0 or the seconds until one is free"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class MockBank:
+    """
+    Synthetic accounts MOCK0000000 .. and their transactions, generated
+    deterministically in blocks of accounts on first request
+    """
+
+    def __init__(self, n_accounts=100, page_size=PAGE_SIZE, rate=None,
+                 latency=0.0, start_date=None, seed=7):
+        self.n_accounts = n_accounts
+        self.page_size = page_size
+        self.latency = latency
+        self.limiter = TokenBucket(rate) if rate else None
+        self.start_date = pd.Timestamp(start_date) if start_date is not None \
+            else pd.Timestamp.now().normalize() - pd.Timedelta(days=180)
+        self.seed = seed
+        self.requests = 0
+        self.throttled = 0
+        self._blocks = {}
+
+    def _block(self, block):
+        """Columns for accounts block * BLOCK_ACCOUNTS .., one vectorized
+        generate_chunk call per block"""
+        columns = self._blocks.get(block)
+        if columns is None:
+            first = block * BLOCK_ACCOUNTS
+            n = min(BLOCK_ACCOUNTS, self.n_accounts - first)
+            df = generate_chunk(first, n, HISTORY_MONTHS, self.start_date,
+                                seed=self.seed, chunk_index=block)
+            codes = df["account"].cat.codes.to_numpy()
+            columns = {
+                "starts": np.searchsorted(codes, np.arange(n + 1)),
+                "dates": df["date"].dt.strftime("%Y-%m-%d").to_numpy(),
+                "amounts": df["amount"].to_numpy(),
+                "descriptions": df["description"].to_numpy(dtype=object),
+            }
+            self._blocks[block] = columns
+        return columns
+
+    def _transaction_page(self, index, since, page):
+        """One page of an account's Data.Transaction records (+ pages)"""
+        block, offset = divmod(index, BLOCK_ACCOUNTS)
+        columns = self._block(block)
+        start, last = (int(i) for i in columns["starts"][offset:offset + 2])
+        first = start
+        dates = columns["dates"]
+        if since:
+            first += int(np.searchsorted(dates[first:last], since[:10]))
+
+        pages = max(1, -(-(last - first) // self.page_size))
+        lo = first + (page - 1) * self.page_size
+        hi = min(last, lo + self.page_size)
+        amounts = columns["amounts"]
+        records = [
+            {
+                "AccountId": f"MOCK{index:07d}",
+                "TransactionId": f"T{index:07d}-{i - start:05d}",
+                "BookingDateTime": f"{dates[i]}T00:00:00+00:00",
+                "CreditDebitIndicator": "Credit" if amounts[i] > 0 else "Debit",
+                "Amount": {"Amount": f"{abs(amounts[i]):.2f}",
+                           "Currency": "GBP"},
+                "TransactionInformation": str(columns["descriptions"][i])
+            }
+            for i in range(lo, hi)
+        ]
+        return records, pages
+
+    def _links(self, self_url, page, pages):
+        links = {"Self": f"{self_url}page={page}"}
+        if page < pages:
+            links["Next"] = f"{self_url}page={page + 1}"
+        return links
+
+    def handle(self, method, target):
+        """(status, headers, JSON body) for one request"""
+        self.requests += 1
+        if method != "GET":
+            return 405, {}, {"Message": "Method not allowed"}
+
+        if self.limiter is not None:
+            wait = self.limiter.take()
+            if wait:
+                self.throttled += 1
+                return 429, {"Retry-After": f"{max(1, round(wait))}"}, \
+                    {"Message": "Too many requests"}
+
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        page = max(1, int(query.get("page", 1)))
+        parts = [p for p in url.path.split("/") if p]
+
+        if parts == ["accounts"]:
+            pages = max(1, -(-self.n_accounts // self.page_size))
+            first = (page - 1) * self.page_size
+            accounts = [{"AccountId": f"MOCK{i:07d}", "Currency": "GBP",
+                         "Nickname": f"Account {i:04d}"}
+                        for i in range(first, min(self.n_accounts,
+                                                  first + self.page_size))]
+            return 200, {}, {"Data": {"Account": accounts},
+                             "Links": self._links("/accounts?", page, pages),
+                             "Meta": {"TotalPages": pages}}
+
+        if len(parts) == 3 and parts[0] == "accounts" and \
+                parts[2] == "transactions":
+            account = parts[1]
+            if not (account.startswith("MOCK") and account[4:].isdigit()
+                    and int(account[4:]) < self.n_accounts):
+                return 404, {}, {"Message": f"Unknown account {account}"}
+
+            since = query.get("fromBookingDateTime")
+            records, pages = self._transaction_page(int(account[4:]), since,
+                                                    page)
+            base = f"/accounts/{account}/transactions?"
+            if since:
+                base += f"fromBookingDateTime={since}&"
+            return 200, {}, {"Data": {"Transaction": records},
+                             "Links": self._links(base, page, pages),
+                             "Meta": {"TotalPages": pages}}
+
+        return 404, {}, {"Message": "Not found"}
+
+    # ---------- HTTP/1.1 (keep-alive) ----------
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection" and \
+                            value.strip().lower() == "close":
+                        keep_alive = False
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                try:
+                    status, headers, payload = self.handle(method, target)
+                    body = json.dumps(payload).encode()
+                except Exception as e:
+                    status, headers = 500, {}
+                    body = json.dumps({"Message": str(e)}).encode()
+                head = [f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(body)}"]
+                head += [f"{k}: {v}" for k, v in headers.items()]
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving; returns (server, base URL)"""
+        server = await asyncio.start_server(self._serve_connection, host,
+                                            port, backlog=1024)
+        port = server.sockets[0].getsockname()[1]
+        return server, f"http://{host}:{port}"
+
+
+_REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed",
+            429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+async def _serve_forever(bank, host, port):
+    server, url = await bank.start(host, port)
+    print(f"🏦 Mock bank with {bank.n_accounts} accounts at {url}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="requests per second before answering 429")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    args = parser.parse_args()
+
+    bank = MockBank(args.accounts, page_size=args.page_size, rate=args.rate,
+                    latency=args.latency)
+    try:
+        asyncio.run(_serve_forever(bank, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,12 +1,19 @@
-from utils.merchant_utils import map_to_brand
-from utils.merchant_utils import normalize_merchant
+from utils.data_access import filter_by_date
+from utils.ledger import (
+    selected_account, load_account, account_balance_index, account_cube,
+    account_aggregate_between, account_date_range, account_start_balance
+)
+from utils.sql_backend import (
+    sql_enabled, range_totals, top_merchants, recent_transactions
+)
 from utils.ml_models import detect_recurring_transactions
-from utils.ml_models import predict_low_balance_dates
+from utils.cashflow_simulation import (
+    HISTORY_COLUMNS, simulate_cashflow, first_risk_date
+)
 from utils.styles import get_custom_css, get_category_icon, get_category_color, format_currency
+from utils.tracing import span, start_trace, trace_panel
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 import sys
 sys.path.append('..')
 
@@ -17,26 +24,13 @@ st.set_page_config(
     layout="wide"
 )
 
+start_trace()
+
 # Load custom CSS
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
-# Load data
-
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv('bank_transactions.csv')
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.to_period('M').astype(str)
-    return df
-
-
-df = load_data()
-
-df["merchant_clean"] = df["description"].apply(normalize_merchant)
-df["brand"] = df["merchant_clean"].apply(map_to_brand)
-
-predicted_tx = detect_recurring_transactions(df)
+# Load data (only the account selected in the sidebar)
+user, account = selected_account()
 
 # Header
 col1, col2, col3 = st.columns([2, 1, 1])
@@ -48,8 +42,7 @@ with col1:
 
 st.subheader("📅 Select Date Range")
 
-min_date = df["date"].min().date()
-max_date = df["date"].max().date()
+min_date, max_date = (d.date() for d in account_date_range(user, account))
 
 start_date, end_date = st.date_input(
     "Choose date range",
@@ -58,11 +51,18 @@ start_date, end_date = st.date_input(
     max_value=max_date
 )
 
-# Filter the data
-filtered_df = df[
-    (df["date"].dt.date >= start_date) &
-    (df["date"].dt.date <= end_date)
-]
+# Filter the data. With the SQL backend answering spending and recent
+# transactions, only the columns the recurring detector and the cash-flow
+# simulation read are loaded, the window by date pushdown.
+if sql_enabled():
+    df = load_account(user, account, columns=HISTORY_COLUMNS)
+    filtered_df = load_account(user, account, start_date, end_date,
+                               columns=HISTORY_COLUMNS)
+else:
+    df = load_account(user, account)
+    filtered_df = filter_by_date(df, start_date, end_date)
+
+predicted_tx = detect_recurring_transactions(df)
 
 with col3:
     st.markdown("<div style='text-align:right; padding:10px;'>⚙️ Settings</div>",
@@ -70,20 +70,29 @@ with col3:
 
 st.markdown("<br>", unsafe_allow_html=True)
 
-# Calculate key metrics (date-aware)
-
-# we added 1000 to make forecasting more better and real, During production we will use curr_balance = bank_APIs
-current_balance = filtered_df['amount'].sum() + 1000
+# Calculate key metrics (date-aware): in the embedded SQL engine when one
+# is configured, otherwise from the monthly aggregate cube
+today = pd.Timestamp.today()
+this_month = today.to_period("M")
 
-range_income = filtered_df[filtered_df['amount'] > 0]['amount'].sum()
-range_expenses = abs(filtered_df[filtered_df['amount'] < 0]['amount'].sum())
+if sql_enabled():
+    totals = range_totals(user, account, start_date, end_date)
+    mtd_totals = range_totals(user, account, this_month.start_time,
+                              this_month.end_time)
+else:
+    totals = account_aggregate_between(
+        user, account, start_date, end_date).totals()
+    mtd_totals = account_cube(user, account).between(
+        this_month, this_month).totals()
 
-today = pd.Timestamp.today()
+# Opening balance from the registry (set_start_balance), else the default
+current_balance = totals["net"] + account_start_balance(user, account)
 
-mtd_df = df[df["date"].dt.to_period("M") == today.to_period("M")]
+range_income = totals["income"]
+range_expenses = totals["expenses"]
 
-mtd_income = mtd_df[mtd_df["amount"] > 0]["amount"].sum()
-mtd_expenses = abs(mtd_df[mtd_df["amount"] < 0]["amount"].sum())
+mtd_income = mtd_totals["income"]
+mtd_expenses = mtd_totals["expenses"]
 
 
 # Big Balance Card
@@ -152,17 +161,25 @@ if predicted_tx is not None and len(predicted_tx) > 0:
     """, unsafe_allow_html=True)
 
 
-# Cash Flow Alert
-low_balance = predict_low_balance_dates(filtered_df, threshold=100)
+# Cash Flow Alert (Monte Carlo over recurring + discretionary spend)
+window_balance = account_balance_index(user, account).frame(
+    start_date, end_date,
+    start_balance=account_start_balance(user, account))
+low_balance = None
+if not window_balance.empty:
+    low_balance = first_risk_date(simulate_cashflow(
+        filtered_df, window_balance['balance'].iloc[-1], threshold=100,
+        days=30, seed=0))
 if low_balance is not None:
     alert_date = low_balance['date'].strftime('%d %b')
+    alert_chance = f"{low_balance['p_below']:.0%}"
     st.markdown(f"""
     <div class="alert-card alert-warning">
         <div style="display: flex; align-items: center;">
             <span class="alert-icon">⚠️</span>
             <div>
                 <div class="alert-title">Cash Flow Alert</div>
-                <div class="alert-text">Your balance may drop below £100 on {alert_date}. Consider moving expenses or transferring funds.</div>
+                <div class="alert-text">There is a {alert_chance} chance your balance drops below £100 on {alert_date}. Consider moving expenses or transferring funds.</div>
             </div>
         </div>
     </div>
@@ -174,31 +191,36 @@ st.markdown("<br>", unsafe_allow_html=True)
 st.markdown("<h2 style='color:#1e293b;'>📊 Spending by Category</h2>",
             unsafe_allow_html=True)
 
-spending_data = (
-    filtered_df[filtered_df['amount'] < 0]
-    .groupby('merchant_clean')['amount']
-    .sum()
-    .abs()
-    .sort_values(ascending=False)
-    .head(10)
-)
+# Pushed into the embedded SQL engine when one is configured
+if sql_enabled():
+    spending_data = top_merchants(user, account, start_date, end_date, n=10)
+else:
+    spending_data = (
+        filtered_df[filtered_df['amount'] < 0]
+        .groupby('merchant_clean', observed=True)['amount']
+        .sum()
+        .abs()
+        .sort_values(ascending=False)
+        .head(10)
+    )
 max_spending = spending_data.max()
 
-for category, amount in spending_data.items():
-    icon = get_category_icon(category)
-    percentage = (amount / max_spending) * 100
+with span("dashboard.render.spending", rows=len(spending_data)):
+    for category, amount in spending_data.items():
+        icon = get_category_icon(category)
+        percentage = (amount / max_spending) * 100
 
-    st.markdown(f"""
-    <div style="margin: 1rem 0;">
-        <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
-            <span style="font-weight: 600; font-size: 1.1rem;">{icon} {category} </span>
-            <span style="font-weight: 700; font-size: 1.1rem;">{format_currency(amount)}</span>
-        </div>
-        <div class="progress-bar">
-            <div class="progress-fill" style="width: {percentage}%; background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);"></div>
+        st.markdown(f"""
+        <div style="margin: 1rem 0;">
+            <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
+                <span style="font-weight: 600; font-size: 1.1rem;">{icon} {category} </span>
+                <span style="font-weight: 700; font-size: 1.1rem;">{format_currency(amount)}</span>
+            </div>
+            <div class="progress-bar">
+                <div class="progress-fill" style="width: {percentage}%; background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);"></div>
+            </div>
         </div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -206,28 +228,32 @@ st.markdown("<br>", unsafe_allow_html=True)
 st.markdown("<h2 style='color:#1e293b;'>📝 Recent Transactions</h2>",
             unsafe_allow_html=True)
 
-recent = filtered_df.sort_values('date', ascending=False).head(10)
+if sql_enabled():
+    recent = recent_transactions(user, account, start_date, end_date, n=10)
+else:
+    recent = filtered_df.sort_values('date', ascending=False).head(10)
 
-for _, transaction in recent.iterrows():
-    icon = get_category_icon(transaction['category'])
-    color_class = get_category_color(transaction['category'])
-    date_str = pd.to_datetime(transaction['date']).strftime('%d %b')
+with span("dashboard.render.recent", rows=len(recent)):
+    for _, transaction in recent.iterrows():
+        icon = get_category_icon(transaction['category'])
+        color_class = get_category_color(transaction['category'])
+        date_str = pd.to_datetime(transaction['date']).strftime('%d %b')
 
-    amount_color = '#22c55e' if transaction['amount'] > 0 else '#1e293b'
-    amount_prefix = '+' if transaction['amount'] > 0 else ''
+        amount_color = '#22c55e' if transaction['amount'] > 0 else '#1e293b'
+        amount_prefix = '+' if transaction['amount'] > 0 else ''
 
-    st.markdown(f"""
-    <div class="transaction-item">
-        <div class="transaction-icon {color_class}">{icon}</div>
-        <div style="flex: 1;">
-            <div style="font-weight: 600; font-size: 1.05rem; color: #1e293b;">{transaction['merchant_clean']}</div>
-            <div style="color: #64748b; font-size: 0.9rem;">{transaction['category']} • {date_str}</div>
-        </div>
-        <div style="font-weight: 700; font-size: 1.2rem; color: {amount_color};">
-            {amount_prefix}{format_currency(transaction['amount'])}
+        st.markdown(f"""
+        <div class="transaction-item">
+            <div class="transaction-icon {color_class}">{icon}</div>
+            <div style="flex: 1;">
+                <div style="font-weight: 600; font-size: 1.05rem; color: #1e293b;">{transaction['merchant_clean']}</div>
+                <div style="color: #64748b; font-size: 0.9rem;">{transaction['category']} • {date_str}</div>
+            </div>
+            <div style="font-weight: 700; font-size: 1.2rem; color: {amount_color};">
+                {amount_prefix}{format_currency(transaction['amount'])}
+            </div>
         </div>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
 
 # Quick Stats
 st.markdown("<br><br>", unsafe_allow_html=True)
@@ -237,7 +263,8 @@ st.markdown("<h2 style='color:#1e293b;'>📈 Quick Stats</h2>",
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    avg_transaction = filtered_df[filtered_df['amount'] < 0]['amount'].mean()
+    avg_transaction = -range_expenses / totals["expense_count"] \
+        if totals["expense_count"] else float("nan")
     st.markdown(f"""
     <div class="insight-card">
         <div style="color: #64748b; font-size: 0.9rem; margin-bottom: 0.5rem;">Avg Transaction</div>
@@ -246,7 +273,7 @@ with col1:
     """, unsafe_allow_html=True)
 
 with col2:
-    transaction_count = len(filtered_df[filtered_df['amount'] < 0])
+    transaction_count = totals["expense_count"]
     st.markdown(f"""
     <div class="insight-card">
         <div style="color: #64748b; font-size: 0.9rem; margin-bottom: 0.5rem;">Total Transactions</div>
@@ -274,3 +301,5 @@ with col4:
         <div style="font-size: 1.8rem; font-weight: 700; color: #22c55e;">{savings_rate:.1f}%</div>
     </div>
     """, unsafe_allow_html=True)
+
+trace_panel()
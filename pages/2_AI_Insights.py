@@ -1,8 +1,12 @@
-from utils.merchant_utils import normalize_merchant
-from utils.merchant_utils import map_to_brand
-from utils.ml_models import forecast_balance_arima
-from utils.ml_models import forecast_summary
-from utils.ml_models import forecast_balance
+from utils.ledger import (
+    selected_account, account_date_range, load_account,
+    account_balance_index, account_aggregate_between, account_start_balance
+)
+from utils.aggregate_cube import EXPENSE
+from utils.forecast_cache import forecast_balance_cached
+from utils.cashflow_simulation import (
+    simulate_balance_paths, balance_risk, first_risk_date
+)
 from utils.ml_models import detect_recurring_transactions
 from utils.ml_models import (
     calculate_savings_opportunity,
@@ -10,6 +14,7 @@ from utils.ml_models import (
     detect_spending_patterns
 )
 from utils.styles import get_custom_css, format_currency
+from utils.tracing import start_trace, trace_panel
 import streamlit as st
 import pandas as pd
 import sys
@@ -22,23 +27,14 @@ st.set_page_config(
     layout="wide"
 )
 
+start_trace()
+
 # Load custom CSS
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
-# Load data
-
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv('bank_transactions.csv')
-    df['date'] = pd.to_datetime(df['date'])
-    return df
-
-
-df = load_data()
-
-df["merchant_clean"] = df["description"].apply(normalize_merchant)
-df["brand"] = df["merchant_clean"].apply(map_to_brand)
+# Load data (only the selected window is read below)
+user, account = selected_account()
+first_date, last_date = account_date_range(user, account)
 
 # Header
 st.markdown("<h1 style='margin-bottom: 2rem; color:#1e293b;'>🤖 AI Insights</h1>",
@@ -49,8 +45,8 @@ st.markdown("<p style='font-size: 1.1rem; color: #64748b; margin-bottom: 2rem;'>
 
 st.subheader("📅 Select Date Range")
 
-min_date = df["date"].min().date()
-max_date = df["date"].max().date()
+min_date = first_date.date()
+max_date = last_date.date()
 
 start_date, end_date = st.date_input(
     "Choose date range",
@@ -60,10 +56,8 @@ start_date, end_date = st.date_input(
 )
 
 # Filter data
-filtered_df = df[
-    (df["date"].dt.date >= start_date) &
-    (df["date"].dt.date <= end_date)
-]
+filtered_df = load_account(user, account, start_date, end_date)
+range_cube = account_aggregate_between(user, account, start_date, end_date)
 
 st.caption(
     f"Showing insights from {start_date.strftime('%d %b %Y')} "
@@ -92,42 +86,62 @@ with col2:
     )
 
 
-forecast_df = forecast_balance_arima(filtered_df, days=30)
+accurate_forecast = st.toggle(
+    "Accurate forecast (slower)",
+    value=False,
+    help="Forecast used to check upcoming payments against your balance. "
+         "Accurate picks the best model that has been answering within "
+         "half a second."
+)
+
+window_balance = account_balance_index(user, account).frame(
+    start_date, end_date,
+    start_balance=account_start_balance(user, account))
+
+forecast_df = forecast_balance_cached(
+    filtered_df, days=30, balance_df=window_balance,
+    model="auto" if accurate_forecast else "fast")
 
 if forecast_df is None:
-    forecast_df = forecast_balance(filtered_df, days=30)
+    forecast_df = forecast_balance_cached(
+        filtered_df, days=30, balance_df=window_balance, model="trend")
 
-# 🔮 Goal Evaluation
+# 🔮 Goal Evaluation (Monte Carlo cash-flow simulation)
 
-goal_result = None
+LOW_BALANCE_THRESHOLD = 200
+MAX_GOAL_DAYS = 366
 
-if forecast_df is not None and not forecast_df.empty:
-    goal_date_ts = pd.to_datetime(goal_date)
+goal_result = None
+low_balance = None
 
-    future_row = forecast_df[forecast_df["date"] >= goal_date_ts]
+if not filtered_df.empty and not window_balance.empty:
+    last_day = filtered_df["date"].max().normalize()
+    goal_days = (pd.Timestamp(goal_date) - last_day).days
+    horizon = goal_days if 30 < goal_days <= MAX_GOAL_DAYS else 30
 
-    if not future_row.empty:
-        projected_balance = future_row.iloc[0]["balance"]
+    sim_dates, paths = simulate_balance_paths(
+        filtered_df, window_balance["balance"].iloc[-1], days=horizon,
+        seed=0)
 
+    if 1 <= goal_days <= horizon:
+        at_goal = paths[:, goal_days - 1]
+        probability = (at_goal >= goal_amount).mean()
         goal_result = {
-            "projected_balance": projected_balance,
-            "achieved": projected_balance >= goal_amount
+            "projected_balance": float(pd.Series(at_goal).median()),
+            "probability": probability,
+            "achieved": probability >= 0.5
         }
 
-summary = forecast_summary(forecast_df)
+    low_balance = first_risk_date(balance_risk(
+        sim_dates[:30], paths[:, :30], LOW_BALANCE_THRESHOLD))
 
-if summary and summary["low_balance_date"]:
+if low_balance is not None:
     st.warning(
-        f"⚠️ Forecast shows your balance may fall below £200 on "
-        f"{summary['low_balance_date'].strftime('%d %b')}."
+        f"⚠️ {low_balance['p_below']:.0%} chance your balance falls below "
+        f"£{LOW_BALANCE_THRESHOLD} on {low_balance['date'].strftime('%d %b')}."
     )
 recurring = detect_recurring_transactions(filtered_df)
 
-df["merchant_clean"] = df["description"].apply(normalize_merchant)
-df["brand"] = df["merchant_clean"].apply(map_to_brand)
-
-recurring = detect_recurring_transactions(filtered_df)
-
 upcoming = pd.DataFrame()
 
 if recurring is not None and not recurring.empty and forecast_df is not None:
@@ -149,7 +163,7 @@ if recurring is not None and not recurring.empty and forecast_df is not None:
         how="left"
     )
 
-    upcoming["risk"] = upcoming["balance"] < 200
+    upcoming["risk"] = upcoming["balance"] < LOW_BALANCE_THRESHOLD
 
 st.markdown("<h2 style='color:#1e293b;'>🔍 Goal Outcome</h2>",
             unsafe_allow_html=True)
@@ -165,7 +179,8 @@ if goal_result:
                     <div class="alert-text">
                         You are projected to have <strong>{format_currency(goal_result['projected_balance'])}</strong>
                         by <strong>{goal_date.strftime('%d %b %Y')}</strong>,
-                        exceeding your goal of <strong>{format_currency(goal_amount)}</strong>.
+                        exceeding your goal of <strong>{format_currency(goal_amount)}</strong>
+                        ({goal_result['probability']:.0%} of simulated outcomes reach it).
                     </div>
                 </div>
             </div>
@@ -183,18 +198,19 @@ if goal_result:
                     <div class="alert-text">
                         You are projected to have <strong>{format_currency(goal_result['projected_balance'])}</strong>
                         by <strong>{goal_date.strftime('%d %b %Y')}</strong>,
-                        which is <strong>{format_currency(shortfall)}</strong> short of your goal.
+                        which is <strong>{format_currency(shortfall)}</strong> short of your goal
+                        (only {goal_result['probability']:.0%} of simulated outcomes reach it).
                     </div>
                 </div>
             </div>
         </div>
         """, unsafe_allow_html=True)
 else:
-    st.info("Not enough forecast data to evaluate your goal.\n"
-            "forecast reliability decreases for goals more than 30 days")
+    st.info("Not enough data to evaluate your goal.\n"
+            f"Goals must fall within {MAX_GOAL_DAYS} days of the latest transaction.")
 
 # Savings Opportunity
-savings_data = calculate_savings_opportunity(filtered_df)
+savings_data = calculate_savings_opportunity(range_cube)
 if savings_data['amount'] > 0:
     st.markdown(f"""
     <div class="alert-card alert-success">
@@ -315,7 +331,7 @@ if subscriptions is not None and len(subscriptions) > 0:
 st.markdown("<br>", unsafe_allow_html=True)
 
 # Spending Pattern Detection
-patterns = detect_spending_patterns(filtered_df)
+patterns = detect_spending_patterns(range_cube)
 if len(patterns) > 0:
     st.markdown("<h3 style='color:#1e293b; margin-top: 1.5rem;'>📊 Spending Pattern Detected</h3>",
                 unsafe_allow_html=True)
@@ -401,13 +417,7 @@ if len(unused) > 0:
         'text': f'You could save {format_currency(unused_yearly)}/year by canceling unused subscriptions.'
     })
 
-top_category = (
-    filtered_df[filtered_df['amount'] < 0]
-    .groupby('category')['amount']
-    .sum()
-    .abs()
-    .idxmax()
-)
+top_category = range_cube.by("category", EXPENSE).abs().idxmax()
 tips.append({
     'icon': '📊',
     'title': f'Monitor Your {top_category} Spending',
@@ -431,3 +441,5 @@ for tip in tips:
     </div>
     """, unsafe_allow_html=True)
     st.markdown("<br>", unsafe_allow_html=True)
+
+trace_panel()
@@ -1,10 +1,19 @@
 
-from utils.merchant_utils import map_to_brand
-from utils.merchant_utils import normalize_merchant
-from utils.ml_models import forecast_balance_arima
-from utils.ml_models import forecast_balance
-from utils.ml_models import detect_recurring_transactions, calculate_daily_balance
+from utils.ledger import (
+    selected_account, account_id, account_date_range, load_account,
+    account_balance_index, account_aggregate_between, account_start_balance,
+    ledger_version
+)
+from utils.aggregate_cube import INCOME
+from utils.batch_forecast import read_forecast_table, lookup_forecast
+from utils.forecast_cache import (
+    forecast_balance_cached, forecast_modes, resolve_mode
+)
+from utils.forecasters import latency_report
+from utils.incremental_forecast import warm_forecast
+from utils.ml_models import detect_recurring_transactions
 from utils.styles import get_custom_css, format_currency, get_category_icon
+from utils.tracing import start_trace, trace_panel
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
@@ -19,20 +28,14 @@ st.set_page_config(
     layout="wide"
 )
 
+start_trace()
+
 # Load custom CSS
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
-# Load data
-
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv('bank_transactions.csv')
-    df['date'] = pd.to_datetime(df['date'])
-    return df
-
-
-df = load_data()
+# Load data (only the selected window is read below)
+user, account = selected_account()
+first_date, last_date = account_date_range(user, account)
 
 # Header
 st.markdown("<h1 style='margin-bottom: 2rem; color:#1e293b;'>📈 Cash Flow Forecast</h1>",
@@ -44,8 +47,8 @@ st.markdown("<h1 style='margin-bottom: 2rem; color:#1e293b;'>📈 Cash Flow Fore
 
 st.subheader("📅 Select History Window")
 
-min_date = df["date"].min().date()
-max_date = df["date"].max().date()
+min_date = first_date.date()
+max_date = last_date.date()
 
 start_date, end_date = st.date_input(
     "Use transactions from",
@@ -54,10 +57,7 @@ start_date, end_date = st.date_input(
     max_value=max_date
 )
 
-history_df = df[
-    (df["date"].dt.date >= start_date) &
-    (df["date"].dt.date <= end_date)
-]
+history_df = load_account(user, account, start_date, end_date)
 
 st.caption(
     f"Forecast based on data from {start_date.strftime('%d %b %Y')} "
@@ -73,17 +73,53 @@ forecast_days = st.slider(
     step=7
 )
 
+modes = forecast_modes()
+forecast_mode = modes[st.radio(
+    "Forecast mode",
+    list(modes),
+    horizontal=True,
+    help="Fast runs a NumPy Holt-Winters model instantly. "
+         "Auto picks the most accurate model that has been answering "
+         "within half a second. "
+         "Accurate modes fit ARIMA / Prophet and take longer."
+)]
+if forecast_mode == "auto":
+    forecast_mode = resolve_mode(forecast_mode)
+    st.caption(f"Auto mode: using **{forecast_mode}**")
+
 # Get balance data
-balance_df = calculate_daily_balance(history_df)
+balance_df = account_balance_index(user, account).frame(
+    start_date, end_date,
+    start_balance=account_start_balance(user, account))
 current_balance = balance_df['balance'].iloc[-1]
 current_date = balance_df['date'].iloc[-1]
 
 
-forecast_df = forecast_balance_arima(history_df, days=forecast_days)
+# ARIMA is served from the overnight batch run (forecast_accounts.py)
+# when it covers this window, then from the warm per-account model when
+# the window runs to the latest transaction, otherwise fitted here
+forecast_df = None
+if forecast_mode == "arima":
+    forecast_df = lookup_forecast(
+        read_forecast_table(), account_id(user, account), start_date,
+        end_date, forecast_days,
+        source_hash=ledger_version()
+    )
+    if forecast_df is None:
+        forecast_df = warm_forecast(
+            account_id(user, account),
+            account_balance_index(user, account).frame(), balance_df,
+            forecast_days)
+
+if forecast_df is None:
+    forecast_df = forecast_balance_cached(
+        history_df, days=forecast_days, balance_df=balance_df,
+        model=forecast_mode)
 
 if forecast_df is None:
     st.warning("Not enough data for ML forecast. Using simple trend instead.")
-    forecast_df = forecast_balance(history_df, days=forecast_days)
+    forecast_df = forecast_balance_cached(
+        history_df, days=forecast_days, balance_df=balance_df, model="trend")
 
 
 if forecast_df is None or forecast_df.empty:
@@ -239,10 +275,6 @@ st.markdown("<h2 style='color:#1e293b;'>📅 Predicted Transactions</h2>",
 st.markdown("<p style='color:#64748b; margin-bottom: 1.5rem;'>Based on your recurring payment patterns</p>",
             unsafe_allow_html=True)
 
-history_df["merchant_clean"] = history_df["description"].apply(
-    normalize_merchant)
-history_df["brand"] = history_df["merchant_clean"].apply(map_to_brand)
-
 recurring = detect_recurring_transactions(history_df)
 
 
@@ -313,16 +345,9 @@ st.markdown("<h2 style='color:#1e293b;'>💡 Forecast Insights</h2>",
 col1, col2 = st.columns(2)
 
 with col1:
-    income_df = history_df[history_df["amount"] > 0]
-
-    predicted_income = (
-        income_df
-        .groupby(income_df["date"].dt.to_period("M"))["amount"]
-        .sum()
-        .mean()
-        if not income_df.empty
-        else 0
-    )
+    monthly_income = account_aggregate_between(
+        user, account, start_date, end_date).monthly(INCOME)
+    predicted_income = monthly_income.mean() if len(monthly_income) else 0
     st.markdown(f"""
     <div class="insight-card" style="background: linear-gradient(135deg, #f0fdf4 0%, #dcfce7 100%);">
         <div style="display: flex; align-items: center; gap: 1rem;">
@@ -356,3 +381,9 @@ with col2:
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+# Timings behind the Auto mode choice
+with st.sidebar.expander("Forecaster latency"):
+    st.dataframe(latency_report(), hide_index=True)
+
+trace_panel()
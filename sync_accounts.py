@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+
+from mock_bank_server import MockBank
+from utils.ledger import DEFAULT_USER
+from utils.open_banking import (
+    CHECKPOINT_EVERY, MAX_CONCURRENT_ACCOUNTS, MAX_CONNECTIONS, sync_bank
+)
+
+
+async def _sync(args):
+    server = None
+    base_url = args.base_url
+
+    if args.mock:
+        bank = MockBank(args.mock, rate=args.mock_rate, latency=args.latency)
+        server, base_url = await bank.start()
+        print(f"🏦 Mock bank with {args.mock} accounts at {base_url}")
+
+    try:
+        return await sync_bank(
+            base_url,
+            bank=args.bank,
+            user=args.user,
+            token=args.token,
+            rate_limit=args.rate if args.rate is not None else "auto",
+            max_connections=args.connections,
+            concurrency=args.concurrency,
+            checkpoint_every=args.checkpoint_every
+        )
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+def run_sync(args):
+    """Sync one bank connection into the ledger and print throughput"""
+    print(f"🔄 Syncing {args.bank} accounts for user '{args.user}'...")
+    summary = asyncio.run(_sync(args))
+
+    print(f"✅ {summary['accounts']} accounts, {summary['rows']:,} transactions "
+          f"in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_second']:,.0f} rows/s)")
+    print(f"   {summary['requests']:,} requests, {summary['retries']:,} retries")
+    for account, error in summary["errors"].items():
+        print(f"⚠️  {account}: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open Banking account sync")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--bank", default="mock")
+    parser.add_argument("--user", default=DEFAULT_USER)
+    parser.add_argument("--token", default=None)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="requests per second (default: the bank's limit)")
+    parser.add_argument("--connections", type=int, default=MAX_CONNECTIONS)
+    parser.add_argument("--concurrency", type=int,
+                        default=MAX_CONCURRENT_ACCOUNTS)
+    parser.add_argument("--checkpoint-every", type=int,
+                        default=CHECKPOINT_EVERY)
+    parser.add_argument("--mock", type=int, default=0, metavar="N",
+                        help="serve N synthetic accounts in-process")
+    parser.add_argument("--mock-rate", type=float, default=None,
+                        help="mock bank requests per second before 429s")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="mock bank seconds per response")
+    args = parser.parse_args()
+
+    run_sync(args)
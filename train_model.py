@@ -5,6 +5,9 @@ from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
 import pickle
+import sys
+from utils.compact_model import export_compact_model
+from utils.ml_models import categorize_batch
 
 
 def train_transaction_categorizer():
@@ -61,6 +64,8 @@ def train_transaction_categorizer():
     with open('vectorizer.pkl', 'wb') as f:
         pickle.dump(vectorizer, f)
 
+    export_compact_model(model, vectorizer)
+
     print("✅ Model saved successfully!")
 
     # Step 7: Test with real examples
@@ -72,10 +77,25 @@ def train_transaction_categorizer():
         "NANDOS RESTAURANT"
     ]
 
-    for example in test_examples:
-        prediction = model.predict(vectorizer.transform([example]))[0]
-        print(f"  '{example}' → {prediction}")
+    predictions = categorize_batch(test_examples, model, vectorizer)
+    for _, row in predictions.iterrows():
+        print(f"  '{row['description']}' → {row['category']} "
+              f"({row['probability']:.0%})")
+
+
+def export_existing_model():
+    """Write the compact artifact from the current pickles, without retraining"""
+    with open('categorizer_model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    with open('vectorizer.pkl', 'rb') as f:
+        vectorizer = pickle.load(f)
+
+    meta = export_compact_model(model, vectorizer)
+    print(f"✅ Exported compact model ({meta['n_features']} features)")
 
 
 if __name__ == "__main__":
-    train_transaction_categorizer()
+    if "--export-only" in sys.argv:
+        export_existing_model()
+    else:
+        train_transaction_categorizer()
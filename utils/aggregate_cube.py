@@ -0,0 +1,312 @@
+import numpy as np
+import pandas as pd
+
+from utils.compact_frame import transaction_amounts, transaction_months
+
+# ---------------------------
+# Monthly aggregate cube
+#
+# (month, category, sign, brand) -> sum and count of amounts, built in a
+# single pass over the rows (one int64 key per row + bincount). Summary
+# metrics (monthly income / expenses, category spend per month, range
+# totals) read from the cells, so they cost
+# O(months x categories x brands) instead of O(rows). New
+# transactions fold in with append(), which groups only the new rows and
+# re-merges them with the existing cells. The ledger keeps one cube per
+# account shard (_cube.npz, see save / load) and appends each import or
+# sync to it.
+#
+# Months are Period ordinals (months since 1970-01); sign is +1 for
+# income, -1 for expenses and 0 for zero amounts.
+# ---------------------------
+
+CUBE_KEYS = ["month", "category", "sign", "brand"]
+
+INCOME = 1
+EXPENSE = -1
+
+
+def _empty_cells():
+    return pd.DataFrame({
+        "month": pd.Series(dtype=np.int64),
+        "category": pd.Series(dtype=object),
+        "sign": pd.Series(dtype=np.int8),
+        "brand": pd.Series(dtype=object),
+        "total": pd.Series(dtype=np.float64),
+        "count": pd.Series(dtype=np.int64),
+    })
+
+
+def _regroup(cells):
+    """Merge cells sharing a key, keeping first-appearance order"""
+    return (
+        cells.groupby(CUBE_KEYS, sort=False, dropna=False)
+        .agg(total=("total", "sum"), count=("count", "sum"))
+        .reset_index()
+    )
+
+
+def group_transactions(df, groups=None):
+    """
+    Cube cells for a frame of transactions (date, amount, category[,
+    brand]) or a compact frame
+
+    groups: optional non-negative int code per row (e.g. the account);
+    rows of different groups never share a cell and the cells get a
+    "group" column (see cubes_by_group)
+    """
+    if df is None or len(df) == 0:
+        cells = _empty_cells()
+        if groups is not None:
+            cells.insert(0, "group", pd.Series(dtype=np.int64))
+        return cells
+
+    amounts = transaction_amounts(df)
+    months = transaction_months(df)
+    signs = np.sign(amounts).astype(np.int64)
+    category_codes, categories = pd.factorize(
+        df["category"], use_na_sentinel=False)
+    if "brand" in df.columns:
+        brand_codes, brands = pd.factorize(
+            df["brand"], use_na_sentinel=False)
+    else:
+        brand_codes, brands = np.zeros(len(df), dtype=np.int64), [None]
+
+    # One int64 key per row; factorize keeps first-appearance order
+    first_month = months.min()
+    key = months - first_month
+    if groups is not None:
+        groups = np.asarray(groups, dtype=np.int64)
+        key = groups * (months.max() - first_month + 1) + key
+    key = key * len(categories) + category_codes
+    key = (key * 3 + signs + 1) * len(brands) + brand_codes
+    cell_ids, keys = pd.factorize(key)
+    firsts = np.unique(cell_ids, return_index=True)[1]
+
+    cells = pd.DataFrame({
+        "month": months[firsts],
+        "category": np.asarray(categories, dtype=object)[category_codes[firsts]],
+        "sign": signs[firsts].astype(np.int8),
+        "brand": np.asarray(brands, dtype=object)[brand_codes[firsts]],
+        "total": np.bincount(cell_ids, weights=amounts,
+                             minlength=len(keys)),
+        "count": np.bincount(cell_ids, minlength=len(keys)).astype(np.int64),
+    })
+    if groups is not None:
+        cells.insert(0, "group", groups[firsts])
+    return cells
+
+
+def cubes_by_group(cells):
+    """
+    {group: AggregateCube} from group_transactions(df, groups) cells,
+    possibly several frames' cells concatenated
+    """
+    merged = (
+        cells.groupby(["group", *CUBE_KEYS], sort=False, dropna=False)
+        .agg(total=("total", "sum"), count=("count", "sum"))
+        .reset_index()
+    )
+    # Contiguous runs per group, sliced instead of a groupby per group
+    order = np.argsort(merged["group"].to_numpy(), kind="stable")
+    merged = merged.iloc[order].reset_index(drop=True)
+    groups = merged.pop("group").to_numpy()
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(groups)]
+    return {
+        int(groups[start]): AggregateCube(
+            merged.iloc[start:end].reset_index(drop=True))
+        for start, end in zip(starts, ends)
+    }
+
+
+def _encode(values):
+    """Object column -> (int codes, str labels); -1 marks missing"""
+    codes, labels = pd.factorize(values, use_na_sentinel=True)
+    return codes.astype(np.int64), np.asarray(labels, dtype=str)
+
+
+def _decode(codes, labels):
+    return np.append(labels.astype(object), None)[codes]
+
+
+class AggregateCube:
+    """Monthly sums and counts by category, sign and brand"""
+
+    def __init__(self, cells=None):
+        self.cells = _empty_cells() if cells is None else cells
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __add__(self, other):
+        return AggregateCube(
+            _regroup(pd.concat([self.cells, other.cells], ignore_index=True))
+        )
+
+    @classmethod
+    def from_transactions(cls, df):
+        return cls(group_transactions(df))
+
+    def append(self, df):
+        """Fold new transactions into the cube: O(new rows + cells)"""
+        new = group_transactions(df)
+        if len(new):
+            self.cells = _regroup(
+                pd.concat([self.cells, new], ignore_index=True))
+        return self
+
+    # ---------- persistence ----------
+
+    def save(self, path, **metadata):
+        """Save the cells as .npz (no pickle), with string metadata"""
+        category_codes, categories = _encode(self.cells["category"])
+        brand_codes, brands = _encode(self.cells["brand"])
+        # month, sign, category code, brand code in one array: the file
+        # is written once per import / sync of every account
+        keys = np.column_stack([
+            self.cells["month"].to_numpy(dtype=np.int64),
+            self.cells["sign"].to_numpy(dtype=np.int64),
+            category_codes,
+            brand_codes,
+        ])
+        np.savez(
+            path,
+            keys=keys,
+            categories=categories,
+            brands=brands,
+            total=self.cells["total"].to_numpy(dtype=np.float64),
+            count=self.cells["count"].to_numpy(dtype=np.int64),
+            **{f"meta_{k}": np.asarray(str(v)) for k, v in metadata.items()}
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Returns (cube, metadata dict)"""
+        with np.load(path, allow_pickle=False) as data:
+            keys = data["keys"].reshape(-1, 4)
+            cube = cls(pd.DataFrame({
+                "month": keys[:, 0],
+                "category": _decode(keys[:, 2], data["categories"]),
+                "sign": keys[:, 1].astype(np.int8),
+                "brand": _decode(keys[:, 3], data["brands"]),
+                "total": data["total"],
+                "count": data["count"],
+            }))
+            metadata = {
+                k[len("meta_"):]: str(data[k])
+                for k in data.files if k.startswith("meta_")
+            }
+        return cube, metadata
+
+    # ---------- read side ----------
+
+    def _select(self, sign=None):
+        cells = self.cells
+        if sign is not None:
+            cells = cells[cells["sign"] == sign]
+        return cells
+
+    def months(self):
+        """Sorted months with activity"""
+        ordinals = np.unique(self.cells["month"].to_numpy())
+        return pd.PeriodIndex.from_ordinals(ordinals, freq="M")
+
+    def between(self, first_month=None, last_month=None):
+        """Sub-cube of the months first_month..last_month (inclusive)"""
+        month = self.cells["month"]
+        keep = np.ones(len(month), dtype=bool)
+        if first_month is not None:
+            keep &= month >= pd.Period(first_month, freq="M").ordinal
+        if last_month is not None:
+            keep &= month <= pd.Period(last_month, freq="M").ordinal
+        return AggregateCube(self.cells[keep].reset_index(drop=True))
+
+    def total(self, sign=None):
+        return float(self._select(sign)["total"].sum())
+
+    def count(self, sign=None):
+        return int(self._select(sign)["count"].sum())
+
+    def totals(self):
+        """
+        Net, income, expenses (positive) and counts - the dict
+        sql_backend.range_totals returns
+        """
+        return {
+            "net": self.total(),
+            "income": self.total(INCOME),
+            "expenses": abs(self.total(EXPENSE)),
+            "count": self.count(),
+            "expense_count": self.count(EXPENSE),
+        }
+
+    def monthly(self, sign=None):
+        """Sum per month with activity, indexed by Period"""
+        sums = self._select(sign).groupby("month")["total"].sum()
+        sums.index = pd.PeriodIndex.from_ordinals(sums.index, freq="M")
+        sums.index.name = "month"
+        return sums
+
+    def by(self, key, sign=None):
+        """Sum per category or brand, in order of first appearance"""
+        return self._select(sign).groupby(key, sort=False)["total"].sum()
+
+    def pivot(self, key, sign=None):
+        """
+        Month x category (or brand) sums; NaN where a month has no
+        transactions of that kind
+        """
+        cells = self._select(sign)
+        table = cells.groupby(["month", key])["total"].sum().unstack(key)
+        table = table.reindex(columns=pd.unique(cells[key]))
+        table.index = pd.PeriodIndex.from_ordinals(table.index, freq="M")
+        table.index.name = "month"
+        return table
+
+
+def window_cube(cube, date_range, start_date, end_date, read_rows):
+    """
+    Cube for start_date..end_date (inclusive) from the cube of a whole
+    ledger
+
+    date_range is the (first, last) transaction date of the ledger and
+    read_rows(start, end) returns its transactions between two dates.
+    Completely covered months are sliced from `cube`; only the rows of a
+    partially covered first / last month are read and grouped. A range
+    reaching past either end of the data counts as covering that month.
+    """
+    first_date, last_date = (pd.Timestamp(d).normalize() for d in date_range)
+    start = max(pd.Timestamp(start_date), first_date)
+    end = min(pd.Timestamp(end_date), last_date)
+    if start > end:
+        return AggregateCube()
+
+    first_month = start.to_period("M")
+    last_month = end.to_period("M")
+    head_partial = start > first_date and start != first_month.start_time
+    tail_partial = end < last_date and \
+        end != last_month.end_time.normalize()
+
+    if first_month == last_month and (head_partial or tail_partial):
+        return AggregateCube.from_transactions(read_rows(start, end))
+
+    parts = []
+    if head_partial:
+        parts.append(AggregateCube.from_transactions(
+            read_rows(start, first_month.end_time.normalize())))
+        first_month += 1
+    if tail_partial:
+        last_month -= 1
+
+    if first_month <= last_month:
+        parts.append(cube.between(first_month, last_month))
+
+    if tail_partial:
+        parts.append(AggregateCube.from_transactions(
+            read_rows((last_month + 1).start_time, end)))
+
+    window = parts[0]
+    for part in parts[1:]:
+        window = window + part
+    return window
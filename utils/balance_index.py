@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from utils.compact_frame import transaction_amounts, transaction_days
+
+# ---------------------------
+# Running-balance index
+#
+# One BalanceIndex per account holds, for every day with activity, the
+# net flow of that day and the cumulative net flow up to and including
+# it. Appending new transactions touches only the tail (truncate first
+# when a sync re-fetches recent days), and any balance lookup is a
+# binary search over the day array.
+# ---------------------------
+
+DEFAULT_START_BALANCE = 1000
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _day_ordinal(date):
+    return int((np.datetime64(pd.Timestamp(date).date(), "D") - _EPOCH)
+               .astype(np.int64))
+
+
+def _daily_net(days, amounts):
+    """Sorted unique days and the summed amount of each"""
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if len(days) == 0:
+        return days, amounts
+
+    order = np.argsort(days, kind="stable")
+    days = days[order]
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return days[starts], np.add.reduceat(amounts[order], starts)
+
+
+class BalanceIndex:
+    """Per-day net flow and cumulative balance for one account"""
+
+    def __init__(self, start_balance=DEFAULT_START_BALANCE, capacity=64):
+        self.start_balance = float(start_balance)
+        self._days = np.empty(capacity, dtype=np.int64)
+        self._net = np.empty(capacity, dtype=np.float64)
+        self._cum = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @classmethod
+    def from_transactions(cls, df, start_balance=DEFAULT_START_BALANCE):
+        index = cls(start_balance=start_balance, capacity=max(64, len(df)))
+        index.append(df)
+        return index
+
+    # ---------- read side ----------
+
+    @property
+    def days(self):
+        return self._days[:self._size]
+
+    @property
+    def net(self):
+        return self._net[:self._size]
+
+    @property
+    def cumulative(self):
+        return self._cum[:self._size]
+
+    def _position(self, date):
+        """Index of the last day <= date, or -1 when date is before all data"""
+        return int(np.searchsorted(self.days, _day_ordinal(date),
+                                   side="right")) - 1
+
+    def balance_at(self, date):
+        """End-of-day balance on a date: O(log n)"""
+        pos = self._position(date)
+        if pos < 0:
+            return self.start_balance
+        return self.start_balance + self._cum[pos]
+
+    def frame(self, start_date=None, end_date=None, start_balance=None):
+        """
+        Daily balance DataFrame (date, balance) for days with activity
+
+        With start_balance given, the window is re-based so its running
+        balance starts from that amount before its first day - the same
+        numbers calculate_daily_balance gives for a date-filtered frame.
+        """
+        lo = 0 if start_date is None else \
+            int(np.searchsorted(self.days, _day_ordinal(start_date)))
+        hi = self._size if end_date is None else \
+            int(np.searchsorted(self.days, _day_ordinal(end_date),
+                                side="right"))
+        hi = max(lo, hi)
+
+        cum = self._cum[lo:hi]
+        if start_balance is None:
+            balance = self.start_balance + cum
+        else:
+            before = self._cum[lo - 1] if lo > 0 else 0.0
+            balance = start_balance + (cum - before)
+
+        return pd.DataFrame({
+            "date": (_EPOCH + self._days[lo:hi]).astype("datetime64[ns]"),
+            "balance": balance
+        })
+
+    # ---------- write side ----------
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._days):
+            return
+        capacity = max(needed, 2 * len(self._days))
+        for name in ("_days", "_net", "_cum"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(self, df):
+        """
+        Add transactions (date, amount), or a compact frame (day, pence)
+
+        Rows on or after the last indexed day cost O(new rows) amortized.
+        Back-dated rows are still handled, but shift the cumulative sums
+        of every later day.
+        """
+        if df is None or len(df) == 0:
+            return self
+        return self.append_days(transaction_days(df), transaction_amounts(df))
+
+    def append_days(self, days, amounts):
+        """append() for int64 day ordinals (since 1970-01-01) and amounts"""
+        if len(days) == 0:
+            return self
+
+        days, net = _daily_net(days, amounts)
+        n = self._size
+
+        if n and days[0] < self._days[n - 1]:
+            self._merge_backdated(days, net)
+            return self
+
+        # Same-day activity folds into the last indexed day
+        if n and days[0] == self._days[n - 1]:
+            self._net[n - 1] += net[0]
+            self._cum[n - 1] += net[0]
+            days, net = days[1:], net[1:]
+
+        if len(days):
+            self._reserve(len(days))
+            base = self._cum[n - 1] if n else 0.0
+            self._days[n:n + len(days)] = days
+            self._net[n:n + len(days)] = net
+            self._cum[n:n + len(days)] = base + np.cumsum(net)
+            self._size += len(days)
+
+        return self
+
+    def truncate(self, date):
+        """Drop every day on or after `date` (kept days are unchanged)"""
+        self._size = int(np.searchsorted(self.days, _day_ordinal(date)))
+        return self
+
+    def _merge_backdated(self, days, net):
+        all_days = np.concatenate([self.days, days])
+        all_net = np.concatenate([self.net, net])
+        merged_days, merged_net = _daily_net(all_days, all_net)
+
+        self._size = 0
+        self._reserve(len(merged_days))
+        self._days[:len(merged_days)] = merged_days
+        self._net[:len(merged_days)] = merged_net
+        self._cum[:len(merged_days)] = np.cumsum(merged_net)
+        self._size = len(merged_days)
+
+    # ---------- persistence ----------
+
+    def save(self, path, **metadata):
+        np.savez(
+            path,
+            days=self.days,
+            net=self.net,
+            cumulative=self.cumulative,
+            start_balance=np.float64(self.start_balance),
+            **{f"meta_{k}": np.asarray(str(v)) for k, v in metadata.items()}
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Returns (index, metadata dict)"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(start_balance=float(data["start_balance"]),
+                        capacity=max(64, len(data["days"])))
+            n = len(data["days"])
+            index._days[:n] = data["days"]
+            index._net[:n] = data["net"]
+            index._cum[:n] = data["cumulative"]
+            index._size = n
+            metadata = {
+                k[len("meta_"):]: str(data[k])
+                for k in data.files if k.startswith("meta_")
+            }
+        return index, metadata
+
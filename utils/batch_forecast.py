@@ -0,0 +1,203 @@
+import os
+import signal
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.ml_models import trend_forecast
+
+# ---------------------------
+# Batch ARIMA forecasting across many accounts
+#
+# Fits fan out over a process pool (statsmodels holds the GIL), each fit
+# runs under its own time limit, and failures fall back to the linear
+# trend. Results land in a forecast table that pages read instead of
+# fitting on the Streamlit thread.
+# ---------------------------
+
+FORECAST_TABLE = "forecast_table.parquet"
+DEFAULT_HISTORY_DAYS = 90
+MIN_ARIMA_POINTS = 30
+
+TABLE_COLUMNS = [
+    "account", "history_start", "history_end", "source_hash",
+    "date", "balance", "method", "fit_seconds", "error"
+]
+
+
+def _run_with_timeout(fn, timeout):
+    """
+    Run fn() and raise TimeoutError after `timeout` seconds
+
+    Uses SIGALRM, so the limit is only enforced on POSIX in a process's
+    main thread - which is where ProcessPoolExecutor workers run tasks.
+    """
+    if not timeout or not hasattr(signal, "SIGALRM") \
+            or threading.current_thread() is not threading.main_thread():
+        return fn()
+
+    def _expired(signum, frame):
+        raise TimeoutError(f"fit exceeded {timeout}s")
+
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def fit_series(values, days=30, order=(1, 1, 1), timeout=None):
+    """
+    Forecast one balance series
+
+    Returns (forecast array, method, fit seconds, error message). Method is
+    "arima", or "trend" when the series is too short, the fit fails or it
+    runs past the timeout.
+    """
+    values = np.asarray(values, dtype=float)
+    start = time.perf_counter()
+
+    if len(values) < MIN_ARIMA_POINTS:
+        return trend_forecast(values, days), "trend", 0.0, "too few points"
+
+    def _fit():
+        from statsmodels.tsa.arima.model import ARIMA
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return np.asarray(ARIMA(values, order=order).fit().forecast(days))
+
+    try:
+        forecast = _run_with_timeout(_fit, timeout)
+        method, error = "arima", None
+    except Exception as exc:
+        forecast = trend_forecast(values, days)
+        method, error = "trend", f"{type(exc).__name__}: {exc}"
+
+    return forecast, method, time.perf_counter() - start, error
+
+
+def map_tasks(fn, tasks, max_workers=None):
+    """
+    [fn(task) for task in tasks], spread over a ProcessPoolExecutor
+    (default: one worker per CPU); max_workers=1 runs inline
+    """
+    if max_workers == 1 or len(tasks) <= 1:
+        return [fn(task) for task in tasks]
+
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(fn, tasks, chunksize=chunksize))
+
+
+def _fit_task(args):
+    account, values, days, order, timeout = args
+    return account, fit_series(values, days, order, timeout)
+
+
+def forecast_accounts(balances, days=30, order=(1, 1, 1), max_workers=None,
+                      timeout=30.0, source_hash=None, history_window=None):
+    """
+    Forecast many accounts in parallel
+
+    balances maps account -> daily balance DataFrame (date, balance).
+    history_window=(start, end) labels the rows with the date window the
+    balances were cut from (defaults to each series' first / last day).
+    max_workers=1 runs inline, otherwise fits are spread over a
+    ProcessPoolExecutor (default: one worker per CPU). Returns a long
+    forecast table with TABLE_COLUMNS.
+    """
+    tasks = [
+        (account, frame["balance"].to_numpy(dtype=float), days, order, timeout)
+        for account, frame in balances.items()
+        if len(frame) > 0
+    ]
+
+    results = map_tasks(_fit_task, tasks, max_workers)
+    return forecast_table([
+        forecast_rows(account, balances[account], *result,
+                      source_hash=source_hash, history_window=history_window)
+        for account, result in results
+    ])
+
+
+def forecast_rows(account, frame, forecast, method, seconds, error,
+                  source_hash=None, history_window=None):
+    """Forecast table rows (TABLE_COLUMNS) for one account's series"""
+    last_date = pd.Timestamp(frame["date"].iloc[-1])
+    start, end = history_window or (frame["date"].iloc[0], last_date)
+    return pd.DataFrame({
+        "account": account,
+        "history_start": pd.Timestamp(start),
+        "history_end": pd.Timestamp(end),
+        "source_hash": source_hash,
+        "date": pd.date_range(last_date + pd.Timedelta(days=1),
+                              periods=len(forecast)),
+        "balance": forecast,
+        "method": method,
+        "fit_seconds": seconds,
+        "error": error
+    })
+
+
+def forecast_table(rows):
+    """Concatenate forecast_rows() frames into one table"""
+    if not rows:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
+    return pd.concat(rows, ignore_index=True)[TABLE_COLUMNS]
+
+
+def write_forecast_table(table, path=FORECAST_TABLE):
+    """Save the forecast table as Parquet, or CSV when pyarrow is missing"""
+    from utils.transaction_store import store_available
+
+    if store_available() and path.endswith(".parquet"):
+        table.to_parquet(path, index=False)
+    else:
+        path = os.path.splitext(path)[0] + ".csv"
+        table.to_csv(path, index=False)
+    return path
+
+
+def read_forecast_table(path=FORECAST_TABLE):
+    """Load the forecast table, or None when no batch run has written one"""
+    csv_path = os.path.splitext(path)[0] + ".csv"
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    if os.path.exists(csv_path):
+        return pd.read_csv(
+            csv_path, parse_dates=["history_start", "history_end", "date"])
+    return None
+
+
+def lookup_forecast(table, account, history_start, history_end, days,
+                    source_hash=None):
+    """
+    Precomputed forecast for one account and history window
+
+    Returns a (date, balance) DataFrame with `days` rows, or None when the
+    table has no matching run (different window, data version or a
+    shorter horizon).
+    """
+    if table is None or table.empty:
+        return None
+
+    match = table[
+        (table["account"] == account)
+        & (table["history_start"] == pd.Timestamp(history_start))
+        & (table["history_end"] == pd.Timestamp(history_end))
+    ]
+    if source_hash is not None:
+        match = match[match["source_hash"] == source_hash]
+    if len(match) < days:
+        return None
+
+    return match.sort_values("date").head(days)[["date", "balance"]] \
+        .reset_index(drop=True)
@@ -0,0 +1,153 @@
+import csv
+import json
+from collections import deque
+
+# ---------------------------
+# Multi-pattern brand matcher (Aho-Corasick automaton)
+# ---------------------------
+
+
+class BrandMatcher:
+    """
+    Match every brand pattern against a merchant string in one pass
+
+    Patterns are compiled into an Aho-Corasick automaton, so lookup cost
+    depends on the length of the merchant text rather than the size of
+    the brand dictionary. When several patterns occur in the text the
+    longest one wins; equal lengths are broken by insertion order.
+    """
+
+    def __init__(self, patterns=None):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [-1]
+        self._patterns = []
+        self._brands = []
+        self._index = {}
+        self._compiled = True
+
+        if patterns:
+            self.add_many(patterns.items()
+                          if hasattr(patterns, "items") else patterns)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def add(self, pattern, brand):
+        """
+        Register a pattern; re-adding an existing pattern keeps its
+        original priority and updates the brand
+        """
+        pattern = pattern.upper()
+        if not pattern:
+            return
+
+        if pattern in self._index:
+            self._brands[self._index[pattern]] = brand
+            return
+
+        pattern_id = len(self._patterns)
+        self._index[pattern] = pattern_id
+        self._patterns.append(pattern)
+        self._brands.append(brand)
+
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+            state = nxt
+
+        self._compiled = False
+
+    def add_many(self, items):
+        for pattern, brand in items:
+            self.add(pattern, brand)
+
+    def _better(self, a, b):
+        """Return whichever pattern id has higher priority"""
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        len_a, len_b = len(self._patterns[a]), len(self._patterns[b])
+        if len_a != len_b:
+            return a if len_a > len_b else b
+        return min(a, b)
+
+    def _compile(self):
+        """Build failure links breadth-first and fold outputs along them"""
+        # Terminal states only know their own pattern until relinked
+        best = [-1] * len(self._goto)
+        for pattern_id, pattern in enumerate(self._patterns):
+            state = 0
+            for char in pattern:
+                state = self._goto[state][char]
+            best[state] = pattern_id
+
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+
+                f = fail[state]
+                while f and char not in self._goto[f]:
+                    f = fail[f]
+                fail[nxt] = self._goto[f].get(char, 0)
+
+                best[nxt] = self._better(best[nxt], best[fail[nxt]])
+
+        self._fail = fail
+        self._best = best
+        self._compiled = True
+
+    def match(self, text):
+        """
+        Return the brand of the highest priority pattern found in text,
+        or None when nothing matches
+        """
+        if not self._compiled:
+            self._compile()
+
+        goto, fail, best = self._goto, self._fail, self._best
+        state = 0
+        found = -1
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] >= 0:
+                found = self._better(found, best[state])
+
+        return self._brands[found] if found >= 0 else None
+
+    def match_many(self, texts):
+        return [self.match(text) for text in texts]
+
+
+def load_brand_dictionary(path):
+    """
+    Read pattern -> brand pairs from a dictionary file
+
+    Supports CSV files with `pattern` and `brand` columns and JSON files
+    holding a {pattern: brand} object. File order is preserved, which is
+    the tie-break order used by BrandMatcher.
+    """
+    path = str(path)
+
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return list(json.load(f).items())
+
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (row["pattern"], row["brand"])
+            for row in csv.DictReader(f)
+            if row.get("pattern") and row.get("brand")
+        ]
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# Small in-process caches shared by the utils modules
+# ---------------------------
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping
+
+    Works on single keys (get / put) and on batches of keys
+    (get_many / put_many) so column-wise callers pay one Python call
+    per distinct value instead of one per row. With ttl (seconds) set,
+    entries older than that are treated as missing. Safe to share
+    between threads (Streamlit sessions): every operation holds a lock.
+    """
+
+    def __init__(self, maxsize=100_000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._stamps = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data and not self._expired(key)
+
+    def _expired(self, key):
+        if self.ttl is None:
+            return False
+        if time.monotonic() - self._stamps[key] <= self.ttl:
+            return False
+        del self._data[key]
+        del self._stamps[key]
+        return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data or self._expired(key):
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._stamps[key] = time.monotonic()
+            self._evict()
+
+    def get_many(self, keys):
+        """
+        Return (found, missing): a dict of cached values and the list of
+        keys that were not in the cache
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._data and not self._expired(key):
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, items):
+        now = time.monotonic()
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                self._stamps[key] = now
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._stamps.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _evict(self):
+        # Caller holds the lock
+        while len(self._data) > self.maxsize:
+            key, _ = self._data.popitem(last=False)
+            del self._stamps[key]
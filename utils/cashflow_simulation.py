@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+
+from utils.ml_models import detect_recurring_transactions
+from utils.tracing import traced
+
+# ---------------------------
+# Monte Carlo cash-flow simulation
+#
+# Future daily cash flow = recurring payments (from the recurring
+# detector, each occurring with a probability set by its confidence)
+# + income, as a renewal process: the gap to the next income day and
+# its amount are drawn from past income days, starting from the last
+# one (salaries rarely keep one description or weekday)
+# + discretionary flow bootstrapped per category from recent history,
+# drawing each future day from past days with the same weekday.
+# All paths are simulated at once as one (n_paths, days) array.
+# ---------------------------
+
+DEFAULT_PATHS = 10_000
+HISTORY_DAYS = 91
+ALERT_PROBABILITY = 0.25
+
+# Chance that a detected recurring payment actually lands in the horizon
+OCCURRENCE_PROBABILITY = {"High": 1.0, "Medium": 0.9, "Low": 0.6}
+
+# Simulated by _income_flows, not the recurring schedule or the bootstrap
+INCOME_CATEGORY = "Income"
+
+# History columns the simulation (and the recurring detector) read
+HISTORY_COLUMNS = ["date", "description", "amount", "category"]
+
+
+def _recurring_schedule(recurring, df, first_day, days):
+    """
+    Expand recurring payments into (event day offset, amount, probability)
+    arrays covering the horizon
+
+    The detector dates the next payment one average interval after the
+    last one, so each payment's interval is next_date minus its last
+    date in df (a month when df doesn't have it).
+    """
+    if recurring is None or recurring.empty:
+        empty = np.array([], dtype=np.int64)
+        return empty, np.array([]), np.array([])
+
+    next_offset = (
+        (pd.to_datetime(recurring["next_date"]).dt.normalize() - first_day)
+        // pd.Timedelta(days=1)
+    ).to_numpy(dtype=np.int64)
+    last_date = pd.to_datetime(df["date"]).dt.normalize() \
+        .groupby(df["description"].to_numpy()).max()
+    interval = (
+        (pd.to_datetime(recurring["next_date"]).dt.normalize()
+         - recurring["description"].map(last_date).to_numpy())
+        // pd.Timedelta(days=1)
+    ).fillna(30).to_numpy(dtype=np.int64)
+    interval = np.maximum(interval, 1)
+
+    # Occurrences k = 0, 1, ... of every payment, masked to the horizon
+    k = np.arange(days // interval.min() + 1)
+    offsets = next_offset[:, None] + interval[:, None] * k[None, :]
+    inside = (offsets >= 0) & (offsets < days)
+
+    rows = np.nonzero(inside)[0]
+    amounts = recurring["amount"].to_numpy(dtype=float)[rows]
+    probability = recurring["confidence"].map(OCCURRENCE_PROBABILITY) \
+        .fillna(0.5).to_numpy(dtype=float)[rows]
+    return offsets[inside], amounts, probability
+
+
+def _weekday_history(df, recurring, last_day, history_days):
+    """
+    Daily discretionary totals per category over the last `history_days`
+    (a whole number of weeks), shaped (n_categories, 7, n_weeks) and
+    indexed by weekday
+    """
+    weeks = max(history_days // 7, 1)
+    first_day = last_day - pd.Timedelta(days=7 * weeks - 1)
+
+    dates = pd.to_datetime(df["date"]).dt.normalize()
+    window = (dates >= first_day) & (dates <= last_day) \
+        & (df["category"] != INCOME_CATEGORY).to_numpy()
+    if recurring is not None and not recurring.empty:
+        window &= ~df["description"].isin(recurring["description"])
+
+    day = ((dates[window] - first_day) // pd.Timedelta(days=1)) \
+        .to_numpy(dtype=np.int64)
+    codes, categories = pd.factorize(df.loc[window, "category"])
+
+    totals = np.zeros((max(len(categories), 1), 7 * weeks))
+    np.add.at(totals, (codes, day),
+              df.loc[window, "amount"].to_numpy(dtype=float))
+
+    # Column d is day first_day + d; regroup as [weekday, week]
+    weekday0 = first_day.dayofweek
+    by_weekday = totals.reshape(len(totals), weeks, 7).transpose(0, 2, 1)
+    by_weekday = np.roll(by_weekday, weekday0, axis=1)
+    return by_weekday, list(categories)
+
+
+def _income_flows(df, last_day, days, n_paths, rng):
+    """
+    (n_paths, days) simulated income: each path draws the gap to its next
+    income day from the past gaps (the first one conditioned on the days
+    already elapsed since the last income) and the day's amount from past
+    income days. With fewer than two income days, income lands on any day
+    with the historical frequency.
+    """
+    flows = np.zeros((n_paths, days))
+    income = df[(df["category"] == INCOME_CATEGORY).to_numpy()]
+    if income.empty:
+        return flows
+
+    per_day = income.groupby(
+        pd.to_datetime(income["date"]).dt.normalize())["amount"].sum()
+    income_days = ((per_day.index - last_day) // pd.Timedelta(days=1)) \
+        .to_numpy(dtype=np.int64)
+    amounts = per_day.to_numpy(dtype=float)
+
+    if len(income_days) < 2:
+        first_day = pd.to_datetime(df["date"]).min().normalize()
+        rate = len(income_days) / ((last_day - first_day).days + 1)
+        lands = rng.random((n_paths, days)) < rate
+        flows[lands] = rng.choice(amounts, lands.sum())
+        return flows
+
+    gaps = np.diff(income_days)
+    since = -income_days[-1]
+    later = gaps[gaps > since]
+    # Offsets from the first simulated day; past every gap = overdue, due now
+    first = rng.choice(later, n_paths) - since - 1 if len(later) \
+        else np.zeros(n_paths, dtype=np.int64)
+
+    k = days // gaps.min() + 1
+    offsets = first[:, None] + np.concatenate([
+        np.zeros((n_paths, 1), dtype=np.int64),
+        np.cumsum(rng.choice(gaps, (n_paths, k - 1)), axis=1)
+    ], axis=1)
+    inside = offsets < days
+    np.add.at(flows, (np.nonzero(inside)[0], offsets[inside]),
+              rng.choice(amounts, (n_paths, k))[inside])
+    return flows
+
+
+@traced()
+def simulate_balance_paths(df, current_balance, days=30, n_paths=DEFAULT_PATHS,
+                           recurring=None, history_days=HISTORY_DAYS,
+                           seed=None):
+    """
+    Simulate end-of-day balances
+
+    df is the transaction history (date, description, amount, category);
+    the simulation starts the day after its last date from
+    current_balance. Pass `recurring` to reuse an existing
+    detect_recurring_transactions result. Returns (dates, paths) where
+    paths is (n_paths, days).
+    """
+    rng = np.random.default_rng(seed)
+    last_day = pd.to_datetime(df["date"]).max().normalize()
+    first_day = last_day + pd.Timedelta(days=1)
+    dates = pd.date_range(first_day, periods=days)
+
+    if recurring is None:
+        recurring = detect_recurring_transactions(df, as_of=last_day)
+    if not recurring.empty:
+        recurring = recurring[
+            (recurring["category"] != INCOME_CATEGORY).to_numpy()]
+
+    # ---------- DISCRETIONARY ----------
+    history, _ = _weekday_history(df, recurring, last_day, history_days)
+    n_categories, _, n_weeks = history.shape
+    weekdays = dates.dayofweek.to_numpy()
+
+    flows = np.zeros((n_paths, days))
+    for k in range(n_categories):
+        week = rng.integers(0, n_weeks, (n_paths, days))
+        flows += history[k, weekdays[None, :], week]
+
+    # ---------- RECURRING ----------
+    offsets, amounts, probability = _recurring_schedule(
+        recurring, df, first_day, days)
+    if len(offsets):
+        occurs = rng.random((n_paths, len(offsets))) < probability
+        schedule = np.zeros((len(offsets), days))
+        schedule[np.arange(len(offsets)), offsets] = amounts
+        flows += occurs @ schedule
+
+    # ---------- INCOME ----------
+    flows += _income_flows(df, last_day, days, n_paths, rng)
+
+    return dates, current_balance + np.cumsum(flows, axis=1)
+
+
+@traced()
+def balance_risk(dates, paths, threshold):
+    """
+    Per-day summary of simulated paths
+
+    p_below:    P(balance < threshold) on that day
+    p_below_by: P(balance has gone below threshold on or before that day)
+    """
+    below = paths < threshold
+    p05, median, p95 = np.percentile(paths, [5, 50, 95], axis=0)
+    return pd.DataFrame({
+        "date": dates,
+        "p_below": below.mean(axis=0),
+        "p_below_by": np.maximum.accumulate(below, axis=1).mean(axis=0),
+        "p05": p05,
+        "median": median,
+        "p95": p95
+    })
+
+
+def simulate_cashflow(df, current_balance, threshold=100, days=30,
+                      n_paths=DEFAULT_PATHS, recurring=None,
+                      history_days=HISTORY_DAYS, seed=None):
+    """simulate_balance_paths + balance_risk in one call"""
+    if df is None or df.empty:
+        return None
+
+    dates, paths = simulate_balance_paths(
+        df, current_balance, days=days, n_paths=n_paths,
+        recurring=recurring, history_days=history_days, seed=seed)
+    return balance_risk(dates, paths, threshold)
+
+
+def first_risk_date(risk, min_probability=ALERT_PROBABILITY):
+    """First row of a balance_risk frame with p_below >= min_probability"""
+    if risk is None or risk.empty:
+        return None
+
+    risky = risk[risk["p_below"] >= min_probability]
+    if risky.empty:
+        return None
+    return risky.iloc[0]
@@ -0,0 +1,223 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_utils import LRUCache
+from utils.compact_model import ARTIFACT_DIR
+from utils.merchant_utils import normalize_merchants
+
+# ---------------------------
+# Memoized transaction categorization
+#
+# Predictions are keyed on (model version, normalized merchant). The
+# model version is a hash of the files load_categorizer reads (the
+# compact artifact, else the categorizer + vectorizer pickles), so
+# retraining or re-exporting invalidates every cached prediction.
+# ---------------------------
+
+MODEL_FILE = "categorizer_model.pkl"
+VECTORIZER_FILE = "vectorizer.pkl"
+ARTIFACT_FILES = ("meta.json", "vocab.npy", "columns.npy", "idf.npy",
+                  "coef.npy", "intercept.npy", "classes.npy")
+
+# (path, mtime_ns, size) -> content hash, so unchanged files are not rehashed
+_HASHES = {}
+_LOADED = {"version": None, "model": None, "vectorizer": None}
+_LOCK = threading.Lock()
+
+
+def _categorizer_sources(model_path=None, vectorizer_path=None):
+    """
+    (model_path, vectorizer_path, artifact_dir) for load_categorizer: the
+    compact artifact is preferred unless explicit pickle paths are given
+    """
+    if model_path is None and vectorizer_path is None:
+        return MODEL_FILE, VECTORIZER_FILE, ARTIFACT_DIR
+    return model_path or MODEL_FILE, vectorizer_path or VECTORIZER_FILE, None
+
+
+def model_version(model_path=None, vectorizer_path=None):
+    """
+    Hash identifying the categorizer load_categorizer would load - the
+    compact artifact's files when it exists, else the two pickles - or
+    None when they are missing
+    """
+    from utils.data_access import file_hash
+
+    model_path, vectorizer_path, artifact_dir = _categorizer_sources(
+        model_path, vectorizer_path)
+    if artifact_dir is not None and \
+            os.path.exists(os.path.join(artifact_dir, "meta.json")):
+        paths = [os.path.join(artifact_dir, name) for name in ARTIFACT_FILES]
+    else:
+        paths = [model_path, vectorizer_path]
+
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if key not in _HASHES:
+            _HASHES[key] = file_hash(path)
+        parts.append(_HASHES[key])
+
+    return hashlib.blake2b("-".join(parts).encode(),
+                           digest_size=16).hexdigest()
+
+
+def current_categorizer(model_path=None, vectorizer_path=None):
+    """
+    Return (model, vectorizer, version), reloading the artifacts only when
+    their files change
+    """
+    from utils.ml_models import load_categorizer
+
+    version = model_version(model_path, vectorizer_path)
+    with _LOCK:
+        if version != _LOADED["version"]:
+            model, vectorizer = load_categorizer(
+                *_categorizer_sources(model_path, vectorizer_path))
+            _LOADED.update(version=version, model=model, vectorizer=vectorizer)
+        return _LOADED["model"], _LOADED["vectorizer"], version
+
+
+class CategoryCache:
+    """
+    Two-tier cache of merchant -> (category, probability)
+
+    The memory tier is an LRU; the optional SQLite tier (db_path) survives
+    restarts and is shared by every process pointing at the same file.
+    Entries from other model versions are never returned and are purged
+    from SQLite the first time a new version is seen.
+    """
+
+    def __init__(self, maxsize=100_000, db_path=None):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.db_path = db_path
+        self.version = None
+        self._db = None
+
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS categories ("
+                " version TEXT NOT NULL,"
+                " merchant TEXT NOT NULL,"
+                " category TEXT NOT NULL,"
+                " probability REAL,"
+                " PRIMARY KEY (version, merchant))"
+            )
+            self._db.commit()
+
+    def _use_version(self, version):
+        if version == self.version:
+            return
+        self.memory.clear()
+        if self._db is not None:
+            self._db.execute(
+                "DELETE FROM categories WHERE version != ?", (version,))
+            self._db.commit()
+        self.version = version
+
+    def lookup(self, merchants, version):
+        """Return ({merchant: (category, probability)}, missing merchants)"""
+        self._use_version(version)
+        found, missing = self.memory.get_many(merchants)
+
+        if missing and self._db is not None:
+            from_disk = {}
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                rows = self._db.execute(
+                    "SELECT merchant, category, probability FROM categories"
+                    f" WHERE version = ? AND merchant IN ({','.join('?' * len(batch))})",
+                    (version, *batch)
+                )
+                for merchant, category, probability in rows:
+                    from_disk[merchant] = (category, probability)
+
+            if from_disk:
+                self.memory.put_many(from_disk.items())
+                found.update(from_disk)
+                missing = [m for m in missing if m not in from_disk]
+
+        return found, missing
+
+    def store(self, items, version):
+        """Save {merchant: (category, probability)} predictions"""
+        self._use_version(version)
+        self.memory.put_many(items.items())
+
+        if self._db is not None and items:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?)",
+                [(version, m, c, None if pd.isna(p) else float(p))
+                 for m, (c, p) in items.items()]
+            )
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_DEFAULT_CACHE = CategoryCache()
+
+
+def categorize_cached(descriptions, cache=None, model_path=None,
+                      vectorizer_path=None):
+    """
+    Categorize descriptions through the merchant-keyed cache
+
+    Descriptions are normalized, and only merchants not already cached for
+    the current model version are sent to the model (once each, using the
+    first raw description seen for that merchant). Returns a DataFrame with
+    description, merchant_clean, category and probability columns.
+    """
+    from utils.ml_models import categorize_batch
+
+    cache = _DEFAULT_CACHE if cache is None else cache
+
+    if not isinstance(descriptions, pd.Series):
+        descriptions = pd.Series(list(descriptions), dtype=object)
+    merchants = normalize_merchants(descriptions)
+
+    codes, uniques = pd.factorize(merchants)
+    uniques = list(uniques)
+
+    model, vectorizer, version = current_categorizer(
+        model_path, vectorizer_path)
+    found, missing = cache.lookup(uniques, version)
+
+    if missing:
+        first_seen = (
+            pd.Series(descriptions.to_numpy(), index=merchants.to_numpy())
+            .groupby(level=0, sort=False).first()
+        )
+        predicted = categorize_batch(
+            first_seen.loc[missing].tolist(), model, vectorizer)
+        computed = dict(zip(
+            missing,
+            zip(predicted["category"], predicted["probability"])
+        ))
+        if version is not None:
+            cache.store(computed, version)
+        found.update(computed)
+
+    categories = np.array([found[u][0] for u in uniques], dtype=object)
+    probabilities = np.array([found[u][1] for u in uniques], dtype=float)
+
+    return pd.DataFrame({
+        "description": descriptions.to_numpy(),
+        "merchant_clean": merchants.to_numpy(),
+        "category": categories[codes],
+        "probability": probabilities[codes]
+    }, index=descriptions.index)
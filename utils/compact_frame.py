@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Compact transaction frame
+#
+# The enriched frame keeps a datetime64[ns] date, a float amount and
+# five string columns (description, merchant_clean, brand, category and
+# the "YYYY-MM" month label). The compact frame holds the same
+# information in fixed-width columns:
+#
+#   user, account                  categorical (when present)
+#   day                            int32 days since 1970-01-01
+#   month                          int16 Period('M') ordinal
+#   description, merchant_clean,
+#   brand, category                categorical (dictionary-encoded)
+#   pence                          int32 amount in pence (int64 when a
+#                                  value needs it), exact sums
+#
+# which is several times smaller for large ledgers, where every string
+# repeats thousands of times. to_compact / from_compact convert between
+# the two. The transaction_* accessors read dates, days, months and
+# amounts from either layout, so analysis code can take both.
+# ---------------------------
+
+COMPACT_STRING_COLUMNS = ["description", "merchant_clean", "brand",
+                          "category"]
+OWNER_COLUMNS = ["user", "account"]
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def is_compact(df):
+    return "pence" in df.columns and "day" in df.columns
+
+
+def _categorical(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.remove_unused_categories()
+    return series.astype("category")
+
+
+def to_compact(df):
+    """Enriched transactions (date, amount, string columns) -> compact frame"""
+    if is_compact(df):
+        return df
+
+    days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]")
+    columns = {c: _categorical(df[c]) for c in OWNER_COLUMNS
+               if c in df.columns}
+    columns["day"] = (days - _EPOCH).astype(np.int32)
+    columns["month"] = days.astype("datetime64[M]").astype(np.int16)
+    for c in COMPACT_STRING_COLUMNS:
+        if c in df.columns:
+            columns[c] = _categorical(df[c])
+    pence = np.round(df["amount"].to_numpy(dtype=np.float64) * 100) \
+        .astype(np.int64)
+    fits = not len(pence) or np.abs(pence).max() <= np.iinfo(np.int32).max
+    columns["pence"] = pence.astype(np.int32) if fits else pence
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _expand(series):
+    """Categorical -> plain column of its categories' dtype, in one take"""
+    values = series.cat.categories.take(series.cat.codes.to_numpy(),
+                                        allow_fill=True, fill_value=np.nan)
+    return pd.Series(values, index=series.index)
+
+
+def from_compact(cf):
+    """Compact frame -> enriched layout (date, month label, float amount)"""
+    if not is_compact(cf):
+        return cf
+
+    months, inverse = np.unique(cf["month"].to_numpy(), return_inverse=True)
+    labels = pd.Index(pd.PeriodIndex.from_ordinals(months, freq="M")
+                      .strftime("%Y-%m"), dtype="str")
+
+    columns = {c: cf[c] for c in OWNER_COLUMNS if c in cf.columns}
+    columns["date"] = transaction_dates(cf)
+    for c in COMPACT_STRING_COLUMNS:
+        if c in cf.columns:
+            columns[c] = _expand(cf[c])
+    columns["month"] = pd.Series(labels.take(inverse), index=cf.index)
+    columns["amount"] = transaction_amounts(cf)
+
+    return pd.DataFrame(columns, index=cf.index)
+
+
+def concat_compact(frames):
+    """
+    Concatenate compact frames; categorical columns keep one shared
+    dictionary instead of falling back to object strings
+    """
+    frames = [f for f in frames if len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+
+    columns = {}
+    for c in frames[0].columns:
+        if isinstance(frames[0][c].dtype, pd.CategoricalDtype):
+            columns[c] = pd.api.types.union_categoricals(
+                [f[c] for f in frames], ignore_order=True)
+        else:
+            columns[c] = np.concatenate([f[c].to_numpy() for f in frames])
+    return pd.DataFrame(columns)
+
+
+# ---------- accessors (either layout) ----------
+
+def transaction_days(df):
+    """int64 days since 1970-01-01"""
+    if "day" in df.columns:
+        return df["day"].to_numpy(dtype=np.int64)
+    days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]")
+    return (days - _EPOCH).astype(np.int64)
+
+
+def transaction_dates(df):
+    """datetime64[ns] array"""
+    if "day" in df.columns:
+        return (_EPOCH + df["day"].to_numpy(dtype=np.int64)) \
+            .astype("datetime64[ns]")
+    return pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]")
+
+
+def transaction_months(df):
+    """int64 Period('M') ordinals (months since 1970-01)"""
+    if is_compact(df):
+        return df["month"].to_numpy(dtype=np.int64)
+    months = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[M]")
+    return months.astype(np.int64)
+
+
+def transaction_amounts(df):
+    """float64 amounts in pounds"""
+    if "pence" in df.columns:
+        return df["pence"].to_numpy(dtype=np.int64) / 100
+    return df["amount"].to_numpy(dtype=np.float64)
+
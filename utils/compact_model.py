@@ -0,0 +1,229 @@
+import json
+import os
+import re
+
+import numpy as np
+
+# ---------------------------
+# Compact categorizer artifact
+#
+# The TF-IDF vocabulary, IDF weights and LogisticRegression coefficients
+# are stored as plain .npy arrays next to a small JSON header:
+#
+#   categorizer_artifact/
+#       meta.json        tokenizer settings, array shapes
+#       vocab.npy        sorted terms (fixed-width unicode)
+#       columns.npy      feature column for each sorted term
+#       idf.npy          IDF weight per feature column
+#       coef.npy         (n_classes, n_features)
+#       intercept.npy    (n_classes,)
+#       classes.npy      class labels
+#
+# Arrays are opened with np.load(mmap_mode="r"), so loading is near
+# instant and the OS shares the pages between worker processes. No
+# pickle is involved, so a tampered artifact cannot execute code.
+# ---------------------------
+
+ARTIFACT_DIR = "categorizer_artifact"
+FORMAT_VERSION = 1
+
+
+def export_compact_model(model, vectorizer, out_dir=ARTIFACT_DIR):
+    """Write a fitted TfidfVectorizer + LogisticRegression as an artifact"""
+    params = vectorizer.get_params()
+    if params["analyzer"] != "word" or params["tokenizer"] is not None \
+            or params["preprocessor"] is not None or params["stop_words"]:
+        raise ValueError(
+            "Only word analyzers with the default tokenizer can be exported")
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    terms = np.array(sorted(vectorizer.vocabulary_))
+    columns = np.array(
+        [vectorizer.vocabulary_[t] for t in terms], dtype=np.int32)
+
+    classes = np.asarray(model.classes_)
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64)
+
+    # Binary and legacy one-vs-rest models use sigmoids, multinomial softmax
+    if len(classes) == 2:
+        link = "binary"
+    elif getattr(model, "multi_class", "auto") == "ovr":
+        link = "ovr"
+    else:
+        link = "softmax"
+
+    arrays = {
+        "vocab": terms,
+        "columns": columns,
+        "idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        "coef": coef,
+        "intercept": intercept,
+        "classes": classes.astype(str),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array,
+                allow_pickle=False)
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "lowercase": params["lowercase"],
+        "token_pattern": params["token_pattern"],
+        "ngram_range": list(params["ngram_range"]),
+        "binary": params["binary"],
+        "sublinear_tf": params["sublinear_tf"],
+        "norm": params["norm"],
+        "link": link,
+        "n_features": int(coef.shape[1]),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+class TermMatrix:
+    """Sparse (doc, feature, weight) triples produced by CompactVectorizer"""
+
+    def __init__(self, doc_ids, feature_ids, weights, n_docs):
+        self.doc_ids = doc_ids
+        self.feature_ids = feature_ids
+        self.weights = weights
+        self.n_docs = n_docs
+
+
+class CompactVectorizer:
+    """TF-IDF transform that runs directly from the memory-mapped arrays"""
+
+    def __init__(self, meta, vocab, columns, idf):
+        self.meta = meta
+        self.vocab = vocab
+        self.columns = columns
+        self.idf = idf
+        self._token_re = re.compile(meta["token_pattern"])
+        self._min_n, self._max_n = meta["ngram_range"]
+
+    def _terms(self, text):
+        if not isinstance(text, str):
+            text = ""
+        if self.meta["lowercase"]:
+            text = text.lower()
+
+        tokens = self._token_re.findall(text)
+        if self._min_n == 1 and self._max_n == 1:
+            return tokens
+
+        terms = tokens[:] if self._min_n == 1 else []
+        for n in range(max(2, self._min_n), self._max_n + 1):
+            terms.extend(
+                " ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts):
+        texts = list(texts)
+
+        doc_ids = []
+        terms = []
+        for doc, text in enumerate(texts):
+            doc_terms = self._terms(text)
+            terms.extend(doc_terms)
+            doc_ids.extend([doc] * len(doc_terms))
+
+        n_docs = len(texts)
+        if not terms:
+            empty = np.array([], dtype=np.int64)
+            return TermMatrix(empty, empty, np.array([]), n_docs)
+
+        # Vocabulary lookup for every term of the chunk at once
+        terms = np.array(terms)
+        pos = np.searchsorted(self.vocab, terms)
+        pos = np.minimum(pos, len(self.vocab) - 1)
+        known = self.vocab[pos] == terms
+
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)[known]
+        feature_ids = self.columns[pos[known]].astype(np.int64)
+
+        # Term counts per (doc, feature)
+        n_features = self.meta["n_features"]
+        keys, counts = np.unique(
+            doc_ids * n_features + feature_ids, return_counts=True)
+        doc_ids = keys // n_features
+        feature_ids = keys % n_features
+
+        tf = counts.astype(np.float64)
+        if self.meta["binary"]:
+            tf = np.ones_like(tf)
+        elif self.meta["sublinear_tf"]:
+            tf = np.log(tf) + 1
+        weights = tf * self.idf[feature_ids]
+
+        norm = self.meta["norm"]
+        if norm is not None:
+            per_doc = np.abs(weights) if norm == "l1" else weights ** 2
+            totals = np.bincount(doc_ids, weights=per_doc, minlength=n_docs)
+            if norm == "l2":
+                totals = np.sqrt(totals)
+            weights = weights / totals[doc_ids]
+
+        return TermMatrix(doc_ids, feature_ids, weights, n_docs)
+
+
+class CompactClassifier:
+    """Linear classifier over TermMatrix input (LogisticRegression layout)"""
+
+    def __init__(self, meta, coef, intercept, classes):
+        self.meta = meta
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = classes
+
+    def decision_function(self, X):
+        scores = np.tile(self.intercept, (X.n_docs, 1))
+        if len(X.weights):
+            contrib = self.coef[:, X.feature_ids].T * X.weights[:, None]
+            np.add.at(scores, X.doc_ids, contrib)
+        return scores
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        link = self.meta["link"]
+
+        if link == "binary":
+            p = 1 / (1 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - p, p])
+        if link == "ovr":
+            p = 1 / (1 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_compact_categorizer(artifact_dir=ARTIFACT_DIR):
+    """
+    Load (model, vectorizer) from a compact artifact
+
+    The pair is a drop-in for the pickled sklearn objects in
+    predict_category / categorize_batch. Raises FileNotFoundError when the
+    artifact does not exist.
+    """
+    with open(os.path.join(artifact_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {meta.get('format_version')}")
+
+    def _load(name):
+        return np.load(os.path.join(artifact_dir, f"{name}.npy"),
+                       mmap_mode="r", allow_pickle=False)
+
+    vectorizer = CompactVectorizer(
+        meta, _load("vocab"), _load("columns"), _load("idf"))
+    model = CompactClassifier(
+        meta, _load("coef"), _load("intercept"), _load("classes"))
+    return model, vectorizer
@@ -0,0 +1,187 @@
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregate_cube import cubes_by_group, group_transactions
+from utils.balance_index import BalanceIndex
+from utils.compact_frame import transaction_amounts, transaction_days
+from utils.data_access import enrich_transactions
+from utils.ledger import (
+    DEFAULT_USER, LEDGER_DIR, register_accounts, save_account_cube,
+    save_balance_index, shard_dir
+)
+from utils.category_cache import categorize_cached
+from utils.ml_models import categorize_batch
+from utils.tracing import traced
+from utils.transaction_store import DEFAULT_ACCOUNT, append_store, write_manifest
+
+# ---------------------------
+# Streaming CSV import
+#
+# Reads a statement export in fixed-size chunks with explicit dtypes
+# (parsed dates, float amounts, categorical category / user / account)
+# and runs each chunk through the usual enrichment - normalized
+# merchants, brands, model categories for rows without one - before
+# appending it to its account shards, balance indexes and aggregate
+# cubes. Memory is bounded by the chunk size, not the file size.
+#
+# Shards are staged under ledger/_staging/ and only swapped in once the
+# whole file has been read, so a file that fails to read or enrich
+# leaves the ledger as it was. The swap itself is one directory replace
+# per account followed by a single registry update: a crash during it
+# can leave some shards replaced while the registry still describes the
+# old ones, until the file is imported again.
+# ---------------------------
+
+IMPORT_CHUNK_ROWS = 250_000
+STAGING_DIR = "_staging"
+
+CSV_DTYPES = {
+    "description": "str",
+    "amount": "float64",
+    "category": "category",
+    "user": "category",
+    "account": "category",
+}
+CSV_COLUMNS = ["date", *CSV_DTYPES]
+
+
+def read_csv_chunks(csv_path, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Iterator over typed chunks of up to chunk_rows rows; columns other
+    than CSV_COLUMNS are never parsed
+    """
+    return pd.read_csv(
+        csv_path,
+        chunksize=chunk_rows,
+        usecols=lambda c: c in CSV_COLUMNS,
+        dtype=CSV_DTYPES,
+        parse_dates=["date"],
+        date_format="ISO8601"
+    )
+
+
+@traced()
+def prepare_chunk(df, categorizer=None, user=DEFAULT_USER,
+                  account=DEFAULT_ACCOUNT):
+    """
+    Enrich one chunk, fill blank user / account keys with the defaults
+    and missing categories from the model
+    Categories come from the merchant-keyed cache (categorize_cached)
+    unless an explicit (model, vectorizer) categorizer is given.
+    """
+    # Missing or blank owner keys fall back to the defaults - groupby
+    # would otherwise drop those rows
+    for column, default in (("user", user), ("account", account)):
+        if column not in df.columns:
+            df = df.assign(**{column: default})
+        elif df[column].isna().any():
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype) and \
+                    default not in values.cat.categories:
+                values = values.cat.add_categories([default])
+            df = df.assign(**{column: values.fillna(default)})
+    df = enrich_transactions(df)
+
+    if "category" not in df.columns:
+        df["category"] = pd.Categorical([None] * len(df))
+    missing = df["category"].isna().to_numpy()
+    if missing.any():
+        descriptions = df.loc[missing, "description"]
+        if categorizer is None:
+            predicted = categorize_cached(descriptions)["category"]
+        else:
+            predicted = categorize_batch(descriptions,
+                                         *categorizer)["category"]
+        category = df["category"].astype(object)
+        category[missing] = predicted.to_numpy()
+        df["category"] = category.astype("category")
+    return df
+
+
+def import_csv(csv_path, ledger_dir=LEDGER_DIR, chunk_rows=IMPORT_CHUNK_ROWS,
+               user=DEFAULT_USER, account=DEFAULT_ACCOUNT, source=None,
+               categorizer=None, progress=None):
+    """
+    Stream a transactions CSV into the ledger, replacing the shards of
+    every account it contains (other accounts stay as they are)
+
+    Rows without user / account columns go to (user, account).
+    `progress(rows, seconds)` is called after every chunk. Returns
+    rows, accounts, keys ([(user, account)] written), seconds,
+    rows_per_second and the new registry.
+    """
+    staging = os.path.join(ledger_dir, STAGING_DIR)
+    shutil.rmtree(staging, ignore_errors=True)
+
+    # (user, account) -> [rows, first date, last date]
+    stats = {}
+    indexes = {}
+    # Cube cells of every chunk; "group" is the key's number in key_ids
+    key_ids = {}
+    cells = []
+    rows = 0
+    began = time.perf_counter()
+
+    for part, chunk in enumerate(read_csv_chunks(csv_path, chunk_rows)):
+        chunk = prepare_chunk(chunk, categorizer, user, account)
+        days, amounts = transaction_days(chunk), transaction_amounts(chunk)
+        groups = chunk.groupby(["user", "account"], observed=True,
+                               sort=False)
+        chunk_ids = []
+        for key, group in groups:
+            key = (str(key[0]), str(key[1]))
+            append_store(group.drop(columns="user"),
+                         shard_dir(*key, staging), part)
+
+            first, last = group["date"].iloc[0], group["date"].iloc[-1]
+            chunk_ids.append(key_ids.setdefault(key, len(key_ids)))
+            entry = stats.setdefault(key, [0, first, last])
+            entry[0] += len(group)
+            entry[1], entry[2] = min(entry[1], first), max(entry[2], last)
+            rows_at = group.index.to_numpy()
+            indexes.setdefault(key, BalanceIndex()).append_days(
+                days[rows_at], amounts[rows_at])
+            rows += len(group)
+
+        cells.append(group_transactions(
+            chunk, np.asarray(chunk_ids)[groups.ngroup().to_numpy()]))
+
+        if progress is not None:
+            progress(rows, time.perf_counter() - began)
+
+    cubes = cubes_by_group(pd.concat(cells, ignore_index=True)) \
+        if cells else {}
+    manifests = []
+    for key, (n, first, last) in sorted(stats.items()):
+        manifest = write_manifest({
+            "source": source,
+            "rows": n,
+            "min_date": first.strftime("%Y-%m-%d"),
+            "max_date": last.strftime("%Y-%m-%d"),
+            "accounts": [key[1]],
+        }, shard_dir(*key, staging))
+        save_balance_index(indexes[key], *key, manifest["written"], staging)
+        save_account_cube(cubes[key_ids[key]], *key, manifest["written"],
+                          staging)
+
+        target = shard_dir(*key, ledger_dir)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(shard_dir(*key, staging), target)
+        manifests.append((*key, manifest))
+    shutil.rmtree(staging, ignore_errors=True)
+
+    registry = register_accounts(manifests, ledger_dir, source)
+    seconds = time.perf_counter() - began
+    return {
+        "rows": rows,
+        "accounts": len(manifests),
+        "keys": [(user, account) for user, account, _ in manifests],
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "registry": registry,
+    }
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.merchant_utils import normalize_merchants, map_to_brands
+from utils.tracing import traced
+
+# ---------------------------
+# Shared, process-wide transaction data
+# ---------------------------
+
+DATA_FILE = "bank_transactions.csv"
+
+# path -> {"stat": (mtime_ns, size), "hash": str, "df": DataFrame}
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path):
+    """
+    Return (mtime_ns, size, content hash) for a data file
+
+    The hash is only recomputed when mtime or size changed since the last
+    load, so an unchanged file costs a single stat() call.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _CACHE.get(os.path.abspath(path))
+    if entry is not None and entry["stat"] == key:
+        return key + (entry["hash"],)
+
+    return key + (file_hash(path),)
+
+
+@traced()
+def enrich_transactions(df):
+    """
+    Type and enrich raw transactions: parsed dates, month label,
+    normalized merchant and canonical brand. Rows are sorted by date so
+    date ranges can be sliced without masking.
+    """
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    df["month"] = df["date"].dt.to_period("M").astype(str)
+    df["merchant_clean"] = normalize_merchants(df["description"])
+    df["brand"] = map_to_brands(df["merchant_clean"])
+    return df
+
+
+@traced()
+def load_transactions(path=DATA_FILE):
+    """
+    Load enriched transactions, once per file version
+
+    Every page in the process shares the returned DataFrame, so treat it
+    as read-only: derive new frames (filter_by_date, .assign, .copy)
+    instead of assigning columns in place.
+    Raises FileNotFoundError when the data file does not exist.
+    """
+    abs_path = os.path.abspath(path)
+
+    with _LOCK:
+        mtime_ns, size, digest = file_version(abs_path)
+        entry = _CACHE.get(abs_path)
+
+        if entry is not None and entry["hash"] == digest:
+            # Touched but unchanged content: keep the enriched frame
+            entry["stat"] = (mtime_ns, size)
+            return entry["df"]
+
+        df = enrich_transactions(pd.read_csv(abs_path))
+        _CACHE[abs_path] = {
+            "stat": (mtime_ns, size),
+            "hash": digest,
+            "df": df
+        }
+        return df
+
+
+def clear_cache():
+    with _LOCK:
+        _CACHE.clear()
+
+
+# ---------------------------
+# Cheap views over the shared frame
+# ---------------------------
+
+
+def date_bounds(df, start_date=None, end_date=None):
+    """
+    Row positions [lo, hi) covering start_date..end_date (inclusive days)
+    in a date-sorted frame
+    """
+    dates = df["date"].to_numpy()
+    lo = 0
+    hi = len(dates)
+
+    if start_date is not None:
+        lo = np.searchsorted(
+            dates, pd.Timestamp(start_date).to_datetime64(), side="left")
+    if end_date is not None:
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+        hi = np.searchsorted(dates, end.to_datetime64(), side="left")
+
+    return int(lo), int(max(lo, hi))
+
+
+def filter_by_date(df, start_date=None, end_date=None):
+    """
+    Positional slice of a date-sorted frame between two dates (inclusive)
+
+    Slicing shares the underlying column data instead of building a
+    boolean mask and copying every column.
+    """
+    lo, hi = date_bounds(df, start_date, end_date)
+    return df.iloc[lo:hi]
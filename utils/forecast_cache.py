@@ -0,0 +1,147 @@
+import hashlib
+
+import numpy as np
+
+from utils.cache_utils import LRUCache
+from utils.forecasters import FORECASTERS, choose_forecaster, get_forecaster
+from utils.ml_models import (
+    forecast_balance, forecast_balance_arima, forecast_balance_fast
+)
+from utils.tracing import traced
+
+# ---------------------------
+# Forecast result cache
+#
+# Keyed on a fingerprint of the daily balance series plus the model and
+# its order. Point forecasts for a shorter horizon are a prefix of a
+# longer one from the same fit, so each key keeps only its longest
+# forecast and serves every shorter horizon by slicing it.
+# ---------------------------
+
+
+# UI label -> model; "fast" is the default interactive path, "auto" the
+# most accurate backend within AUTO_BUDGET_SECONDS, the others are
+# opt-in when their dependencies are installed
+FORECAST_MODES = {
+    "Fast": "fast",
+    "Auto": "auto",
+    "Accurate (ARIMA)": "arima",
+    "Accurate (Prophet)": "prophet"
+}
+
+
+def forecast_modes():
+    """FORECAST_MODES restricted to the models that can run here"""
+    return {
+        label: model for label, model in FORECAST_MODES.items()
+        if model in ("fast", "auto") or FORECASTERS[model].available()
+    }
+
+
+# Latency budget of an interactive forecast in "auto" mode
+AUTO_BUDGET_SECONDS = 0.5
+
+
+def resolve_mode(model, budget_seconds=AUTO_BUDGET_SECONDS):
+    """
+    Model for a forecast mode: "auto" becomes the most accurate backend
+    whose recorded latency fits the budget (choose_forecaster)
+    """
+    if model == "auto":
+        return choose_forecaster(budget_seconds)
+    return model
+
+
+def series_fingerprint(balance_df):
+    """Hash of a (date, balance) series - identical history, identical key"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        balance_df["date"].to_numpy(dtype="datetime64[ns]").tobytes())
+    digest.update(balance_df["balance"].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class ForecastCache:
+    """LRU + TTL cache of forecast DataFrames with hit / miss counters"""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, balance_df, model, order, horizon):
+        key = (series_fingerprint(balance_df), model, tuple(order))
+        forecast = self._entries.get(key)
+
+        # A cached forecast shorter than the horizon cannot be extended
+        if forecast is None or len(forecast) < horizon:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return forecast.iloc[:horizon].copy()
+
+    def put(self, balance_df, model, order, forecast):
+        key = (series_fingerprint(balance_df), model, tuple(order))
+        current = self._entries.get(key)
+        if current is None or len(forecast) > len(current):
+            self._entries.put(key, forecast.copy())
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        stats = self._entries.stats()
+        stats.update(hits=self.hits, misses=self.misses)
+        return stats
+
+
+FORECAST_CACHE = ForecastCache()
+
+
+@traced()
+def forecast_balance_cached(df, days=30, balance_df=None, model="arima",
+                            order=(1, 1, 1), cache=None, **kwargs):
+    """
+    forecast_balance_arima / forecast_balance through the forecast cache
+
+    model is "fast" (forecast_balance_fast), "arima", "trend", "auto"
+    (resolve_mode) or the name of any other registered
+    forecaster (utils.forecasters). Returns None when the underlying
+    forecaster does (not enough history); those results are not cached.
+    """
+    from utils.ml_models import calculate_daily_balance
+
+    cache = FORECAST_CACHE if cache is None else cache
+    model = resolve_mode(model)
+    if balance_df is None:
+        if df is None:
+            return None
+        balance_df = calculate_daily_balance(df, **kwargs)
+    if balance_df.empty:
+        return None
+
+    cached = cache.get(balance_df, model, order, days)
+    if cached is not None:
+        return cached
+
+    if model == "fast":
+        forecast = forecast_balance_fast(
+            df, days=days, balance_df=balance_df, **kwargs)
+    elif model == "arima":
+        forecast = forecast_balance_arima(
+            df, days=days, balance_df=balance_df, order=order, **kwargs)
+    elif model == "trend":
+        forecast = forecast_balance(
+            df, days=days, balance_df=balance_df, **kwargs)
+    else:
+        forecaster = get_forecaster(model)
+        forecast = None
+        if len(balance_df) >= forecaster.min_points:
+            forecast = forecaster.fit(balance_df).predict_interval(days)
+
+    if forecast is not None:
+        cache.put(balance_df, model, order, forecast)
+    return forecast
@@ -0,0 +1,292 @@
+import importlib.util
+import time
+import warnings
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Forecaster registry
+#
+# Every balance forecaster exposes the same interface:
+#
+#   fit(balance_df)                      daily (date, balance) history
+#   predict(horizon)                     DataFrame (date, balance)
+#   predict_interval(horizon, alpha)     DataFrame (date, balance, lower, upper)
+#
+# Backends register under a name and record how long their fits and
+# predictions take, so a page can pick the best backend that fits its
+# latency budget (choose_forecaster).
+# ---------------------------
+
+FORECASTERS = {}
+
+# Most to least accurate - choose_forecaster walks this order
+PREFERENCE = ("prophet", "arima", "expsmooth", "trend")
+
+_Z = {0.01: 2.5758, 0.05: 1.9600, 0.1: 1.6449, 0.2: 1.2816}
+
+
+def _z_score(alpha):
+    """Two-sided normal quantile for the common alphas"""
+    if alpha in _Z:
+        return _Z[alpha]
+    from statistics import NormalDist
+    return NormalDist().inv_cdf(1 - alpha / 2)
+
+
+class LatencyRecord:
+    """Recent fit / predict timings of one backend"""
+
+    def __init__(self, window=50):
+        self.fit_seconds = deque(maxlen=window)
+        self.predict_seconds = deque(maxlen=window)
+
+    # Medians, so a one-off cold start (first import of statsmodels or
+    # Prophet) does not price a backend out of every later budget
+
+    def median_fit(self):
+        return float(np.median(self.fit_seconds)) \
+            if self.fit_seconds else None
+
+    def median_predict(self):
+        return float(np.median(self.predict_seconds)) \
+            if self.predict_seconds else None
+
+    def total(self):
+        """Median fit + predict seconds, or None before the first fit"""
+        if not self.fit_seconds:
+            return None
+        return self.median_fit() + (self.median_predict() or 0.0)
+
+
+def register_forecaster(name):
+    """Class decorator adding a Forecaster subclass to the registry"""
+    def _register(cls):
+        cls.name = name
+        cls.latency = LatencyRecord()
+        FORECASTERS[name] = cls
+        return cls
+    return _register
+
+
+def get_forecaster(name, **params):
+    """New instance of a registered backend"""
+    try:
+        cls = FORECASTERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown forecaster '{name}' (have: {', '.join(FORECASTERS)})")
+    return cls(**params)
+
+
+def available_forecasters():
+    """Names of the backends whose dependencies are installed"""
+    return [name for name, cls in FORECASTERS.items() if cls.available()]
+
+
+def latency_report():
+    """DataFrame of recorded median fit / predict seconds per backend"""
+    return pd.DataFrame([
+        {
+            "forecaster": name,
+            "available": cls.available(),
+            "fits": len(cls.latency.fit_seconds),
+            "median_fit_seconds": cls.latency.median_fit(),
+            "median_predict_seconds": cls.latency.median_predict(),
+            "expected_seconds": cls.expected_seconds
+        }
+        for name, cls in FORECASTERS.items()
+    ])
+
+
+def choose_forecaster(budget_seconds, preference=PREFERENCE):
+    """
+    Most preferred available backend whose latency fits the budget
+
+    Uses recorded timings once a backend has run, its expected_seconds
+    before that. Falls back to "trend".
+    """
+    for name in preference:
+        cls = FORECASTERS.get(name)
+        if cls is None or not cls.available():
+            continue
+        seconds = cls.latency.total()
+        if seconds is None:
+            seconds = cls.expected_seconds
+        if seconds <= budget_seconds:
+            return name
+    return "trend"
+
+
+class Forecaster:
+    """
+    Base class: subclasses implement _fit(dates, values) and
+    _forecast(horizon, alpha) -> (mean, lower, upper)
+    """
+
+    name = None
+    latency = None
+    expected_seconds = 0.0
+    min_points = 2
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def fit(self, balance_df):
+        values = balance_df["balance"].to_numpy(dtype=float)
+        if len(values) < self.min_points:
+            raise ValueError(
+                f"{self.name} needs at least {self.min_points} points, "
+                f"got {len(values)}")
+
+        dates = pd.to_datetime(balance_df["date"]).reset_index(drop=True)
+        start = time.perf_counter()
+        self._fit(dates, values)
+        self.latency.fit_seconds.append(time.perf_counter() - start)
+
+        self.last_date_ = dates.iloc[-1]
+        return self
+
+    def _future_dates(self, horizon):
+        return pd.date_range(
+            self.last_date_ + pd.Timedelta(days=1), periods=horizon)
+
+    def _timed_forecast(self, horizon, alpha):
+        start = time.perf_counter()
+        mean, lower, upper = self._forecast(horizon, alpha)
+        self.latency.predict_seconds.append(time.perf_counter() - start)
+        return mean, lower, upper
+
+    def predict(self, horizon):
+        mean, _, _ = self._timed_forecast(horizon, 0.05)
+        return pd.DataFrame({
+            "date": self._future_dates(horizon),
+            "balance": np.asarray(mean, dtype=float)
+        })
+
+    def predict_interval(self, horizon, alpha=0.05):
+        mean, lower, upper = self._timed_forecast(horizon, alpha)
+        return pd.DataFrame({
+            "date": self._future_dates(horizon),
+            "balance": np.asarray(mean, dtype=float),
+            "lower": np.asarray(lower, dtype=float),
+            "upper": np.asarray(upper, dtype=float)
+        })
+
+
+@register_forecaster("trend")
+class TrendForecaster(Forecaster):
+    """
+    Continue the average daily change (over the last `window` days, or
+    the whole series) - the band widens with the random-walk spread of
+    the daily changes
+    """
+
+    expected_seconds = 0.0005
+    min_points = 1
+
+    def __init__(self, window=None):
+        self.window = window
+
+    def _fit(self, dates, values):
+        changes = np.diff(values)
+        if self.window:
+            changes = changes[-self.window:]
+        self.last_ = values[-1]
+        self.slope_ = changes.mean() if len(changes) else 0.0
+        self.sigma_ = changes.std(ddof=1) if len(changes) > 1 else 0.0
+
+    def _forecast(self, horizon, alpha):
+        steps = np.arange(1, horizon + 1)
+        mean = self.last_ + self.slope_ * steps
+        spread = _z_score(alpha) * self.sigma_ * np.sqrt(steps)
+        return mean, mean - spread, mean + spread
+
+
+@register_forecaster("expsmooth")
+class ExpSmoothingForecaster(Forecaster):
+    """
+    Damped-trend Holt-Winters with weekly seasonality
+    (ml_models.holt_forecast, NumPy only)
+    """
+
+    expected_seconds = 0.005
+
+    def __init__(self, **params):
+        self.params = params
+
+    def _fit(self, dates, values):
+        from utils.ml_models import daily_grid
+
+        self.values_ = daily_grid(
+            pd.DataFrame({"date": dates, "balance": values})).to_numpy()
+
+    def _forecast(self, horizon, alpha):
+        from utils.ml_models import holt_forecast
+
+        return holt_forecast(
+            self.values_, horizon, interval_alpha=alpha, **self.params)
+
+
+@register_forecaster("arima")
+class ArimaForecaster(Forecaster):
+    """statsmodels ARIMA on the balance values"""
+
+    expected_seconds = 0.1
+    min_points = 30
+
+    def __init__(self, order=(1, 1, 1)):
+        self.order = tuple(order)
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("statsmodels") is not None
+
+    def _fit(self, dates, values):
+        from statsmodels.tsa.arima.model import ARIMA
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.results_ = ARIMA(values, order=self.order).fit()
+
+    def _forecast(self, horizon, alpha):
+        forecast = self.results_.get_forecast(horizon)
+        conf_int = np.asarray(forecast.conf_int(alpha=alpha))
+        return forecast.predicted_mean, conf_int[:, 0], conf_int[:, 1]
+
+
+@register_forecaster("prophet")
+class ProphetForecaster(Forecaster):
+    """Prophet with weekly seasonality (optional dependency)"""
+
+    expected_seconds = 1.0
+    min_points = 14
+
+    def __init__(self, weekly_seasonality=True, yearly_seasonality=False):
+        self.weekly_seasonality = weekly_seasonality
+        self.yearly_seasonality = yearly_seasonality
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec("prophet") is not None
+
+    def _fit(self, dates, values):
+        from prophet import Prophet
+
+        self.model_ = Prophet(
+            daily_seasonality=False,
+            weekly_seasonality=self.weekly_seasonality,
+            yearly_seasonality=self.yearly_seasonality
+        )
+        self.model_.fit(pd.DataFrame({"ds": dates, "y": values}))
+
+    def _forecast(self, horizon, alpha):
+        self.model_.interval_width = 1 - alpha
+        future = pd.DataFrame({"ds": self._future_dates(horizon)})
+        forecast = self.model_.predict(future)
+        return (forecast["yhat"].to_numpy(),
+                forecast["yhat_lower"].to_numpy(),
+                forecast["yhat_upper"].to_numpy())
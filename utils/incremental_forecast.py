@@ -0,0 +1,367 @@
+import os
+import threading
+import time
+import warnings
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from utils.batch_forecast import (
+    MIN_ARIMA_POINTS, _run_with_timeout, forecast_rows, forecast_table,
+    map_tasks
+)
+from utils.ml_models import trend_forecast
+
+# ---------------------------
+# Incremental ARIMA forecasting
+#
+# Keeps the fitted ARIMA results per account. When new daily balances
+# arrive the state-space filter is extended with the fixed parameters
+# (milliseconds) instead of re-estimating them (seconds). A full refit
+# only happens on a schedule or when the new observations drift too far
+# from what the current model predicted.
+#
+# The model tracks each account's whole balance series (which only grows
+# at the end), and forecasts for a date window are shifted to continue
+# from the window's last balance - ARIMA(p, 1, q) forecasts move with the
+# level. The batch job (forecast_accounts.py) estimates parameters in a
+# process pool and keeps the state under forecast_state/; the Forecast
+# page loads one account's state at a time and only extends it - it
+# never estimates parameters on the page thread.
+# ---------------------------
+
+STATE_DIR = "forecast_state"
+
+
+class _AccountState:
+    def __init__(self, values, dates, results, fitted_at, since_fit=0):
+        self.values = values
+        self.dates = dates
+        self.results = results
+        self.fitted_at = fitted_at
+        self.since_fit = since_fit
+
+
+def _series(balance_df):
+    return (balance_df["balance"].to_numpy(dtype=float),
+            balance_df["date"].to_numpy(dtype="datetime64[ns]"))
+
+
+class IncrementalArima:
+    """
+    Per-account ARIMA with warm updates
+
+    refit_every: observations appended since the last full fit that
+                 trigger a scheduled refit
+    max_age:     seconds after which the next update refits anyway
+    drift_threshold: mean |z| of the new observations against the current
+                 model's forecast above which the model is refitted
+    """
+
+    def __init__(self, order=(1, 1, 1), refit_every=30, max_age=24 * 3600,
+                 drift_threshold=3.0):
+        self.order = tuple(order)
+        self.refit_every = refit_every
+        self.max_age = max_age
+        self.drift_threshold = drift_threshold
+        self._accounts = {}
+
+    def __contains__(self, account):
+        return account in self._accounts
+
+    def fitted(self, account):
+        """True when the account has ARIMA results (else trend fallback)"""
+        state = self._accounts.get(account)
+        return state is not None and state.results is not None
+
+    def _fit(self, values):
+        if len(values) < MIN_ARIMA_POINTS:
+            return None
+
+        from statsmodels.tsa.arima.model import ARIMA
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return ARIMA(values, order=self.order).fit()
+        except Exception:
+            return None
+
+    def _filter(self, values, params):
+        """Results for known parameters - the filter only, no estimation"""
+        from statsmodels.tsa.arima.model import ARIMA
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return ARIMA(values, order=self.order).filter(params)
+
+    def _drifted(self, results, new_values):
+        """True when the new observations fall outside the model's forecast"""
+        forecast = results.get_forecast(len(new_values))
+        std = np.sqrt(np.asarray(forecast.var_pred_mean, dtype=float))
+        errors = new_values - np.asarray(forecast.predicted_mean, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.abs(errors) / std
+        return not np.all(np.isfinite(z)) or z.mean() > self.drift_threshold
+
+    def _action(self, account, values, dates):
+        """
+        (action, mask of new observations) for update(): "fit" when the
+        account is unknown or its stored history was rewritten, then
+        "refit", "extend" or "unchanged"
+        """
+        state = self._accounts.get(account)
+        if state is None or state.results is None:
+            return "fit", None
+
+        old = dates <= state.dates[-1]
+        if not np.array_equal(dates[old], state.dates) \
+                or not np.allclose(values[old], state.values):
+            return "fit", None
+
+        new = ~old
+        if not new.any():
+            return "unchanged", new
+
+        scheduled = state.since_fit + new.sum() >= self.refit_every \
+            or time.time() - state.fitted_at > self.max_age
+        if scheduled or self._drifted(state.results, values[new]):
+            return "refit", new
+        return "extend", new
+
+    def needs_fit(self, account, balance_df):
+        """True when update() would re-estimate the parameters"""
+        return self._action(account, *_series(balance_df))[0] in ("fit",
+                                                                  "refit")
+
+    def update(self, account, balance_df):
+        """
+        Bring an account up to date with its daily balance series
+
+        Returns the action taken: "fit", "extend", "refit", "unchanged" or
+        "trend" (too little history / fit failed, trend fallback is used).
+        """
+        values, dates = _series(balance_df)
+        action, new = self._action(account, values, dates)
+
+        if action == "fit":
+            results = self._fit(values)
+            self._accounts[account] = _AccountState(
+                values, dates, results, time.time())
+            return "fit" if results is not None else "trend"
+        if action == "unchanged":
+            return action
+
+        state = self._accounts[account]
+        state.values, state.dates = values, dates
+        state.since_fit += int(new.sum())
+
+        if action == "refit":
+            state.results = self._fit(state.values)
+            state.fitted_at = time.time()
+            state.since_fit = 0
+            return "refit" if state.results is not None else "trend"
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            state.results = state.results.extend(values[new])
+        return "extend"
+
+    def seed(self, account, balance_df, params):
+        """
+        Track an account with parameters estimated elsewhere (e.g. in a
+        worker process); params=None keeps the trend fallback
+        """
+        values, dates = _series(balance_df)
+        results = None
+        if params is not None and len(params):
+            results = self._filter(values, params)
+        self._accounts[account] = _AccountState(
+            values, dates, results, time.time())
+
+    def forecast(self, account, days=30, alpha=0.05, level=None):
+        """
+        Forecast DataFrame (date, balance, lower, upper) for an account
+
+        With level given, the forecast continues from that balance instead
+        of the tracked series' last one (e.g. a window re-based to an
+        opening balance).
+        """
+        state = self._accounts[account]
+        offset = 0.0 if level is None else level - state.values[-1]
+        future_dates = pd.date_range(
+            pd.Timestamp(state.dates[-1]) + pd.Timedelta(days=1), periods=days)
+
+        if state.results is None:
+            balance = trend_forecast(state.values, days)
+            return pd.DataFrame({
+                "date": future_dates,
+                "balance": balance + offset,
+                "lower": np.nan,
+                "upper": np.nan
+            })
+
+        forecast = state.results.get_forecast(days)
+        conf_int = np.asarray(forecast.conf_int(alpha=alpha))
+        return pd.DataFrame({
+            "date": future_dates,
+            "balance": np.asarray(forecast.predicted_mean) + offset,
+            "lower": conf_int[:, 0] + offset,
+            "upper": conf_int[:, 1] + offset
+        })
+
+    # ---------- persistence ----------
+
+    def save(self, directory=STATE_DIR):
+        """
+        Persist fitted parameters and history per account (.npz, no pickle)
+        Account ids are quoted into file names (e.g. demo%2Fmain.npz).
+        """
+        os.makedirs(directory, exist_ok=True)
+        for account, state in self._accounts.items():
+            params = np.asarray(state.results.params) \
+                if state.results is not None else np.array([])
+            np.savez(
+                os.path.join(directory, f"{quote(str(account), safe='')}.npz"),
+                values=state.values,
+                dates=state.dates.astype("int64"),
+                params=params,
+                fitted_at=np.float64(state.fitted_at),
+                since_fit=np.int64(state.since_fit)
+            )
+
+    def _restore(self, account, file_path):
+        with np.load(file_path) as data:
+            values = data["values"]
+            params = data["params"]
+            results = self._filter(values, params) if len(params) else None
+            self._accounts[account] = _AccountState(
+                values,
+                data["dates"].astype("datetime64[ns]"),
+                results,
+                float(data["fitted_at"]),
+                int(data["since_fit"])
+            )
+
+    def load(self, directory=STATE_DIR):
+        """
+        Restore saved accounts by re-running the filter with the stored
+        parameters - no re-estimation
+        """
+        if not os.path.isdir(directory):
+            return self
+
+        for name in os.listdir(directory):
+            if name.endswith(".npz"):
+                self._restore(unquote(name[:-len(".npz")]),
+                              os.path.join(directory, name))
+        return self
+
+    def load_account(self, account, directory=STATE_DIR):
+        """Restore one saved account; False when it has no saved state"""
+        file_path = os.path.join(directory,
+                                 f"{quote(str(account), safe='')}.npz")
+        if not os.path.exists(file_path):
+            return False
+        self._restore(account, file_path)
+        return True
+
+
+# ---------------------------
+# Batch job and pages
+# ---------------------------
+
+
+def _params_task(args):
+    """(account, ARIMA params or None, fit seconds, error) for one series"""
+    account, values, order, timeout = args
+    start = time.perf_counter()
+    if len(values) < MIN_ARIMA_POINTS:
+        return account, None, 0.0, "too few points"
+
+    def _fit():
+        from statsmodels.tsa.arima.model import ARIMA
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return np.asarray(ARIMA(values, order=order).fit().params)
+
+    try:
+        params, error = _run_with_timeout(_fit, timeout), None
+    except Exception as exc:
+        params, error = None, f"{type(exc).__name__}: {exc}"
+    return account, params, time.perf_counter() - start, error
+
+
+def forecast_accounts_incremental(model, histories, balances, days=30,
+                                  max_workers=None, timeout=30.0,
+                                  source_hash=None, history_window=None):
+    """
+    forecast_accounts() through a warm IncrementalArima
+
+    histories maps account -> its whole daily balance series (what the
+    model tracks); balances the window series the table rows are labelled
+    with, ending on the same day. Accounts that need new parameters are
+    estimated in parallel (batch_forecast.map_tasks) and seeded, the rest
+    are extended inline. Returns a forecast table with TABLE_COLUMNS.
+    """
+    accounts = [a for a, frame in balances.items() if len(frame)]
+    stale = [a for a in accounts if model.needs_fit(a, histories[a])]
+    tasks = [(a, histories[a]["balance"].to_numpy(dtype=float), model.order,
+              timeout) for a in stale]
+
+    fits = {}
+    for account, params, seconds, error in map_tasks(_params_task, tasks,
+                                                     max_workers):
+        model.seed(account, histories[account], params)
+        fits[account] = (seconds, error)
+
+    rows = []
+    for account in accounts:
+        if account not in fits:
+            start = time.perf_counter()
+            model.update(account, histories[account])
+            fits[account] = (time.perf_counter() - start, None)
+
+        frame = balances[account]
+        forecast = model.forecast(account, days,
+                                  level=frame["balance"].iloc[-1])
+        rows.append(forecast_rows(
+            account, frame, forecast["balance"].to_numpy(),
+            "arima" if model.fitted(account) else "trend", *fits[account],
+            source_hash=source_hash, history_window=history_window))
+    return forecast_table(rows)
+
+
+_SHARED = {"model": None}
+_SHARED_LOCK = threading.Lock()
+
+
+def warm_forecast(account, history_df, balance_df, days=30,
+                  directory=STATE_DIR):
+    """
+    ARIMA forecast for a window of an account's balances (balance_df)
+    from the process-wide warm model, restored per account from the
+    batch job's state
+
+    history_df is the account's whole series. Only fitted state is
+    extended here - parameters are never estimated on the page: returns
+    None when the account has no fitted state, is due a refit or the
+    window does not end on the account's last day.
+    """
+    if history_df.empty or balance_df.empty or \
+            balance_df["date"].iloc[-1] != history_df["date"].iloc[-1]:
+        return None
+
+    with _SHARED_LOCK:
+        if _SHARED["model"] is None:
+            _SHARED["model"] = IncrementalArima()
+        model = _SHARED["model"]
+        if account not in model:
+            model.load_account(account, directory)
+        if model.needs_fit(account, history_df):
+            return None
+        model.update(account, history_df)
+        return model.forecast(account, days,
+                              level=balance_df["balance"].iloc[-1])
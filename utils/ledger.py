@@ -0,0 +1,536 @@
+import json
+import os
+import shutil
+import threading
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from utils.balance_index import BalanceIndex, DEFAULT_START_BALANCE
+from utils.cache_utils import LRUCache
+from utils.data_access import (
+    DATA_FILE, file_version, filter_by_date,
+    load_transactions
+)
+from utils.tracing import traced
+from utils.transaction_store import (
+    DEFAULT_ACCOUNT, read_transactions, replace_from, store_available,
+    write_store
+)
+
+# ---------------------------
+# Multi-account, multi-tenant ledger
+#
+# Transactions are keyed by (user, account). Every account is its own
+# shard - a transaction store directory with month partitions - so
+# loading one account opens one directory instead of filtering a global
+# table:
+#
+#   ledger/
+#       _registry.json
+#       user=demo/account=main/...        (transaction store layout)
+#       user=demo/account=lloyds/...
+#
+# The registry lists every shard with its row count and date range, plus
+# per-account settings (start_balance) that survive shard rewrites. A
+# source CSV without user / account columns becomes a single
+# (DEFAULT_USER, DEFAULT_ACCOUNT) account.
+# ---------------------------
+
+LEDGER_DIR = "ledger"
+REGISTRY_FILE = "_registry.json"
+DEFAULT_USER = "demo"
+BALANCE_FILE = "_balance.npz"
+CUBE_FILE = "_cube.npz"
+
+# Shard columns the aggregate cube is built from
+CUBE_COLUMNS = ["date", "amount", "category", "brand"]
+
+_LOCK = threading.Lock()
+
+# (source path, ledger dir) -> (source stat, version, registry,
+#                               {(user, account): registry entry})
+_STATE = {}
+
+# Per-account caches are keyed by the shard's write stamp (see
+# _account_key), so writing one account leaves the others cached.
+# (written, user, account, start, end, columns) -> DataFrame
+_SHARD_CACHE = LRUCache(maxsize=32)
+
+# (written, user, account) -> BalanceIndex / AggregateCube
+_INDEX_CACHE = LRUCache(maxsize=64)
+_CUBE_CACHE = LRUCache(maxsize=64)
+
+
+def account_id(user, account):
+    """Flat string key for an account, e.g. in forecast tables"""
+    return f"{user}/{account}"
+
+
+def shard_dir(user, account, ledger_dir=LEDGER_DIR):
+    return os.path.join(ledger_dir, f"user={quote(str(user), safe='')}",
+                        f"account={quote(str(account), safe='')}")
+
+
+def with_account_keys(df):
+    """Add default user / account columns to an untagged frame"""
+    if "user" not in df.columns:
+        df = df.assign(user=DEFAULT_USER)
+    if "account" not in df.columns:
+        df = df.assign(account=DEFAULT_ACCOUNT)
+    return df
+
+
+# ---------- registry ----------
+
+def read_registry(ledger_dir=LEDGER_DIR):
+    try:
+        with open(os.path.join(ledger_dir, REGISTRY_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_registry(registry, ledger_dir):
+    os.makedirs(ledger_dir, exist_ok=True)
+    path = os.path.join(ledger_dir, REGISTRY_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# Registry entry keys set by the user rather than derived from the shard
+ACCOUNT_SETTINGS = ("start_balance",)
+
+
+def _registry_entry(user, account, manifest, previous=None):
+    entry = {
+        "user": str(user),
+        "account": str(account),
+        "rows": manifest["rows"],
+        "min_date": manifest["min_date"],
+        "max_date": manifest["max_date"],
+        "written": manifest.get("written"),
+    }
+    for key in ACCOUNT_SETTINGS:
+        if previous is not None and key in previous:
+            entry[key] = previous[key]
+    return entry
+
+
+def register_accounts(manifests, ledger_dir=LEDGER_DIR, source=None):
+    """
+    Add or replace registry entries for [(user, account, manifest)] and
+    bump the ledger revision, in one registry write; `source`, when
+    given, records the input the ledger was built from
+    """
+    with _LOCK:
+        registry = read_registry(ledger_dir) or {"source": None,
+                                                 "accounts": []}
+        entries = {(e["user"], e["account"]): e
+                   for e in registry["accounts"]}
+        for user, account, manifest in manifests:
+            key = (str(user), str(account))
+            entries[key] = _registry_entry(user, account, manifest,
+                                           entries.get(key))
+
+        registry["accounts"] = [entries[k] for k in sorted(entries)]
+        registry["revision"] = registry.get("revision", 0) + 1
+        if source is not None:
+            registry["source"] = source
+        _write_registry(registry, ledger_dir)
+    return registry
+
+
+def set_start_balance(user, account, amount, ledger_dir=LEDGER_DIR):
+    """
+    Record the opening balance of a registered account (balances are
+    start_balance + the running net flow); bumps the ledger revision
+    """
+    with _LOCK:
+        registry = read_registry(ledger_dir) or {"accounts": []}
+        for entry in registry["accounts"]:
+            if (entry["user"], entry["account"]) == (str(user), str(account)):
+                entry["start_balance"] = float(amount)
+                break
+        else:
+            raise KeyError(
+                f"No account {account_id(user, account)!r} in the ledger")
+
+        registry["revision"] = registry.get("revision", 0) + 1
+        _write_registry(registry, ledger_dir)
+    return registry
+
+
+def write_account(df, user, account, ledger_dir=LEDGER_DIR, source=None,
+                  register=True):
+    """
+    Replace one account's shard with `df` (enriched transactions); other
+    shards are not touched. With register=False the caller batches the
+    registry update through register_accounts.
+
+    The shard is written next to the old one and swapped in, so months
+    missing from `df` do not survive from the previous write.
+    """
+    target = shard_dir(user, account, ledger_dir)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest = write_store(df.assign(account=str(account)),
+                           store_dir=staging, source=source)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    if register:
+        register_accounts([(user, account, manifest)], ledger_dir)
+    return manifest
+
+
+def update_account(df, user, account, since, ledger_dir=LEDGER_DIR,
+                   source=None, register=True):
+    """
+    Replace one account's rows from `since` on with `df`, rewriting only
+    the month partitions from since's month onward (see write_account
+    for register)
+    """
+    manifest = replace_from(df.assign(account=str(account)), since,
+                            store_dir=shard_dir(user, account, ledger_dir),
+                            source=source)
+    if register:
+        register_accounts([(user, account, manifest)], ledger_dir)
+    return manifest
+
+
+def ingest_ledger(csv_path=DATA_FILE, ledger_dir=LEDGER_DIR, force=False):
+    """
+    Build the ledger from a transactions CSV (optional user / account
+    columns), skipping the work when it was built from the same version
+    The file is streamed in chunks (see utils/csv_import.py).
+    """
+    mtime_ns, size, digest = file_version(os.path.abspath(csv_path))
+    source = {"path": os.path.abspath(csv_path), "hash": digest}
+
+    registry = read_registry(ledger_dir)
+    if not force and registry is not None and registry.get("source") == source:
+        return registry
+
+    from utils.csv_import import import_csv
+
+    return import_csv(csv_path, ledger_dir=ledger_dir, source=source)["registry"]
+
+
+def _ledger_state(path, ledger_dir):
+    """
+    (version, registry, entries by key) of the ledger built from `path`;
+    the version (source hash + registry revision) keys every ledger
+    cache. Unchanged files cost two stat() calls.
+    """
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    try:
+        registry_stat = os.stat(os.path.join(ledger_dir, REGISTRY_FILE))
+        registry_key = (registry_stat.st_mtime_ns, registry_stat.st_size)
+    except FileNotFoundError:
+        registry_key = None
+    stat_key = (stat.st_mtime_ns, stat.st_size, registry_key)
+
+    state = _STATE.get((abs_path, ledger_dir))
+    if state is not None and state[0] == stat_key:
+        return state[1:]
+
+    if store_available():
+        registry = ingest_ledger(abs_path, ledger_dir)
+        version = f"{registry['source']['hash']}.{registry.get('revision', 0)}"
+        # Ingesting may have rewritten the registry
+        registry_stat = os.stat(os.path.join(ledger_dir, REGISTRY_FILE))
+        stat_key = stat_key[:2] + (
+            (registry_stat.st_mtime_ns, registry_stat.st_size),)
+    else:
+        df = with_account_keys(load_transactions(abs_path))
+        version = file_version(abs_path)[2]
+        registry = {"source": None, "accounts": [
+            {"user": str(user), "account": str(account), "rows": len(group),
+             "min_date": group["date"].min().strftime("%Y-%m-%d"),
+             "max_date": group["date"].max().strftime("%Y-%m-%d")}
+            for (user, account), group in df.groupby(
+                ["user", "account"], observed=True, sort=True)
+        ]}
+
+    entries = {(e["user"], e["account"]): e for e in registry["accounts"]}
+    _STATE[(abs_path, ledger_dir)] = (stat_key, version, registry, entries)
+    return version, registry, entries
+
+
+# ---------- read side ----------
+
+def ledger_version(path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """Source content hash + registry revision; changes on every write"""
+    return _ledger_state(path, ledger_dir)[0]
+
+
+def list_accounts(user=None, path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """Registry entries (user, account, rows, min_date, max_date)"""
+    registry = _ledger_state(path, ledger_dir)[1]
+    return [e for e in registry["accounts"]
+            if user is None or e["user"] == str(user)]
+
+
+def _entry(user, account, path, ledger_dir):
+    entries = _ledger_state(path, ledger_dir)[2]
+    try:
+        return entries[(str(user), str(account))]
+    except KeyError:
+        raise KeyError(
+            f"No account {account_id(user, account)!r} in the ledger"
+        ) from None
+
+
+def _account_key(user, account, path, ledger_dir):
+    """
+    (write stamp, user, account) of one account's shard, falling back to
+    the ledger version for entries without a stamp
+    """
+    entry = _entry(user, account, path, ledger_dir)
+    stamp = entry.get("written") or _ledger_state(path, ledger_dir)[0]
+    return stamp, str(user), str(account)
+
+
+def account_date_range(user=DEFAULT_USER, account=DEFAULT_ACCOUNT,
+                       path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """First and last transaction dates of an account, from the registry"""
+    entry = _entry(user, account, path, ledger_dir)
+    return pd.Timestamp(entry["min_date"]), pd.Timestamp(entry["max_date"])
+
+
+def account_start_balance(user=DEFAULT_USER, account=DEFAULT_ACCOUNT,
+                          path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """Opening balance of an account (DEFAULT_START_BALANCE unless set)"""
+    entry = _entry(user, account, path, ledger_dir)
+    return entry.get("start_balance", DEFAULT_START_BALANCE)
+
+
+@traced()
+def load_account(user=DEFAULT_USER, account=DEFAULT_ACCOUNT, start_date=None,
+                 end_date=None, columns=None, path=DATA_FILE,
+                 ledger_dir=LEDGER_DIR):
+    """
+    Date-sorted transactions of one account, read from its shard only
+
+    Every caller shares the returned frame: treat it as read-only.
+    Raises KeyError for an unknown account.
+    """
+    key = _account_key(user, account, path, ledger_dir) + (
+        None if start_date is None else pd.Timestamp(start_date),
+        None if end_date is None else pd.Timestamp(end_date),
+        None if columns is None else tuple(columns))
+    df = _SHARD_CACHE.get(key)
+    if df is not None:
+        return df
+
+    if store_available():
+        df = read_transactions(shard_dir(user, account, ledger_dir),
+                               start_date, end_date, columns=columns)
+    else:
+        full = with_account_keys(load_transactions(path))
+        mask = (full["user"] == str(user)) & (full["account"] == str(account))
+        df = filter_by_date(full[mask].drop(columns="user"),
+                            start_date, end_date).reset_index(drop=True)
+        if columns is not None:
+            df = df[list(columns)]
+
+    _SHARD_CACHE.put(key, df)
+    return df
+
+
+def load_accounts(keys=None, start_date=None, end_date=None, columns=None,
+                  path=DATA_FILE, ledger_dir=LEDGER_DIR, compact=False):
+    """
+    Union of several accounts (default: all), date-sorted, with
+    categorical user / account columns
+    compact=True converts every shard before the union and returns a
+    compact frame (utils/compact_frame.py); `columns` must then include
+    date and amount.
+    """
+    from utils.compact_frame import concat_compact, to_compact
+
+    if keys is None:
+        keys = [(e["user"], e["account"])
+                for e in list_accounts(path=path, ledger_dir=ledger_dir)]
+
+    frames = []
+    for user, account in keys:
+        df = load_account(user, account, start_date, end_date, columns,
+                          path=path, ledger_dir=ledger_dir)
+        if compact:
+            df = to_compact(df.drop(columns="account", errors="ignore"))
+            owner = np.zeros(len(df), dtype=np.int8)
+            df.insert(0, "user", pd.Categorical.from_codes(owner, [str(user)]))
+            df.insert(1, "account",
+                      pd.Categorical.from_codes(owner, [str(account)]))
+            frames.append(df)
+        else:
+            frames.append(df.assign(user=str(user), account=str(account)))
+
+    if not frames:
+        return pd.DataFrame(columns=["user", "account"])
+
+    if compact:
+        union = concat_compact(frames)
+        order = np.argsort(union["day"].to_numpy(), kind="stable")
+        return union.take(order).reset_index(drop=True)
+
+    union = pd.concat(frames, ignore_index=True)
+    for col in ("user", "account"):
+        union[col] = union[col].astype("category")
+    if "date" in union.columns:
+        union = union.sort_values("date", kind="stable") \
+            .reset_index(drop=True)
+    return union
+
+
+def map_accounts(fn, keys=None, path=DATA_FILE, ledger_dir=LEDGER_DIR,
+                 **load_kwargs):
+    """
+    Run fn(df) on every account (or the given (user, account) keys),
+    loading one shard at a time; returns {(user, account): result}
+    """
+    if keys is None:
+        keys = [(e["user"], e["account"])
+                for e in list_accounts(path=path, ledger_dir=ledger_dir)]
+
+    return {
+        (user, account): fn(load_account(user, account, path=path,
+                                         ledger_dir=ledger_dir,
+                                         **load_kwargs))
+        for user, account in keys
+    }
+
+
+def load_balance_index(user, account, written, ledger_dir=LEDGER_DIR):
+    """
+    The BalanceIndex saved in an account's shard, or None when it is
+    missing or was saved for another write of the shard
+    """
+    saved = os.path.join(shard_dir(user, account, ledger_dir), BALANCE_FILE)
+    if not os.path.exists(saved):
+        return None
+    index, metadata = BalanceIndex.load(saved)
+    return index if metadata.get("written") == str(written) else None
+
+
+def save_balance_index(index, user, account, written, ledger_dir=LEDGER_DIR):
+    """Persist an account's BalanceIndex for one write of its shard"""
+    store = shard_dir(user, account, ledger_dir)
+    if os.path.isdir(store):
+        index.save(os.path.join(store, BALANCE_FILE), written=written)
+
+
+def load_account_cube(user, account, written, ledger_dir=LEDGER_DIR):
+    """
+    The AggregateCube saved in an account's shard, or None when it is
+    missing or was saved for another write of the shard
+    """
+    from utils.aggregate_cube import AggregateCube
+
+    saved = os.path.join(shard_dir(user, account, ledger_dir), CUBE_FILE)
+    if not os.path.exists(saved):
+        return None
+    cube, metadata = AggregateCube.load(saved)
+    return cube if metadata.get("written") == str(written) else None
+
+
+def save_account_cube(cube, user, account, written, ledger_dir=LEDGER_DIR):
+    """Persist an account's AggregateCube for one write of its shard"""
+    store = shard_dir(user, account, ledger_dir)
+    if os.path.isdir(store):
+        cube.save(os.path.join(store, CUBE_FILE), written=written)
+
+
+def account_balance_index(user=DEFAULT_USER, account=DEFAULT_ACCOUNT,
+                          path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """
+    BalanceIndex of one account, persisted inside its shard
+
+    Imports and syncs save it with the shard (appending new rows to the
+    previous index); it is only rebuilt from the shard when missing.
+    """
+    key = _account_key(user, account, path, ledger_dir)
+
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        index = load_balance_index(user, account, key[0], ledger_dir)
+        if index is None:
+            index = BalanceIndex.from_transactions(load_account(
+                user, account, columns=["date", "amount"], path=path,
+                ledger_dir=ledger_dir))
+            save_balance_index(index, user, account, key[0], ledger_dir)
+        _INDEX_CACHE.put(key, index)
+
+    # The opening balance is a registry setting, not part of the shard
+    index.start_balance = float(
+        account_start_balance(user, account, path, ledger_dir))
+    return index
+
+
+def account_cube(user=DEFAULT_USER, account=DEFAULT_ACCOUNT, path=DATA_FILE,
+                 ledger_dir=LEDGER_DIR):
+    """
+    AggregateCube over every transaction of one account, persisted
+    inside its shard
+
+    Imports and syncs save it with the shard (appending new rows to the
+    previous cube); it is only rebuilt from the shard when missing.
+    """
+    from utils.aggregate_cube import AggregateCube
+
+    key = _account_key(user, account, path, ledger_dir)
+
+    cube = _CUBE_CACHE.get(key)
+    if cube is None:
+        cube = load_account_cube(user, account, key[0], ledger_dir)
+        if cube is None:
+            cube = AggregateCube.from_transactions(load_account(
+                user, account, columns=CUBE_COLUMNS, path=path,
+                ledger_dir=ledger_dir))
+            save_account_cube(cube, user, account, key[0], ledger_dir)
+        _CUBE_CACHE.put(key, cube)
+    return cube
+
+
+def account_aggregate_between(user, account, start_date, end_date,
+                              path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """AggregateCube of one account between two dates (inclusive)"""
+    from utils.aggregate_cube import window_cube
+
+    return window_cube(
+        account_cube(user, account, path, ledger_dir),
+        account_date_range(user, account, path, ledger_dir),
+        start_date, end_date,
+        lambda start, end: load_account(user, account, start, end,
+                                        path=path, ledger_dir=ledger_dir)
+    )
+
+
+def clear_ledger_cache():
+    _STATE.clear()
+    _SHARD_CACHE.clear()
+    _INDEX_CACHE.clear()
+    _CUBE_CACHE.clear()
+
+
+# ---------- UI selection ----------
+
+def selected_account(path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """
+    (user, account) picked in the app sidebar, defaulting to the first
+    account of DEFAULT_USER when nothing (or a stale account) is selected
+    """
+    import streamlit as st
+
+    choice = st.session_state.get("account")
+    entries = _ledger_state(path, ledger_dir)[2]
+    if choice is not None and tuple(choice) in entries:
+        return tuple(choice)
+
+    accounts = list_accounts(DEFAULT_USER, path, ledger_dir) or \
+        list_accounts(path=path, ledger_dir=ledger_dir)
+    return accounts[0]["user"], accounts[0]["account"]
@@ -1,9 +1,29 @@
 import re
 
+import numpy as np
+import pandas as pd
+
+from utils.brand_matcher import BrandMatcher, load_brand_dictionary
+from utils.cache_utils import LRUCache
+from utils.tracing import traced
+
 # ---------------------------
 # Normalize raw merchant text
 # ---------------------------
 
+NOISE_WORDS = [
+    "CONTACTLESS", "ONLINE", "UK", "LONDON",
+    "MANCHESTER", "PAYMENT", "CARD"
+]
+
+_DIGITS_RE = re.compile(r"\d+")
+_SYMBOLS_RE = re.compile(r"[^A-Z ]")
+_NOISE_RE = re.compile("|".join(map(re.escape, NOISE_WORDS)))
+_SPACES_RE = re.compile(r"\s+")
+
+# Normalized results keyed on the raw description, shared across calls
+_NORMALIZE_CACHE = LRUCache(maxsize=200_000)
+
 
 def normalize_merchant(text: str) -> str:
     if not isinstance(text, str):
@@ -12,25 +32,70 @@ def normalize_merchant(text: str) -> str:
     text = text.upper()
 
     # Remove numbers (store ids, refs)
-    text = re.sub(r"\d+", "", text)
+    text = _DIGITS_RE.sub("", text)
 
     # Remove symbols
-    text = re.sub(r"[^A-Z ]", " ", text)
+    text = _SYMBOLS_RE.sub(" ", text)
 
     # Remove noise words
-    noise_words = [
-        "CONTACTLESS", "ONLINE", "UK", "LONDON",
-        "MANCHESTER", "PAYMENT", "CARD"
-    ]
-    for word in noise_words:
-        text = text.replace(word, "")
+    text = _NOISE_RE.sub("", text)
 
     # Normalize spaces
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _SPACES_RE.sub(" ", text).strip()
 
     return text
 
 
+def _normalize_unique(values: pd.Series) -> pd.Series:
+    """
+    Vectorized normalize_merchant for a Series of distinct strings
+    """
+    return (
+        values.str.upper()
+        .str.replace(_DIGITS_RE, "", regex=True)
+        .str.replace(_SYMBOLS_RE, " ", regex=True)
+        .str.replace(_NOISE_RE, "", regex=True)
+        .str.replace(_SPACES_RE, " ", regex=True)
+        .str.strip()
+    )
+
+
+@traced()
+def normalize_merchants(descriptions) -> pd.Series:
+    """
+    Normalize a whole column of raw descriptions
+
+    Accepts a pandas Series, an Arrow array or any list-like. Each distinct
+    description is normalized once (and remembered across calls), then the
+    results are broadcast back to every row.
+    """
+    if hasattr(descriptions, "to_pandas"):
+        descriptions = descriptions.to_pandas()
+    if not isinstance(descriptions, pd.Series):
+        descriptions = pd.Series(descriptions, dtype=object)
+
+    codes, uniques = pd.factorize(descriptions)
+    uniques = list(uniques)
+
+    found, missing = _NORMALIZE_CACHE.get_many(
+        u for u in uniques if isinstance(u, str)
+    )
+    if missing:
+        computed = _normalize_unique(pd.Series(missing, dtype=object))
+        _NORMALIZE_CACHE.put_many(zip(missing, computed))
+        found.update(zip(missing, computed))
+
+    lookup = np.array(
+        [found.get(u, "UNKNOWN") for u in uniques] + ["UNKNOWN"],
+        dtype=object
+    )
+
+    # factorize marks missing values with -1, which picks "UNKNOWN"
+    return pd.Series(
+        lookup[codes], index=descriptions.index, name=descriptions.name
+    )
+
+
 # ---------------------------
 # Brand mapping (Open Banking style)
 # ---------------------------
@@ -54,13 +119,73 @@ BRAND_MAP = {
 }
 
 
+# Built lazily from BRAND_MAP plus any loaded dictionary files
+_BRAND_MATCHER = None
+_BRAND_CACHE = LRUCache(maxsize=200_000)
+
+
+def get_brand_matcher() -> BrandMatcher:
+    global _BRAND_MATCHER
+    if _BRAND_MATCHER is None:
+        _BRAND_MATCHER = BrandMatcher(BRAND_MAP)
+    return _BRAND_MATCHER
+
+
+def load_brand_dictionaries(*paths) -> BrandMatcher:
+    """
+    Rebuild the brand matcher from BRAND_MAP followed by external
+    dictionary files (CSV `pattern,brand` or JSON), in that priority order
+    """
+    global _BRAND_MATCHER
+
+    matcher = BrandMatcher(BRAND_MAP)
+    for path in paths:
+        matcher.add_many(load_brand_dictionary(path))
+
+    _BRAND_MATCHER = matcher
+    _BRAND_CACHE.clear()
+    return matcher
+
+
 def map_to_brand(merchant_clean: str) -> str:
     if not merchant_clean:
         return "Unknown"
 
-    for key, brand in BRAND_MAP.items():
-        if key in merchant_clean:
-            return brand
+    brand = get_brand_matcher().match(merchant_clean)
+    if brand is not None:
+        return brand
 
     # Safe fallback
     return merchant_clean.split(" ")[0].title()
+
+
+@traced()
+def map_to_brands(merchants) -> pd.Series:
+    """
+    Map a whole column of normalized merchants to brands
+
+    Distinct merchants are matched once and cached across calls; missing
+    or empty values map to "Unknown" like map_to_brand.
+    """
+    if hasattr(merchants, "to_pandas"):
+        merchants = merchants.to_pandas()
+    if not isinstance(merchants, pd.Series):
+        merchants = pd.Series(merchants, dtype=object)
+
+    codes, uniques = pd.factorize(merchants)
+    uniques = list(uniques)
+
+    found, missing = _BRAND_CACHE.get_many(
+        u for u in uniques if isinstance(u, str)
+    )
+    if missing:
+        computed = [map_to_brand(m) for m in missing]
+        _BRAND_CACHE.put_many(zip(missing, computed))
+        found.update(zip(missing, computed))
+
+    lookup = np.array(
+        [found.get(u, "Unknown") for u in uniques] + ["Unknown"],
+        dtype=object
+    )
+
+    return pd.Series(lookup[codes], index=merchants.index, name=merchants.name)
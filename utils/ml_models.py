@@ -1,17 +1,35 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from itertools import islice
 import pickle
-from statsmodels.tsa.arima.model import ARIMA
-from utils.merchant_utils import normalize_merchant, map_to_brand
-
+from utils.aggregate_cube import AggregateCube, EXPENSE, INCOME
+from utils.balance_index import BalanceIndex, DEFAULT_START_BALANCE
+from utils.compact_frame import (
+    from_compact, transaction_amounts, transaction_dates
+)
+from utils.compact_model import ARTIFACT_DIR, load_compact_categorizer
+from utils.merchant_utils import normalize_merchants, map_to_brands
+from utils.tracing import traced
+
+
+def load_categorizer(model_path='categorizer_model.pkl',
+                     vectorizer_path='vectorizer.pkl',
+                     artifact_dir=ARTIFACT_DIR):
+    """
+    Load the trained ML model
+    Prefers the memory-mapped compact artifact, falls back to the pickles
+    """
+    if artifact_dir is not None:
+        try:
+            return load_compact_categorizer(artifact_dir)
+        except FileNotFoundError:
+            pass
 
-def load_categorizer():
-    """Load the trained ML model"""
     try:
-        with open('categorizer_model.pkl', 'rb') as f:
+        with open(model_path, 'rb') as f:
             model = pickle.load(f)
-        with open('vectorizer.pkl', 'rb') as f:
+        with open(vectorizer_path, 'rb') as f:
             vectorizer = pickle.load(f)
         return model, vectorizer
     except FileNotFoundError:
@@ -26,77 +44,232 @@ def predict_category(description, model, vectorizer):
     return prediction
 
 
-def detect_recurring_transactions(df):
+CATEGORIZE_CHUNK_SIZE = 8192
+
+
+def _categorize_chunk(descriptions, model, vectorizer):
+    """One sparse transform + one predict_proba for a list of descriptions"""
+    if model is None or vectorizer is None:
+        return pd.DataFrame({
+            "description": descriptions,
+            "category": "Unknown",
+            "probability": np.nan
+        })
+
+    texts = [d if isinstance(d, str) else "" for d in descriptions]
+    proba = model.predict_proba(vectorizer.transform(texts))
+    best = proba.argmax(axis=1)
+
+    return pd.DataFrame({
+        "description": descriptions,
+        "category": model.classes_[best],
+        "probability": proba[np.arange(len(best)), best]
+    })
+
+
+def categorize_stream(descriptions, model, vectorizer,
+                      chunk_size=CATEGORIZE_CHUNK_SIZE):
     """
-    Detect recurring transactions with confidence scoring
+    Categorize an iterable of descriptions in fixed-size chunks
+
+    Yields one DataFrame (description, category, probability) per chunk,
+    so arbitrarily long inputs (e.g. a historical backfill read from disk)
+    run in bounded memory.
     """
+    iterator = iter(descriptions)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield _categorize_chunk(chunk, model, vectorizer)
 
-    recurring = []
 
-    for desc in df["description"].unique():
-        tx = df[df["description"] == desc].sort_values("date")
+@traced()
+def categorize_batch(descriptions, model, vectorizer,
+                     chunk_size=CATEGORIZE_CHUNK_SIZE):
+    """
+    Categorize many descriptions at once
+    Returns a DataFrame with description, category and probability columns
+    """
+    chunks = list(categorize_stream(
+        descriptions, model, vectorizer, chunk_size=chunk_size))
+    if not chunks:
+        return pd.DataFrame(columns=["description", "category", "probability"])
+    return pd.concat(chunks, ignore_index=True)
 
-        if len(tx) < 2:
-            continue
 
-        dates = pd.to_datetime(tx["date"])
-        intervals = dates.diff().dt.days.dropna()
+# Columns identifying the owner of a transaction in multi-account frames
+ACCOUNT_KEYS = ["user", "account"]
 
-        if intervals.empty:
-            continue
+RECURRING_COLUMNS = [
+    "description", "merchant_clean", "brand", "category",
+    "amount", "next_date", "confidence"
+]
 
-        avg_interval = intervals.mean()
-        std_interval = intervals.std()
 
-        # Must be roughly monthly or consistent
-        if not (25 <= avg_interval <= 35 or std_interval < 5):
-            continue
+def _group_mean_std(values, group_ids, n_groups, counts):
+    """
+    Per-group mean and sample std (ddof=1) for values already sorted by group
+    """
+    sums = np.bincount(group_ids, weights=values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+        sq_dev = (values - mean[group_ids]) ** 2
+        var = np.bincount(group_ids, weights=sq_dev,
+                          minlength=n_groups) / (counts - 1)
+    return mean, np.sqrt(var)
+
+
+@traced()
+def detect_recurring_transactions(df, as_of=None):
+    """
+    Detect recurring transactions with confidence scoring
+
+    Only merchants whose next payment falls after `as_of` (default: now)
+    are returned. In frames holding several accounts (user / account
+    columns) each account's payments are scored separately. df may be an
+    enriched or a compact frame (utils/compact_frame.py).
+
+    All merchants are scored in one sorted pass: rows are ordered by
+    (description, date) once and interval / amount statistics are computed
+    per group with NumPy, instead of masking the frame per description.
+    """
+
+    if df is None or df.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    codes, uniques = pd.factorize(df["description"])
+    description_of = np.arange(len(uniques))
+
+    # Multi-account frames: score each (account, description) separately
+    owner_columns = [c for c in ACCOUNT_KEYS if c in df.columns]
+    if owner_columns:
+        owners = df.groupby(owner_columns, observed=True, sort=False) \
+            .ngroup().to_numpy()
+        if len(owners) and owners.max() > 0:
+            valid = codes >= 0
+            pair_codes, pairs = pd.factorize(
+                owners[valid] * len(uniques) + codes[valid])
+            codes = np.full(len(codes), -1, dtype=np.int64)
+            codes[valid] = pair_codes
+            description_of = pairs % len(uniques)
+
+    dates = transaction_dates(df)
+    amounts = transaction_amounts(df)
+    categories = df["category"].to_numpy()
+
+    valid = codes >= 0
+    rows = np.flatnonzero(valid)
+    order = rows[np.lexsort((dates[rows], codes[rows]))]
+
+    codes_s = codes[order]
+    dates_s = dates[order]
+    amounts_s = np.abs(amounts[order])
+
+    n = len(order)
+    if n == 0:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    starts = np.flatnonzero(np.r_[True, codes_s[1:] != codes_s[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    n_groups = len(starts)
+    group_ids = np.repeat(np.arange(n_groups), counts)
+    last_idx = starts + counts - 1
+
+    # ---------- INTERVALS ----------
+    same_group = codes_s[1:] == codes_s[:-1]
+    gaps = (dates_s[1:] - dates_s[:-1]) // np.timedelta64(1, "D")
+    interval_groups = group_ids[1:][same_group]
+    intervals = gaps[same_group].astype(float)
+
+    avg_interval, std_interval = _group_mean_std(
+        intervals, interval_groups, n_groups, counts - 1
+    )
 
-        amounts = tx["amount"].abs()
-        amount_std_pct = amounts.std() / amounts.mean() if amounts.mean() != 0 else 1
+    # Must be roughly monthly or consistent
+    eligible = (counts >= 2) & (
+        ((avg_interval >= 25) & (avg_interval <= 35)) | (std_interval < 5)
+    )
+
+    # ---------- AMOUNT DISPERSION ----------
+    amount_mean, amount_std = _group_mean_std(
+        amounts_s, group_ids, n_groups, counts
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        amount_std_pct = np.where(
+            amount_mean != 0, amount_std / amount_mean, 1)
+
+    # ---------- CONFIDENCE ----------
+    drift = np.abs(avg_interval - 30)
+    confidence = np.select(
+        [
+            (counts >= 6) & (drift <= 2) & (amount_std_pct < 0.05),
+            (counts >= 3) & (drift <= 4),
+        ],
+        ["High", "Medium"],
+        default="Low"
+    )
+
+    avg_days = np.where(eligible, avg_interval, 0).astype(np.int64)
+    next_date = dates_s[last_idx] + avg_days.astype("timedelta64[D]")
 
-        # ---------- CONFIDENCE ----------
-        if len(tx) >= 6 and abs(avg_interval - 30) <= 2 and amount_std_pct < 0.05:
-            confidence = "High"
-        elif len(tx) >= 3 and abs(avg_interval - 30) <= 4:
-            confidence = "Medium"
-        else:
-            confidence = "Low"
+    as_of = pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+    keep = eligible & (next_date > as_of.to_datetime64())
+    if not keep.any():
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
 
-        last_tx = tx.iloc[-1]
-        next_date = last_tx["date"] + timedelta(days=int(avg_interval))
+    last_rows = order[last_idx[keep]]
+    descriptions = pd.Series(
+        uniques[description_of[codes_s[last_idx[keep]]]])
+    merchant_clean = normalize_merchants(descriptions)
 
-        merchant_clean = normalize_merchant(last_tx["description"])
-        brand = map_to_brand(merchant_clean)
+    return pd.DataFrame({
+        **{c: df[c].to_numpy()[last_rows] for c in owner_columns},
+        "description": descriptions.to_numpy(),
+        "merchant_clean": merchant_clean.to_numpy(),
+        "brand": map_to_brands(merchant_clean).to_numpy(),
+        "category": categories[last_rows],
+        "amount": amounts[last_rows],
+        "next_date": pd.to_datetime(next_date[keep]),
+        "confidence": confidence[keep]
+    })
+
+
+def per_account(fn, df, *args, **kwargs):
+    """
+    Run an analysis separately on every account of a multi-account frame
+    Returns {(user, account): result}, keyed by whichever of the two
+    columns the frame has
+    """
+    keys = [c for c in ACCOUNT_KEYS if c in df.columns]
+    if not keys:
+        raise ValueError("account column missing. Use a ledger frame.")
 
-        if next_date > pd.Timestamp.now():
+    return {
+        key: fn(group, *args, **kwargs)
+        for key, group in df.groupby(keys, observed=True, sort=True)
+    }
 
-            recurring.append({
-                "description": last_tx["description"],
-                "merchant_clean": merchant_clean,
-                "brand": brand,
-                "category": last_tx["category"],
-                "amount": last_tx["amount"],
-                "next_date": next_date,
-                "confidence": confidence
-            })
 
-    return pd.DataFrame(recurring)
+def _as_cube(data):
+    """Transactions (enriched or compact) or an AggregateCube -> AggregateCube"""
+    if isinstance(data, AggregateCube):
+        return data
+    return AggregateCube.from_transactions(data)
 
 
+@traced()
 def calculate_savings_opportunity(df):
     """
     Calculate how much can safely be moved to savings
     Analyzes cash flow to find safe buffer amount
+    df may be a transactions frame or an AggregateCube
     """
-    # Get income and expenses
-    monthly_income = df[df['amount'] > 0].groupby(
-        pd.to_datetime(df['date']).dt.to_period('M')
-    )['amount'].sum().mean()
+    cube = _as_cube(df)
 
-    monthly_expenses = abs(df[df['amount'] < 0].groupby(
-        pd.to_datetime(df['date']).dt.to_period('M')
-    )['amount'].sum().mean())
+    # Get income and expenses
+    monthly_income = cube.monthly(INCOME).mean()
+    monthly_expenses = abs(cube.monthly(EXPENSE).mean())
 
     # Calculate average surplus
     surplus = monthly_income - monthly_expenses
@@ -112,6 +285,7 @@ def calculate_savings_opportunity(df):
     }
 
 
+@traced()
 def analyze_subscriptions(df):
     """
     Analyze subscriptions using canonical merchant (brand)
@@ -121,13 +295,14 @@ def analyze_subscriptions(df):
         raise ValueError(
             "brand column missing. Normalize merchants before calling.")
 
-    subs = df[df["category"] == "Subscriptions"].copy()
+    # Compact frames expand only the (few) subscription rows
+    subs = from_compact(df[df["category"] == "Subscriptions"]).copy()
 
     if subs.empty:
         return None
 
     summary = (
-        subs.groupby("brand")
+        subs.groupby("brand", observed=True)
         .agg(
             count=("amount", "count"),
             avg=("amount", "mean"),
@@ -150,33 +325,34 @@ def analyze_subscriptions(df):
     return summary.sort_values("yearly_cost", ascending=False)
 
 
+@traced()
 def detect_spending_patterns(df):
     """
     Detect unusual spending patterns
     Compares current month vs previous months
+    df may be a transactions frame or an AggregateCube
     """
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.to_period('M')
+    cube = _as_cube(df)
+    if len(cube) == 0:
+        return []
+
+    # Month x category totals; NaN where a category had no transactions
+    spending = cube.pivot("category")
 
     # Get current and previous month
-    current_month = df['month'].max()
-    previous_months = df[df['month'] < current_month]
-    current_data = df[df['month'] == current_month]
+    current_month = spending.index.max()
+    current = spending.loc[current_month].fillna(0).abs()
+    previous = spending[spending.index < current_month].mean().abs()
 
     alerts = []
 
     # Analyze by category
-    for category in df['category'].unique():
+    for category in spending.columns:
         if category == 'Income':
             continue
 
-        # Current month spending
-        current_spending = abs(
-            current_data[current_data['category'] == category]['amount'].sum())
-
-        # Average previous spending
-        prev_spending = abs(previous_months[previous_months['category'] == category].groupby(
-            'month')['amount'].sum().mean())
+        current_spending = current[category]
+        prev_spending = previous[category]
 
         if prev_spending > 0:
             change_pct = ((current_spending - prev_spending) /
@@ -204,27 +380,26 @@ def detect_spending_patterns(df):
     return alerts
 
 
-def calculate_daily_balance(df):
+@traced()
+def calculate_daily_balance(df, start_balance=DEFAULT_START_BALANCE):
     """
     Calculate daily account balance
     Used for forecasting
     """
-    df['date'] = pd.to_datetime(df['date'])
-    daily_balance = df.groupby('date')['amount'].sum(
-    ).cumsum() + 1000  # Start with £1000
+    return BalanceIndex.from_transactions(df, start_balance).frame()
 
-    return pd.DataFrame({
-        'date': daily_balance.index,
-        'balance': daily_balance.values
-    })
 
-
-def predict_low_balance_dates(df, threshold=100):
+@traced()
+def predict_low_balance_dates(df, threshold=100,
+                              start_balance=DEFAULT_START_BALANCE,
+                              balance_df=None):
     """
     Predict when balance might drop below threshold
     This is the "cash flow alert" feature!
+    Pass balance_df (e.g. from a BalanceIndex) to skip recomputing it
     """
-    balance_df = calculate_daily_balance(df)
+    if balance_df is None:
+        balance_df = calculate_daily_balance(df, start_balance)
 
     # Simple forecast: assume same spending pattern continues
     last_30_days_change = balance_df['balance'].iloc[-30:].diff().mean()
@@ -251,17 +426,17 @@ def predict_low_balance_dates(df, threshold=100):
     return None
 
 
-def forecast_balance(df, days=30, start_balance=1000):
+@traced()
+def forecast_balance(df, days=30, start_balance=DEFAULT_START_BALANCE,
+                     balance_df=None):
     """
     Forecast future daily balances based on recent cashflow trend
     Used by both Forecast page & AI Insights
     """
 
-    df = df.copy()
-    df['date'] = pd.to_datetime(df['date'])
-
-    daily = df.groupby('date')['amount'].sum().sort_index()
-    balance = daily.cumsum() + start_balance
+    if balance_df is None:
+        balance_df = calculate_daily_balance(df, start_balance)
+    balance = balance_df.set_index('date')['balance']
 
     if len(balance) < 30:
         return None
@@ -281,29 +456,14 @@ def forecast_balance(df, days=30, start_balance=1000):
     return pd.DataFrame(forecast)
 
 
-def forecast_balance_arima(balance_df, days=30):
-    from statsmodels.tsa.arima.model import ARIMA
-
-    ts = balance_df.set_index("date")["balance"]
-
-    model = ARIMA(ts, order=(1, 1, 1))
-    model_fit = model.fit()
-
-    forecast_res = model_fit.get_forecast(steps=days)
-    forecast = forecast_res.predicted_mean
-    conf_int = forecast_res.conf_int()
-
-    future_dates = pd.date_range(
-        ts.index[-1] + pd.Timedelta(days=1),
-        periods=days
-    )
-
-    return pd.DataFrame({
-        "date": future_dates,
-        "balance": forecast.values,
-        "lower": conf_int.iloc[:, 0].values,
-        "upper": conf_int.iloc[:, 1].values
-    })
+def trend_forecast(values, days=30):
+    """
+    Linear-trend fallback: continue the average daily change of a balance
+    series for `days` steps
+    """
+    values = np.asarray(values, dtype=float)
+    avg_change = np.diff(values).mean() if len(values) > 1 else 0.0
+    return values[-1] + avg_change * np.arange(1, days + 1)
 
 
 def forecast_summary(forecast_df, threshold=200):
@@ -319,50 +479,154 @@ def forecast_summary(forecast_df, threshold=200):
     }
 
 
-def forecast_balance_arima(df, days=30):
+@traced()
+def forecast_balance_arima(df, days=30, start_balance=DEFAULT_START_BALANCE,
+                           balance_df=None, order=(1, 1, 1), alpha=0.05):
     """
     Forecast future balance using ARIMA.
-    Returns DataFrame with future dates and predicted balance.
+    Returns DataFrame with future dates, predicted balance and the
+    lower / upper bounds of the (1 - alpha) interval.
     """
+    from utils.forecasters import get_forecaster
 
     if df is None or len(df) < 30:
         return None
 
-    # Ensure datetime
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"])
+    # Build daily balance series (starting from a realistic base balance)
+    if balance_df is None:
+        balance_df = calculate_daily_balance(df, start_balance)
 
-    # Build daily balance series
-    daily = (
-        df.groupby(df["date"].dt.date)["amount"]
-        .sum()
-        .cumsum()
-    )
+    try:
+        forecaster = get_forecaster("arima", order=order).fit(balance_df)
+    except Exception:
+        # Fallback if ARIMA fails
+        forecaster = get_forecaster("trend").fit(balance_df)
 
-    # Start with realistic base balance
-    daily = daily + 1000
+    return forecaster.predict_interval(days, alpha=alpha)
 
-    # ARIMA requires numeric index
-    series = daily.values
 
-    try:
-        model = ARIMA(series, order=(1, 1, 1))
-        model_fit = model.fit()
+HOLT_ALPHAS = (0.1, 0.3, 0.6, 0.9)
 
-        forecast = model_fit.forecast(steps=days)
 
-    except Exception:
-        # Fallback if ARIMA fails
-        avg_change = daily.diff().mean()
-        last_value = daily.iloc[-1]
-        forecast = [last_value + avg_change * i for i in range(1, days + 1)]
+def _holt_start(y, m):
+    """Initial level, trend and seasonal states from the first two seasons"""
+    if m:
+        first = y[..., :m].mean(axis=-1)
+        second = y[..., m:2 * m].mean(axis=-1)
+        season = y[..., :m] - first[..., None]
+        return first, (second - first) / m, season - season.mean(
+            axis=-1, keepdims=True)
+    return y[..., 0], y[..., 1] - y[..., 0], None
+
+
+@traced()
+def holt_forecast(values, days=30, alphas=HOLT_ALPHAS, beta=0.01, phi=0.98,
+                  gamma=0.05, season_length=7, interval_alpha=0.05):
+    """
+    Damped-trend Holt-Winters (additive weekly seasonality) in NumPy
+
+    values is one daily series (n,) or a batch (n_series, n) on the same
+    daily grid. Every series is run for every smoothing weight in `alphas`
+    at once and keeps the one with the lowest one-step error. beta, phi and
+    gamma are the error-correction weights of ETS(A,Ad,A); phi=1 gives
+    Holt's linear trend. Seasonality is dropped when there are fewer than
+    two full seasons.
+
+    Returns (mean, lower, upper), each (days,) or (n_series, days), with
+    closed-form (1 - interval_alpha) prediction intervals.
+    """
+    y = np.asarray(values, dtype=float)
+    single = y.ndim == 1
+    y = np.atleast_2d(y)
+    n_series, n = y.shape
+    if n < 2:
+        raise ValueError("holt_forecast needs at least 2 observations")
+
+    m = season_length if season_length and n >= 2 * season_length else 0
+    alpha = np.asarray(alphas, dtype=float)[:, None]
+
+    # States are (n_alphas, n_series[, m])
+    level, trend, season = _holt_start(y, m)
+    level = np.broadcast_to(level, (len(alphas), n_series)).copy()
+    trend = np.broadcast_to(trend, (len(alphas), n_series)).copy()
+    if m:
+        season = np.broadcast_to(
+            season, (len(alphas), n_series, m)).copy()
+
+    sse = np.zeros((len(alphas), n_series))
+    start = m if m else 1
+    for t in range(start, n):
+        s = season[..., t % m] if m else 0.0
+        error = y[:, t] - (level + phi * trend + s)
+        sse += error ** 2
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + beta * error
+        if m:
+            season[..., t % m] = s + gamma * error
+
+    best = sse.argmin(axis=0)
+    cols = np.arange(n_series)
+    level = level[best, cols]
+    trend = trend[best, cols]
+    a = alpha[best, 0]
+    sigma2 = sse[best, cols] / max(n - start, 1)
+
+    # Point forecast: l + (phi + ... + phi^h) b + s
+    h = np.arange(1, days + 1)
+    damp = np.cumsum(phi ** h)
+    mean = level[:, None] + trend[:, None] * damp
+    if m:
+        mean += season[best, cols][:, (n + h - 1) % m]
+
+    # Var(h) = sigma2 * (1 + sum_{j<h} c_j^2),
+    # c_j = alpha + beta * (phi + ... + phi^j) + gamma * [j % m == 0]
+    j = h[:-1]
+    c = a[:, None] + beta * np.cumsum(phi ** j)[None, :]
+    if m:
+        c = c + gamma * (j % m == 0)
+    var = sigma2[:, None] * np.concatenate(
+        [np.ones((n_series, 1)), 1 + np.cumsum(c ** 2, axis=1)], axis=1)
+
+    from statistics import NormalDist
+    spread = NormalDist().inv_cdf(1 - interval_alpha / 2) * np.sqrt(var)
+    lower, upper = mean - spread, mean + spread
+
+    if single:
+        return mean[0], lower[0], upper[0]
+    return mean, lower, upper
+
+
+def daily_grid(balance_df):
+    """
+    Balance series on a full daily calendar - days without activity carry
+    the previous balance, so position t is always t days after the start
+    """
+    daily = balance_df.set_index("date")["balance"]
+    return daily.asfreq("D").ffill()
+
+
+@traced()
+def forecast_balance_fast(df, days=30, start_balance=DEFAULT_START_BALANCE,
+                          balance_df=None, alpha=0.05):
+    """
+    NumPy-only balance forecast (holt_forecast) for interactive pages
+    Same columns as forecast_balance_arima: date, balance, lower, upper
+    """
+    if balance_df is None:
+        if df is None or df.empty:
+            return None
+        balance_df = calculate_daily_balance(df, start_balance)
+    if len(balance_df) < 2:
+        return None
 
-    future_dates = [
-        daily.index[-1] + pd.Timedelta(days=i)
-        for i in range(1, days + 1)
-    ]
+    daily = daily_grid(balance_df)
+    mean, lower, upper = holt_forecast(
+        daily.to_numpy(), days, interval_alpha=alpha)
 
     return pd.DataFrame({
-        "date": pd.to_datetime(future_dates),
-        "balance": forecast
+        "date": pd.date_range(daily.index[-1] + pd.Timedelta(days=1),
+                              periods=days),
+        "balance": mean,
+        "lower": lower,
+        "upper": upper
     })
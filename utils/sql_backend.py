@@ -0,0 +1,396 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.data_access import DATA_FILE
+from utils.ledger import LEDGER_DIR, ledger_version, list_accounts, load_account
+from utils.tracing import traced
+
+# ---------------------------
+# Embedded SQL analytics backend
+#
+# Holds every ledger account in one table of an embedded database and
+# answers the page queries (range totals, top merchants, recent N,
+# monthly spend) in SQL, so only the small result sets come back to
+# pandas:
+#
+#   transactions(owner, account, seq, day, month, description,
+#                merchant_clean, brand, category, pence)
+#   indexes on (owner, account, day) and (owner, account, merchant_clean)
+#   accounts(owner, account, written): the shard write stamp each
+#   account's rows were loaded from
+#
+# When the ledger version moves, only accounts whose stamp changed are
+# reloaded (and removed accounts dropped); the file is rebuilt only
+# when it is missing. Import and sync call refresh_account() for the
+# shards they rewrote.
+#
+# Days are int days since 1970-01-01, months Period ordinals and amounts
+# integer pence, so sums are exact and both engines only ever compare
+# and group plain integers.
+#
+# DuckDB is optional. FINANCEAI_SQL picks the engine: "auto" (default:
+# DuckDB when installed, otherwise off), "duckdb", "sqlite" or "off".
+# Callers check sql_enabled() and keep their pandas path otherwise.
+# ---------------------------
+
+SQL_FILE = "analytics.db"
+SQL_ENGINE = os.environ.get("FINANCEAI_SQL", "auto").lower()
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+_LOCK = threading.Lock()
+
+# engine, database path, ledger version, connection
+_CONNECTION = {}
+
+COLUMNS = ["owner", "account", "seq", "day", "month", "description",
+           "merchant_clean", "brand", "category", "pence"]
+
+SCHEMA = [
+    """CREATE TABLE transactions (
+        owner TEXT, account TEXT, seq INTEGER, day INTEGER, month INTEGER,
+        description TEXT, merchant_clean TEXT, brand TEXT, category TEXT,
+        pence BIGINT
+    )""",
+    """CREATE TABLE accounts (
+        owner TEXT, account TEXT, written TEXT,
+        PRIMARY KEY (owner, account)
+    )""",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+INDEXES = [
+    "CREATE INDEX idx_tx_account_day ON transactions (owner, account, day)",
+    "CREATE INDEX idx_tx_account_merchant "
+    "ON transactions (owner, account, merchant_clean)",
+]
+
+
+def _duckdb_installed():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def sql_engine():
+    """"duckdb", "sqlite" or None (SQL backend off)"""
+    if SQL_ENGINE == "auto":
+        return "duckdb" if _duckdb_installed() else None
+    if SQL_ENGINE in ("duckdb", "sqlite"):
+        return SQL_ENGINE
+    return None
+
+
+def sql_enabled():
+    return sql_engine() is not None
+
+
+def _open(engine, path):
+    if engine == "duckdb":
+        import duckdb
+        return duckdb.connect(path)
+
+    import sqlite3
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+def _day(date):
+    return int((np.datetime64(pd.Timestamp(date).date(), "D") - _EPOCH)
+               .astype(np.int64))
+
+
+def _rows(df, user, account):
+    """Ledger rows as a frame in table column order"""
+    days = df["date"].to_numpy().astype("datetime64[D]")
+    return pd.DataFrame({
+        "owner": str(user),
+        "account": str(account),
+        "seq": np.arange(len(df), dtype=np.int64),
+        "day": (days - _EPOCH).astype(np.int64),
+        "month": days.astype("datetime64[M]").astype(np.int64),
+        "description": df["description"].to_numpy(dtype=object),
+        "merchant_clean": df["merchant_clean"].to_numpy(dtype=object),
+        "brand": df["brand"].to_numpy(dtype=object),
+        "category": df["category"].to_numpy(dtype=object),
+        "pence": np.round(df["amount"].to_numpy(dtype=float) * 100)
+        .astype(np.int64),
+    }, columns=COLUMNS)
+
+
+def _insert(con, engine, rows):
+    if engine == "duckdb":
+        con.register("_new_rows", rows)
+        con.execute("INSERT INTO transactions SELECT * FROM _new_rows")
+        con.unregister("_new_rows")
+    else:
+        con.executemany(
+            f"INSERT INTO transactions VALUES ({', '.join('?' * len(COLUMNS))})",
+            rows.itertuples(index=False, name=None))
+
+
+def _stamps(path, ledger_dir):
+    """{(user, account): shard write stamp} of every ledger account"""
+    version = ledger_version(path, ledger_dir)
+    return {(e["user"], e["account"]): str(e.get("written") or version)
+            for e in list_accounts(path=path, ledger_dir=ledger_dir)}
+
+
+def _drop_account(con, user, account):
+    for table in ("transactions", "accounts"):
+        con.execute(f"DELETE FROM {table} WHERE owner = ? AND account = ?",
+                    [str(user), str(account)])
+
+
+def _load_account(con, engine, user, account, stamp, path, ledger_dir):
+    """Replace one account's rows and record the stamp they came from"""
+    _drop_account(con, user, account)
+    df = load_account(user, account, path=path, ledger_dir=ledger_dir)
+    if len(df):
+        _insert(con, engine, _rows(df, user, account))
+    con.execute("INSERT INTO accounts VALUES (?, ?, ?)",
+                [str(user), str(account), stamp])
+
+
+def build_database(db_path=SQL_FILE, engine=None, path=DATA_FILE,
+                   ledger_dir=LEDGER_DIR):
+    """
+    (Re)build the database from every ledger account, one shard at a
+    time; written to a temporary file and swapped in when complete
+    """
+    engine = engine or sql_engine()
+    version = ledger_version(path, ledger_dir)
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    con = _open(engine, tmp_path)
+    for statement in SCHEMA:
+        con.execute(statement)
+    for (user, account), stamp in _stamps(path, ledger_dir).items():
+        _load_account(con, engine, user, account, stamp, path, ledger_dir)
+    for statement in INDEXES:
+        con.execute(statement)
+    con.execute("INSERT INTO meta VALUES ('source_hash', ?)", [version])
+    con.commit()
+    con.close()
+
+    os.replace(tmp_path, db_path)
+    return version
+
+
+def _stored_version(con):
+    try:
+        row = con.execute(
+            "SELECT value FROM meta WHERE key = 'source_hash'").fetchone()
+    except Exception:  # missing table: sqlite3 / duckdb raise different types
+        return None
+    return row[0] if row else None
+
+
+def _stored_stamps(con):
+    """{(owner, account): written} as loaded, None for an older file"""
+    try:
+        rows = con.execute(
+            "SELECT owner, account, written FROM accounts").fetchall()
+    except Exception:  # missing table: sqlite3 / duckdb raise different types
+        return None
+    return {(owner, account): written for owner, account, written in rows}
+
+
+def sync_database(con, engine, version, path=DATA_FILE,
+                  ledger_dir=LEDGER_DIR):
+    """
+    Reload the accounts whose shard stamp changed since they were loaded
+    and drop removed ones; returns the number of accounts touched
+    """
+    stored = _stored_stamps(con)
+    current = _stamps(path, ledger_dir)
+
+    for user, account in stored.keys() - current.keys():
+        _drop_account(con, user, account)
+    changed = [(key, stamp) for key, stamp in current.items()
+               if stored.get(key) != stamp]
+    for (user, account), stamp in changed:
+        _load_account(con, engine, user, account, stamp, path, ledger_dir)
+
+    con.execute("DELETE FROM meta WHERE key = 'source_hash'")
+    con.execute("INSERT INTO meta VALUES ('source_hash', ?)", [version])
+    con.commit()
+    return len(changed) + len(stored.keys() - current.keys())
+
+
+def _connect(engine, db_path, path, ledger_dir):
+    """
+    Open (or reuse) a connection to the database file, building it when
+    missing or written before the accounts table; caller holds _LOCK
+    """
+    state = _CONNECTION.get("state")
+    if state is not None and state[:2] == (engine, db_path):
+        return state[3]
+
+    if state is not None:
+        state[3].close()
+        _CONNECTION.clear()
+
+    con = _open(engine, db_path) if os.path.exists(db_path) else None
+    if con is None or _stored_stamps(con) is None:
+        if con is not None:
+            con.close()
+        build_database(db_path, engine, path, ledger_dir)
+        con = _open(engine, db_path)
+
+    _CONNECTION["state"] = (engine, db_path, _stored_version(con), con)
+    return con
+
+
+def connection(db_path=SQL_FILE, path=DATA_FILE, ledger_dir=LEDGER_DIR):
+    """
+    Open connection to a database current with the ledger, building it
+    on first use and reloading changed accounts after the ledger moved
+    Raises RuntimeError when the SQL backend is off.
+    """
+    engine = sql_engine()
+    if engine is None:
+        raise RuntimeError("SQL backend is off (FINANCEAI_SQL)")
+    version = ledger_version(path, ledger_dir)
+
+    state = _CONNECTION.get("state")
+    if state is not None and state[:3] == (engine, db_path, version):
+        return state[3]
+
+    con = _connect(engine, db_path, path, ledger_dir)
+    if _stored_version(con) != version:
+        sync_database(con, engine, version, path, ledger_dir)
+    _CONNECTION["state"] = (engine, db_path, version, con)
+    return con
+
+
+def refresh_account(user, account, db_path=SQL_FILE, path=DATA_FILE,
+                    ledger_dir=LEDGER_DIR):
+    """
+    Reload one account's rows after its ledger shard was rewritten
+
+    A no-op while the SQL backend is off or before the database was first
+    built (the first query builds it from the ledger as it is then).
+    """
+    engine = sql_engine()
+    if engine is None or not os.path.exists(db_path):
+        return
+    stamp = _stamps(path, ledger_dir).get((str(user), str(account)))
+
+    with _LOCK:
+        con = _connect(engine, db_path, path, ledger_dir)
+        if stamp is None:
+            _drop_account(con, user, account)
+        else:
+            _load_account(con, engine, user, account, stamp, path,
+                          ledger_dir)
+        con.commit()
+
+
+def query(sql, params=(), db_path=SQL_FILE, path=DATA_FILE,
+          ledger_dir=LEDGER_DIR):
+    """Run a query and return its result set as a DataFrame"""
+    with _LOCK:
+        cursor = connection(db_path, path, ledger_dir).execute(
+            sql, list(params))
+        columns = [d[0] for d in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+# ---------------------------
+# Page queries
+# ---------------------------
+
+
+def _where(user, account, start_date=None, end_date=None):
+    clauses = ["owner = ?", "account = ?"]
+    params = [str(user), str(account)]
+    if start_date is not None:
+        clauses.append("day >= ?")
+        params.append(_day(start_date))
+    if end_date is not None:
+        clauses.append("day <= ?")
+        params.append(_day(end_date))
+    return " AND ".join(clauses), params
+
+
+@traced()
+def range_totals(user, account, start_date=None, end_date=None, **kwargs):
+    """Net, income, expenses (positive) and counts between two dates"""
+    where, params = _where(user, account, start_date, end_date)
+    row = query(f"""
+        SELECT COALESCE(SUM(pence), 0) AS net,
+               COALESCE(SUM(CASE WHEN pence > 0 THEN pence END), 0) AS income,
+               COALESCE(SUM(CASE WHEN pence < 0 THEN pence END), 0) AS expenses,
+               COUNT(*) AS count,
+               COUNT(CASE WHEN pence < 0 THEN 1 END) AS expense_count
+        FROM transactions WHERE {where}
+    """, params, **kwargs).iloc[0]
+
+    return {
+        "net": row["net"] / 100,
+        "income": row["income"] / 100,
+        "expenses": abs(row["expenses"]) / 100,
+        "count": int(row["count"]),
+        "expense_count": int(row["expense_count"]),
+    }
+
+
+@traced()
+def top_merchants(user, account, start_date=None, end_date=None, n=10,
+                  **kwargs):
+    """Largest spend per merchant_clean (positive amounts), descending"""
+    where, params = _where(user, account, start_date, end_date)
+    result = query(f"""
+        SELECT merchant_clean, -SUM(pence) AS spend
+        FROM transactions WHERE {where} AND pence < 0
+        GROUP BY merchant_clean
+        ORDER BY spend DESC, merchant_clean
+        LIMIT ?
+    """, params + [int(n)], **kwargs)
+
+    return pd.Series(result["spend"].to_numpy() / 100,
+                     index=pd.Index(result["merchant_clean"],
+                                    name="merchant_clean"),
+                     name="amount")
+
+
+@traced()
+def recent_transactions(user, account, start_date=None, end_date=None, n=10,
+                        **kwargs):
+    """Latest n transactions (date, description, merchant_clean, brand,
+    category, amount), newest first"""
+    where, params = _where(user, account, start_date, end_date)
+    result = query(f"""
+        SELECT day, description, merchant_clean, brand, category, pence
+        FROM transactions WHERE {where}
+        ORDER BY day DESC, seq DESC
+        LIMIT ?
+    """, params + [int(n)], **kwargs)
+
+    days = _EPOCH + result.pop("day").to_numpy(dtype=np.int64)
+    result.insert(0, "date", days.astype("datetime64[ns]"))
+    result["amount"] = result.pop("pence").to_numpy(dtype=np.int64) / 100
+    return result
+
+
+@traced()
+def monthly_spend(user, account, start_date=None, end_date=None, **kwargs):
+    """Spend per month (positive amounts), indexed by Period"""
+    where, params = _where(user, account, start_date, end_date)
+    result = query(f"""
+        SELECT month, -SUM(pence) AS spend
+        FROM transactions WHERE {where} AND pence < 0
+        GROUP BY month
+        ORDER BY month
+    """, params, **kwargs)
+
+    months = pd.PeriodIndex.from_ordinals(
+        result["month"].to_numpy(dtype=np.int64), freq="M")
+    return pd.Series(result["spend"].to_numpy() / 100,
+                     index=months.rename("month"), name="amount")
@@ -0,0 +1,254 @@
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+# ---------------------------
+# Lightweight stage tracing
+#
+#   @traced("ml.detect_recurring")      decorator, rows = len(first frame
+#                                       argument, else returned frame)
+#   with span("dashboard.kpis", rows=n): context manager
+#
+# Each span records wall time, rows processed and the change in process
+# RSS. Spans nest (parent ids) and group into one trace per page rerun
+# (start_trace). Tracing is off unless FINANCEAI_TRACE=1 or
+# enable_tracing() is called; while off, a traced call costs one flag
+# check and span() hands back a shared no-op context manager.
+#
+# export_json writes OTLP/JSON (the OpenTelemetry file format), so the
+# output can be loaded by any OTLP-compatible viewer.
+# ---------------------------
+
+TRACE_FILE = os.environ.get("FINANCEAI_TRACE_FILE", "traces.json")
+MAX_SPANS = 10_000
+
+_ENABLED = os.environ.get("FINANCEAI_TRACE", "") not in ("", "0")
+_SPANS = deque(maxlen=MAX_SPANS)
+_LOCK = threading.Lock()
+
+# (trace id, current span id) for the running thread / Streamlit session
+_CONTEXT = contextvars.ContextVar("financeai_trace", default=(None, None))
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _rss_bytes():
+    """Current resident set size, or peak RSS where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def enable_tracing(enabled=True):
+    global _ENABLED
+    _ENABLED = enabled
+
+
+def tracing_enabled():
+    return _ENABLED
+
+
+def clear_spans():
+    with _LOCK:
+        _SPANS.clear()
+
+
+def start_trace():
+    """Begin a new trace (e.g. one page rerun); returns its id"""
+    if not _ENABLED:
+        return None
+    trace_id = secrets.token_hex(16)
+    _CONTEXT.set((trace_id, None))
+    return trace_id
+
+
+class _NoopSpan:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "rows", "_token", "_record")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        trace_id, parent_id = _CONTEXT.get()
+        if trace_id is None:
+            trace_id = secrets.token_hex(16)
+        span_id = secrets.token_hex(8)
+        self._token = _CONTEXT.set((trace_id, span_id))
+        self._record = {
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": self.name,
+            "start_ns": time.time_ns(),
+            "_perf": time.perf_counter_ns(),
+            "_rss": _rss_bytes(),
+        }
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = self._record
+        elapsed = time.perf_counter_ns() - record.pop("_perf")
+        record["end_ns"] = record["start_ns"] + elapsed
+        record["duration_ms"] = elapsed / 1e6
+        record["rows"] = self.rows
+        record["memory_delta_bytes"] = _rss_bytes() - record.pop("_rss")
+        record["error"] = None if exc_type is None else exc_type.__name__
+        _CONTEXT.reset(self._token)
+        with _LOCK:
+            _SPANS.append(record)
+        return False
+
+
+def span(name, rows=None):
+    """Context manager timing a block; set .rows inside if known later"""
+    if not _ENABLED:
+        return _NOOP
+    return _Span(name, rows)
+
+
+def _frame_rows(value):
+    """len() of DataFrames, Series and arrays; None for anything else
+    (an account name or a list of ids is not a row count)"""
+    if hasattr(value, "shape") and hasattr(value, "__len__"):
+        return len(value)
+    return None
+
+
+def traced(name=None):
+    """
+    Decorator recording a span per call; rows is the length of the first
+    argument when that is a frame / array, otherwise of the returned one
+    """
+    def _decorate(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def _wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(span_name,
+                       _frame_rows(args[0]) if args else None) as record:
+                result = fn(*args, **kwargs)
+                if record.rows is None:
+                    record.rows = _frame_rows(result)
+                return result
+        return _wrapper
+    return _decorate
+
+
+# ---------- reading / exporting ----------
+
+def get_spans(trace_id=None):
+    """Recorded spans (oldest first), optionally for one trace"""
+    with _LOCK:
+        spans = list(_SPANS)
+    if trace_id is not None:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    return spans
+
+
+def current_trace_id():
+    return _CONTEXT.get()[0]
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otlp(spans, service_name="financeai"):
+    """Spans as an OTLP/JSON ExportTraceServiceRequest dict"""
+    otlp_spans = []
+    for s in spans:
+        attributes = [
+            _otlp_attribute("memory.delta_bytes", s["memory_delta_bytes"])
+        ]
+        if s["rows"] is not None:
+            attributes.append(_otlp_attribute("rows", s["rows"]))
+        if s["error"]:
+            attributes.append(_otlp_attribute("error.type", s["error"]))
+
+        otlp_spans.append({
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "parentSpanId": s["parent_id"] or "",
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": attributes,
+            "status": {"code": 2 if s["error"] else 1}
+        })
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            _otlp_attribute("service.name", service_name)
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "utils.tracing"},
+            "spans": otlp_spans
+        }]
+    }]}
+
+
+def export_json(path=TRACE_FILE, trace_id=None):
+    """Write recorded spans to `path` as OTLP/JSON; returns the span count"""
+    spans = get_spans(trace_id)
+    with open(path, "w") as f:
+        json.dump(to_otlp(spans), f, indent=2)
+    return len(spans)
+
+
+def trace_panel(trace_id=None):
+    """
+    Sidebar table of the spans of a trace (default: the current one)
+    Does nothing while tracing is off.
+    """
+    if not _ENABLED:
+        return
+
+    import pandas as pd
+    import streamlit as st
+
+    trace_id = trace_id or current_trace_id()
+    spans = get_spans(trace_id)
+    if not spans:
+        return
+
+    table = pd.DataFrame(spans).sort_values("start_ns")[
+        ["name", "duration_ms", "rows", "memory_delta_bytes"]]
+    table["memory_delta_mib"] = table.pop("memory_delta_bytes") / 2**20
+
+    with st.sidebar.expander("⏱️ Timings", expanded=False):
+        st.dataframe(table.round(2), hide_index=True)
+        if st.button("Export trace (OTLP JSON)"):
+            count = export_json(trace_id=trace_id)
+            st.caption(f"Wrote {count} spans to '{TRACE_FILE}'")
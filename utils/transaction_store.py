@@ -0,0 +1,253 @@
+import glob
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+# ---------------------------
+# Columnar transaction store (Parquet, partitioned by account / month)
+#
+# Layout of one store directory (every ledger shard is one, see
+# utils/ledger.py):
+#   <store_dir>/
+#       _manifest.json
+#       account=main/month=2025-07/part-0.parquet
+#       ...
+#
+# pyarrow is optional: callers should check store_available() and fall
+# back to the CSV path when it is not installed.
+# ---------------------------
+
+MANIFEST_FILE = "_manifest.json"
+DEFAULT_ACCOUNT = "main"
+ROWS_PER_GROUP = 64 * 1024
+
+DICTIONARY_COLUMNS = ["description", "merchant_clean", "brand", "category"]
+
+
+def store_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.dataset  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(
+        pa.schema([("account", pa.string()), ("month", pa.string())]),
+        flavor="hive"
+    )
+
+
+def _to_arrow(df):
+    """Typed Arrow table: date32 dates, dictionary strings, decimal pence"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = {
+        "date": pa.array(df["date"].to_numpy(dtype="datetime64[D]"),
+                         type=pa.date32()),
+        "amount": pc.cast(
+            pc.round(pa.array(df["amount"], type=pa.float64()), 2),
+            pa.decimal128(12, 2)
+        ),
+        "account": pa.array(df["account"].astype(str), type=pa.string()),
+        "month": pa.array(df["month"].astype(str), type=pa.string()),
+    }
+    for col in DICTIONARY_COLUMNS:
+        if col in df.columns:
+            columns[col] = pa.array(
+                df[col].astype(str), type=pa.string()
+            ).dictionary_encode()
+
+    return pa.table(columns)
+
+
+def read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _prepare(df):
+    df = df.sort_values("date", kind="stable")
+    if "account" not in df.columns:
+        df = df.assign(account=DEFAULT_ACCOUNT)
+    if "month" not in df.columns:
+        df = df.assign(month=df["date"].dt.to_period("M").astype(str))
+    return df
+
+
+def _write_dataset(df, store_dir, **options):
+    import pyarrow.dataset as ds
+
+    ds.write_dataset(
+        _to_arrow(df),
+        store_dir,
+        format="parquet",
+        partitioning=_partitioning(),
+        max_rows_per_group=ROWS_PER_GROUP,
+        min_rows_per_group=min(ROWS_PER_GROUP, max(1, len(df))),
+        **options
+    )
+
+
+def write_manifest(manifest, store_dir):
+    """
+    Save a store's manifest, stamped with the time it was written
+    ("written", ns) so caches of derived data can tell rewrites apart
+    """
+    manifest = {**manifest, "written": time.time_ns()}
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def write_store(df, store_dir, source=None):
+    """
+    Write enriched transactions as a Parquet dataset partitioned by
+    account and month. Rows are date-sorted before writing so row-group
+    statistics on `date` are tight enough for range pruning.
+    """
+    df = _prepare(df)
+    _write_dataset(df, store_dir, existing_data_behavior="delete_matching")
+
+    return write_manifest({
+        "source": source,
+        "rows": int(len(df)),
+        "min_date": df["date"].min().strftime("%Y-%m-%d") if len(df) else None,
+        "max_date": df["date"].max().strftime("%Y-%m-%d") if len(df) else None,
+        "accounts": sorted(df["account"].astype(str).unique().tolist()),
+    }, store_dir)
+
+
+def replace_from(df, since, store_dir, source=None):
+    """
+    Replace the rows dated `since` or later with `df` (rows from `since`
+    on), rewriting only the month partitions from since's month onward;
+    earlier months are left as they are. Returns the new manifest.
+    """
+    import pyarrow.dataset as ds
+
+    since = pd.Timestamp(since).normalize()
+    month = since.strftime("%Y-%m")
+    kept = read_transactions(store_dir, since.replace(day=1),
+                             since - pd.Timedelta(days=1))
+
+    for partition in glob.glob(os.path.join(store_dir, "*", "month=*")):
+        if os.path.basename(partition)[len("month="):] >= month:
+            shutil.rmtree(partition)
+    earlier = ds.dataset(store_dir, format="parquet",
+                         partitioning=_partitioning()).count_rows()
+
+    # Month labels are recomputed for kept and new rows alike
+    df = _prepare(pd.concat([kept, df], ignore_index=True)
+                  .drop(columns="month", errors="ignore"))
+    if len(df):
+        _write_dataset(df, store_dir,
+                       existing_data_behavior="delete_matching")
+
+    previous = read_manifest(store_dir) or {}
+    if len(df):
+        max_date = df["date"].max().strftime("%Y-%m-%d")
+    elif earlier:
+        max_date = read_transactions(store_dir, columns=["date"])[
+            "date"].max().strftime("%Y-%m-%d")
+    else:
+        max_date = None
+    min_date = previous.get("min_date") if earlier else (
+        df["date"].min().strftime("%Y-%m-%d") if len(df) else None)
+
+    return write_manifest({
+        "source": source,
+        "rows": int(earlier + len(df)),
+        "min_date": min_date,
+        "max_date": max_date,
+        "accounts": sorted(set(previous.get("accounts", [])) |
+                           set(df["account"].astype(str).unique())),
+    }, store_dir)
+
+
+def append_store(df, store_dir, part=0):
+    """
+    Add enriched transactions to a store as new files (part-<part>-*),
+    leaving the files already there; write_manifest() once the last
+    part is in. Each part is date-sorted on its own.
+    """
+    _write_dataset(_prepare(df), store_dir,
+                   existing_data_behavior="overwrite_or_ignore",
+                   basename_template=f"part-{part:05d}-{{i}}.parquet")
+
+
+def build_filter(start_date=None, end_date=None, accounts=None):
+    """
+    Dataset filter for a date range and account list
+
+    The month bounds prune whole partition directories; the date bounds
+    are then checked against Parquet row-group statistics.
+    """
+    import pyarrow.dataset as ds
+
+    expr = None
+
+    def _and(a, b):
+        return b if a is None else a & b
+
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        expr = _and(expr, ds.field("month") >= start.strftime("%Y-%m"))
+        expr = _and(expr, ds.field("date") >= start.date())
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        expr = _and(expr, ds.field("month") <= end.strftime("%Y-%m"))
+        expr = _and(expr, ds.field("date") <= end.date())
+    if accounts is not None:
+        expr = _and(expr, ds.field("account").isin(list(accounts)))
+
+    return expr
+
+
+def read_transactions(store_dir, start_date=None, end_date=None,
+                      accounts=None, columns=None):
+    """
+    Read transactions from the store with partition and row-group pruning
+
+    Returns a date-sorted DataFrame with datetime `date`, float `amount`
+    and categorical string columns.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(store_dir, format="parquet",
+                         partitioning=_partitioning())
+    table = dataset.to_table(
+        columns=columns,
+        filter=build_filter(start_date, end_date, accounts)
+    )
+
+    pence = None
+    if "amount" in table.column_names:
+        # Go through exact integer pence: Arrow's decimal -> float cast is
+        # not correctly rounded, pence / 100 in NumPy is
+        pence = pc.cast(pc.multiply(table["amount"], 100), pa.int64())
+        table = table.drop_columns(["amount"])
+
+    df = table.to_pandas(date_as_object=False)
+    if pence is not None:
+        df["amount"] = pence.to_numpy() / 100
+    if "date" in df.columns:
+        df["date"] = df["date"].astype("datetime64[ns]")
+        df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    return df